@@ -0,0 +1,327 @@
+"""
+Benchmark of the `evaluate` function of a challenge
+
+For every phase of `challenge_config.yaml`, synthetic annotation and submission
+files of the configured size are evaluated the way `worker/run.py` does it, each
+run in a fresh process. Wall time, CPU time, peak RSS and throughput are
+reported and saved as JSON, to compare the results across commits.
+
+Usage:
+    python -m benchmarks.evaluation --records 100000 --repeat 3
+    python -m benchmarks.evaluation --module evaluation_script --output new.json --compare old.json
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+CHALLENGE_CONFIG_FILE_PATH = "challenge_config.yaml"
+CHALLENGE_IMPORT_STRING = "challenge_data.challenge_1"
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+RU_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def get_phases(config_path=CHALLENGE_CONFIG_FILE_PATH):
+    """
+    Returns the (codename, test annotation file) pairs of the phases of a challenge config
+    """
+    with open(config_path, "r") as f:
+        config = yaml.safe_load(f)
+    return [
+        (phase["codename"], phase.get("test_annotation_file"))
+        for phase in config.get("challenge_phases", [])
+    ]
+
+
+def generate_data(directory, records, num_classes=10, accuracy=0.8, seed=0):
+    """
+    Writes synthetic annotation and submission files of `records` records and
+    returns their paths
+
+    Annotations are `{"id", "label"}` records and the submission predicts the
+    right label for about `accuracy` of them.
+    """
+    rng = random.Random(seed)
+    annotations, submission = [], []
+    for index in range(records):
+        label = rng.randrange(num_classes)
+        prediction = label if rng.random() < accuracy else rng.randrange(num_classes)
+        annotations.append({"id": index, "label": label})
+        submission.append({"id": index, "label": prediction})
+    annotation_file_path = os.path.join(directory, "annotations.json")
+    user_submission_file_path = os.path.join(directory, "submission.json")
+    with open(annotation_file_path, "w") as f:
+        json.dump(annotations, f)
+    with open(user_submission_file_path, "w") as f:
+        json.dump(submission, f)
+    return annotation_file_path, user_submission_file_path
+
+
+def get_submission_metadata():
+    # Same metadata as the one passed by worker/run.py
+    return {
+        "status": "running",
+        "when_made_public": None,
+        "participant_team": 5,
+        "input_file": "https://abc.xyz/path/to/submission/file.json",
+        "execution_time": "123",
+        "publication_url": "ABC",
+        "challenge_phase": 1,
+        "created_by": "ABC",
+        "stdout_file": "https://abc.xyz/path/to/stdout/file.json",
+        "method_name": "Test",
+        "stderr_file": "https://abc.xyz/path/to/stderr/file.json",
+        "participant_team_name": "Test Team",
+        "project_url": "http://foo.bar",
+        "method_description": "ABC",
+        "is_public": False,
+        "submission_result_file": "https://abc.xyz/path/result/file.json",
+        "id": 123,
+        "submitted_at": "2017-03-20T19:22:03.880652Z",
+    }
+
+
+def measure(connection, module, annotation_file_path, user_submission_file_path, phase):
+    """
+    Runs one evaluation in this process and sends its measurements to `connection`
+    """
+    try:
+        sys.stdout = open(os.devnull, "w")
+        start_import = time.perf_counter()
+        challenge_module = importlib.import_module(module)
+        import_time = time.perf_counter() - start_import
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        challenge_module.evaluate(
+            annotation_file_path,
+            user_submission_file_path,
+            phase,
+            submission_metadata=get_submission_metadata(),
+        )
+        wall_time = time.perf_counter() - start
+        cpu_time = time.process_time() - start_cpu
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        connection.send(
+            {
+                "import_time": import_time,
+                "wall_time": wall_time,
+                "cpu_time": cpu_time,
+                "peak_rss_bytes": peak_rss * RU_MAXRSS_UNIT,
+                "rss_before_bytes": rss_before * RU_MAXRSS_UNIT,
+            }
+        )
+    except Exception as e:
+        connection.send({"error": "{}: {}".format(type(e).__name__, e)})
+    finally:
+        connection.close()
+
+
+def run_once(module, annotation_file_path, user_submission_file_path, phase):
+    """
+    Runs one evaluation in a fresh process, so that its peak RSS and the import
+    time of the challenge module are measured on their own
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=measure,
+        args=(sender, module, annotation_file_path, user_submission_file_path, phase),
+    )
+    process.start()
+    sender.close()
+    try:
+        measurements = receiver.recv()
+    except EOFError:
+        measurements = {"error": "Evaluation process died"}
+    process.join()
+    if process.exitcode and "error" not in measurements:
+        measurements = {"error": "Exit code {}".format(process.exitcode)}
+    return measurements
+
+
+def summarize(runs, records):
+    successful = [run for run in runs if "error" not in run]
+    if not successful:
+        return {"error": runs[-1]["error"]}
+    wall_time = statistics.median(run["wall_time"] for run in successful)
+    return {
+        "wall_time": wall_time,
+        "cpu_time": statistics.median(run["cpu_time"] for run in successful),
+        "peak_rss_bytes": max(run["peak_rss_bytes"] for run in successful),
+        "import_time": statistics.median(run["import_time"] for run in successful),
+        "records_per_second": records / wall_time if wall_time else None,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    module=CHALLENGE_IMPORT_STRING,
+    config_path=CHALLENGE_CONFIG_FILE_PATH,
+    records=100000,
+    repeat=3,
+    phases=None,
+    use_config_annotations=False,
+    seed=0,
+):
+    """
+    Benchmarks the `evaluate` function of `module` for the phases of a challenge
+    config and returns the report
+
+    Arguments:
+
+        `module`: Import path of the challenge module
+        `config_path`: Path of the challenge config listing the phases
+        `records`: Number of records of the synthetic annotations and submission
+        `repeat`: Number of evaluations per phase, the median is reported
+        `phases`: Codenames of the phases to benchmark, defaults to all of them
+        `use_config_annotations`: Evaluate against the test annotation files of
+            the config instead of synthetic annotations
+        `seed`: Seed of the synthetic data
+    """
+    report = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "module": module,
+        "records": records,
+        "repeat": repeat,
+        "phases": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        annotation_file_path, user_submission_file_path = generate_data(
+            directory, records, seed=seed
+        )
+        for codename, test_annotation_file in get_phases(config_path):
+            if phases and codename not in phases:
+                continue
+            phase_annotation_file_path = annotation_file_path
+            if use_config_annotations and test_annotation_file:
+                phase_annotation_file_path = test_annotation_file
+            runs = [
+                run_once(
+                    module,
+                    phase_annotation_file_path,
+                    user_submission_file_path,
+                    codename,
+                )
+                for _ in range(repeat)
+            ]
+            report["phases"][codename] = dict(summarize(runs, records), runs=runs)
+    return report
+
+
+def compare(report, baseline):
+    """
+    Returns the lines comparing the medians of `report` with a `baseline` report
+    """
+    lines = []
+    for codename, summary in report["phases"].items():
+        previous = baseline.get("phases", {}).get(codename)
+        if not previous or "error" in summary or "error" in previous:
+            continue
+        for name in ("wall_time", "cpu_time", "peak_rss_bytes"):
+            if previous[name]:
+                lines.append(
+                    "{} {}: {:.4g} -> {:.4g} ({:+.1%})".format(
+                        codename,
+                        name,
+                        previous[name],
+                        summary[name],
+                        summary[name] / previous[name] - 1,
+                    )
+                )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--module",
+        default=CHALLENGE_IMPORT_STRING,
+        help="Import path of the challenge module",
+    )
+    parser.add_argument(
+        "--config",
+        default=CHALLENGE_CONFIG_FILE_PATH,
+        help="Challenge config listing the phases",
+    )
+    parser.add_argument(
+        "--records", type=int, default=100000, help="Records per synthetic file"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Evaluations per phase")
+    parser.add_argument(
+        "--phase",
+        action="append",
+        dest="phases",
+        help="Codename of a phase to benchmark, can be repeated",
+    )
+    parser.add_argument(
+        "--use-config-annotations",
+        action="store_true",
+        help="Use the test annotation files of the config",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the data")
+    parser.add_argument("--output", help="Path of the JSON report")
+    parser.add_argument("--compare", help="Path of a JSON report to compare with")
+    args = parser.parse_args()
+
+    sys.path.append(os.getcwd())
+    report = run_benchmark(
+        args.module,
+        args.config,
+        args.records,
+        args.repeat,
+        args.phases,
+        args.use_config_annotations,
+        args.seed,
+    )
+    for codename, summary in report["phases"].items():
+        if "error" in summary:
+            print("{}: failed, {}".format(codename, summary["error"]))
+            continue
+        print(
+            "{}: wall {:.4f}s, cpu {:.4f}s, peak RSS {:.1f} MiB, {:.0f} records/s".format(
+                codename,
+                summary["wall_time"],
+                summary["cpu_time"],
+                summary["peak_rss_bytes"] / 1024**2,
+                summary["records_per_second"] or 0,
+            )
+        )
+    if args.compare:
+        with open(args.compare, "r") as f:
+            for line in compare(report, json.load(f)):
+                print(line)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Saved the report to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Local stand-in for the EvalAI challenge creation endpoints used by `github/challenge_processing_script.py`
+
+It implements the validation and the create or update endpoints, which take
+the challenge zip file as the `zip_configuration` field of a multipart form,
+and the resumable upload protocol of `github/uploader.py`:
+
+    POST /uploads/            JSON {"filename", "size", "sha256"}, returns {"upload_id", "offset"}
+    PUT  /uploads/<id>/       chunk with a "Content-Range: bytes <start>-<end>/<size>" header, returns {"offset"}
+    GET  /uploads/<id>/       returns {"offset"}
+
+after which the challenge endpoints accept an `upload_id` field in place of the
+file. Creating an upload of a file which was partially uploaded before returns
+the offset received so far. 503 errors and dropped connections can be injected
+into every request, request bodies are streamed to temporary files.
+
+Usage:
+    python -m benchmarks.fake_challenge_server --port 8888 --error-rate 0.1 --drop-rate 0.1
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CHALLENGE_ROUTE = re.compile(
+    r"^/api/challenges/challenge/challenge_host_team/(?P<pk>\d+)/"
+    r"(?P<endpoint>validate_challenge_config|create_or_update_github_challenge)/$"
+)
+UPLOAD_ROUTE = re.compile(r"^/uploads/(?:(?P<upload_id>[0-9a-f]+)/)?$")
+CONTENT_RANGE = re.compile(r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+)$")
+
+# Size of the blocks in which request bodies are read
+BLOCK_SIZE = 64 * 1024
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on a dropped request are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def get_multipart_file(path, boundary, field):
+    """
+    Returns the offset and the size of a file field in a multipart body stored in a file
+
+    The headers of the file field are looked up in the first 64 KiB of the body
+    and the file runs until the closing boundary
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(BLOCK_SIZE)
+    marker = 'name="{}"'.format(field).encode("utf-8")
+    index = head.find(marker)
+    if index < 0:
+        return None
+    start = head.find(b"\r\n\r\n", index) + 4
+    end = size - len("\r\n--{}--\r\n".format(boundary))
+    if start < 4 or end < start:
+        return None
+    return start, end - start
+
+
+def hash_range(path, offset, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while size > 0:
+            block = f.read(min(BLOCK_SIZE, size))
+            if not block:
+                break
+            digest.update(block)
+            size -= len(block)
+    return digest.hexdigest()
+
+
+class FakeChallengeServer:
+    """
+    Fake EvalAI challenge creation server running in a background thread
+
+    Arguments:
+
+        `port`: Port to listen on, 0 picks a free port
+        `error_rate`: Fraction of the requests answered with a 503 error once their body is read
+        `drop_rate`: Fraction of the requests whose connection is closed without a response,
+            after their body is read and, for upload chunks, stored
+        `latency`: Seconds added to every request
+        `seed`: Seed of the injected errors
+    """
+
+    def __init__(self, port=0, error_rate=0, drop_rate=0, latency=0, seed=0):
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.errors = Counter()
+        self.bytes_received = 0
+        self.uploads = {}
+        self.challenges = []
+        self.directory = tempfile.mkdtemp(prefix="fake-challenge-server-")
+        self.server = _Server(("127.0.0.1", port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def upload_url(self):
+        return "{}/uploads/".format(self.url)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_upload(self, data):
+        with self.lock:
+            for upload_id, upload in self.uploads.items():
+                if (upload["sha256"], upload["size"]) == (data["sha256"], data["size"]):
+                    return {"upload_id": upload_id, "offset": upload["offset"]}
+            upload_id = uuid.uuid4().hex
+            path = os.path.join(self.directory, upload_id)
+            open(path, "wb").close()
+            self.uploads[upload_id] = {
+                "filename": data.get("filename"),
+                "size": int(data["size"]),
+                "sha256": data["sha256"],
+                "offset": 0,
+                "path": path,
+            }
+            return {"upload_id": upload_id, "offset": 0}
+
+    def receive_challenge(self, endpoint, fields, path, offset, size):
+        """
+        Returns the status code and the response of a challenge endpoint receiving a zip file
+        """
+        with open(path, "rb") as f:
+            f.seek(offset)
+            if f.read(4) != b"PK\x03\x04":
+                return 400, {"error": "zip_configuration is not a zip file"}
+        challenge = {
+            "endpoint": endpoint,
+            "fields": fields,
+            "size": size,
+            "sha256": hash_range(path, offset, size),
+        }
+        with self.lock:
+            self.challenges.append(challenge)
+        return 200, {"Success": "Challenge processed by {}".format(endpoint)}
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def send_json(self, status, response):
+                body = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_body(self, f=None):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = []
+                while length > 0:
+                    block = self.rfile.read(min(BLOCK_SIZE, length))
+                    if not block:
+                        break
+                    length -= len(block)
+                    with fake.lock:
+                        fake.bytes_received += len(block)
+                    if f is not None:
+                        f.write(block)
+                    else:
+                        data.append(block)
+                return b"".join(data)
+
+            def inject(self, name):
+                with fake.lock:
+                    fake.calls[name] += 1
+                    roll = fake.random.random()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if roll < fake.error_rate:
+                    return "error"
+                if roll < fake.error_rate + fake.drop_rate:
+                    return "drop"
+                return None
+
+            def respond(self, name, fault, status, response):
+                if fault == "error":
+                    with fake.lock:
+                        fake.errors["{} 503".format(name)] += 1
+                    self.send_json(503, {"error": "Injected error"})
+                elif fault == "drop":
+                    with fake.lock:
+                        fake.errors["{} dropped".format(name)] += 1
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                else:
+                    self.send_json(status, response)
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                match = CHALLENGE_ROUTE.match(path)
+                if match:
+                    self.post_challenge(match.group("endpoint"))
+                elif path == "/uploads/":
+                    fault = self.inject("create_upload")
+                    data = json.loads(self.read_body() or b"{}")
+                    if fault:
+                        self.respond("create_upload", fault, None, None)
+                    else:
+                        self.send_json(201, fake.create_upload(data))
+                else:
+                    self.read_body()
+                    self.send_json(404, {})
+
+            def post_challenge(self, endpoint):
+                fault = self.inject(endpoint)
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.startswith("multipart/form-data"):
+                    boundary = content_type.split("boundary=")[-1]
+                    with tempfile.NamedTemporaryFile(
+                        dir=fake.directory, delete=False
+                    ) as f:
+                        self.read_body(f)
+                    try:
+                        if fault:
+                            self.respond(endpoint, fault, None, None)
+                            return
+                        file_range = get_multipart_file(
+                            f.name, boundary, "zip_configuration"
+                        )
+                        if file_range is None:
+                            self.send_json(
+                                400, {"error": "zip_configuration is missing"}
+                            )
+                            return
+                        status, response = fake.receive_challenge(
+                            endpoint, {}, f.name, *file_range
+                        )
+                        self.send_json(status, response)
+                    finally:
+                        os.remove(f.name)
+                    return
+
+                body = self.read_body().decode("utf-8")
+                fields = {key: values[-1] for key, values in parse_qs(body).items()}
+                if fault:
+                    self.respond(endpoint, fault, None, None)
+                    return
+                with fake.lock:
+                    upload = fake.uploads.get(fields.get("upload_id"))
+                if upload is None or upload["offset"] != upload["size"]:
+                    self.send_json(400, {"error": "Unknown or incomplete upload"})
+                    return
+                status, response = fake.receive_challenge(
+                    endpoint, fields, upload["path"], 0, upload["size"]
+                )
+                self.send_json(status, response)
+
+            def do_PUT(self):
+                match = UPLOAD_ROUTE.match(urlparse(self.path).path)
+                with fake.lock:
+                    upload = fake.uploads.get(match and match.group("upload_id"))
+                content_range = CONTENT_RANGE.match(
+                    self.headers.get("Content-Range", "")
+                )
+                if upload is None or content_range is None:
+                    self.read_body()
+                    self.send_json(404, {})
+                    return
+                fault = self.inject("upload_chunk")
+                start = int(content_range.group("start"))
+                if fault == "error" or start != upload["offset"]:
+                    self.read_body()
+                    if fault == "error":
+                        self.respond("upload_chunk", fault, None, None)
+                    else:
+                        self.send_json(409, {"offset": upload["offset"]})
+                    return
+                with open(upload["path"], "ab") as f:
+                    self.read_body(f)
+                    offset = f.tell()
+                with fake.lock:
+                    upload["offset"] = offset
+                # A dropped chunk is stored, only its response is lost
+                self.respond("upload_chunk", fault, 200, {"offset": offset})
+
+            def do_GET(self):
+                match = UPLOAD_ROUTE.match(urlparse(self.path).path)
+                with fake.lock:
+                    upload = fake.uploads.get(match and match.group("upload_id"))
+                if upload is None:
+                    self.send_json(404, {})
+                    return
+                fault = self.inject("upload_status")
+                self.respond("upload_status", fault, 200, {"offset": upload["offset"]})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": dict(self.calls),
+                "injected_errors": dict(self.errors),
+                "bytes_received": self.bytes_received,
+                "challenges": list(self.challenges),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="Fraction of 503 responses"
+    )
+    parser.add_argument(
+        "--drop-rate", type=float, default=0, help="Fraction of dropped connections"
+    )
+    parser.add_argument("--latency", type=float, default=0, help="Seconds per request")
+    args = parser.parse_args()
+
+    fake = FakeChallengeServer(
+        args.port, args.error_rate, args.drop_rate, args.latency
+    ).start()
+    print("Fake challenge server listening on {}".format(fake.url))
+    print("Resumable uploads at {}".format(fake.upload_url))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
+    print(json.dumps(fake.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
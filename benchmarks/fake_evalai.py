@@ -0,0 +1,283 @@
+"""
+Local stand-in for the EvalAI API used by the remote evaluation worker
+
+It implements the endpoints of `remote_challenge_evaluation/eval_ai_interface.py`
+(queue get/delete, submission get, challenge phase get and submission update)
+plus the download of submission files. The queue is filled with
+`queue_depth` submissions at start, and latency and 5xx errors can be injected
+into every request. The server records the timeline of every submission and
+the calls made to each endpoint.
+
+Usage:
+    python -m benchmarks.fake_evalai --port 8888 --queue-depth 100 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROUTES = [
+    (
+        "GET",
+        re.compile(r"^/api/jobs/challenge/queues/(?P<queue>[^/]+)/$"),
+        "get_message_from_sqs_queue",
+    ),
+    (
+        "POST",
+        re.compile(r"^/api/jobs/queues/(?P<queue>[^/]+)/$"),
+        "delete_message_from_sqs_queue",
+    ),
+    ("GET", re.compile(r"^/api/jobs/submission/(?P<pk>\d+)$"), "get_submission_by_pk"),
+    (
+        "GET",
+        re.compile(r"^/api/challenges/challenge/phase/(?P<pk>\d+)$"),
+        "get_challenge_phase_by_pk",
+    ),
+    (
+        "PUT",
+        re.compile(r"^/api/jobs/challenge/(?P<pk>\d+)/update_submission/$"),
+        "update_submission_data",
+    ),
+    (
+        "PATCH",
+        re.compile(r"^/api/jobs/challenge/(?P<pk>\d+)/update_submission/$"),
+        "update_submission_status",
+    ),
+    ("GET", re.compile(r"^/files/(?P<pk>\d+)\.json$"), "download_submission_file"),
+]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing their keep-alive connections are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeEvalAI:
+    """
+    Fake EvalAI API server running in a background thread
+
+    Arguments:
+
+        `port`: Port to listen on, 0 picks a free port
+        `queue_depth`: Number of submissions queued at start
+        `phase_codename`: Codename of the challenge phase of the submissions
+        `latency`: Seconds added to every request
+        `jitter`: Maximum random seconds added on top of `latency`
+        `error_rate`: Fraction of the requests answered with a 503 error
+        `file_size`: Size in bytes of the submission files
+        `seed`: Seed of the injected jitter and errors
+    """
+
+    def __init__(
+        self,
+        port=0,
+        queue_depth=100,
+        phase_codename="dev",
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        file_size=1024,
+        seed=0,
+    ):
+        self.queue_depth = queue_depth
+        self.phase_codename = phase_codename
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.file_content = self.make_file_content(file_size)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.errors = Counter()
+        self.queue = []
+        self.submissions = {}
+        self.fill_queue()
+        self.server = _Server(("127.0.0.1", port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @staticmethod
+    def make_file_content(file_size):
+        record = b'{"id": 0, "label": 1},'
+        content = b"[" + record * max((file_size - 2) // len(record), 0)
+        return content.rstrip(b",") + b"]"
+
+    def fill_queue(self):
+        now = time.time()
+        for pk in range(1, self.queue_depth + 1):
+            self.queue.append(
+                {
+                    "body": {"submission_pk": pk, "phase_pk": 1, "challenge_pk": 1},
+                    "receipt_handle": "receipt-{}".format(pk),
+                }
+            )
+            self.submissions[pk] = {"status": "submitted", "queued_at": now}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def is_done(self):
+        """
+        Returns True once every queued submission is finished or failed
+        """
+        with self.lock:
+            return all(
+                submission["status"] in ("finished", "failed")
+                for submission in self.submissions.values()
+            )
+
+    def record(self, pk, event):
+        submission = self.submissions.get(pk)
+        if submission is not None and event not in submission:
+            submission[event] = time.time()
+
+    def handle(self, endpoint, match, data):
+        """
+        Returns the JSON response of a request, or the bytes of a submission file
+        """
+        with self.lock:
+            if endpoint == "get_message_from_sqs_queue":
+                if not self.queue:
+                    return {"body": {}}
+                message = self.queue.pop(0)
+                self.record(message["body"]["submission_pk"], "dequeued_at")
+                return message
+            if endpoint == "delete_message_from_sqs_queue":
+                return {}
+            if endpoint == "get_submission_by_pk":
+                pk = int(match.group("pk"))
+                self.record(pk, "metadata_at")
+                return {
+                    "id": pk,
+                    "status": self.submissions.get(pk, {}).get("status", "submitted"),
+                    "input_file": "{}/files/{}.json".format(self.url, pk),
+                }
+            if endpoint == "get_challenge_phase_by_pk":
+                return {"id": int(match.group("pk")), "codename": self.phase_codename}
+            if endpoint in ("update_submission_data", "update_submission_status"):
+                pk = int(data.get("submission", 0))
+                status = data.get("submission_status", "").lower()
+                if pk in self.submissions and status:
+                    self.submissions[pk]["status"] = status
+                    self.record(pk, "{}_at".format(status))
+                return {}
+            if endpoint == "download_submission_file":
+                self.record(int(match.group("pk")), "download_started_at")
+                return self.file_content
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def send_body(self, status, body, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def dispatch(self):
+                path = urlparse(self.path).path
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode("utf-8") if length else ""
+                data = {key: values[-1] for key, values in parse_qs(body).items()}
+                for method, pattern, endpoint in ROUTES:
+                    match = pattern.match(path)
+                    if method == self.command and match:
+                        break
+                else:
+                    self.send_body(404, b"{}")
+                    return
+
+                with fake.lock:
+                    fake.calls[endpoint] += 1
+                    delay = fake.latency + fake.random.uniform(0, fake.jitter)
+                    fail = fake.random.random() < fake.error_rate
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    with fake.lock:
+                        fake.errors[endpoint] += 1
+                    self.send_body(503, b'{"error": "Injected error"}')
+                    return
+
+                response = fake.handle(endpoint, match, data)
+                if isinstance(response, bytes):
+                    self.send_body(200, response, "application/octet-stream")
+                    with fake.lock:
+                        fake.record(int(match.group("pk")), "downloaded_at")
+                else:
+                    self.send_body(200, json.dumps(response).encode("utf-8"))
+
+            do_GET = do_POST = do_PUT = do_PATCH = dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def timeline(self):
+        with self.lock:
+            return {pk: dict(submission) for pk, submission in self.submissions.items()}
+
+    def stats(self):
+        with self.lock:
+            return {"calls": dict(self.calls), "injected_errors": dict(self.errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--queue-depth", type=int, default=100)
+    parser.add_argument("--phase-codename", default="dev")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds per request")
+    parser.add_argument("--jitter", type=float, default=0, help="Random extra seconds")
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="Fraction of 503 responses"
+    )
+    parser.add_argument("--file-size", type=int, default=1024, help="Bytes per file")
+    args = parser.parse_args()
+
+    fake = FakeEvalAI(
+        args.port,
+        args.queue_depth,
+        args.phase_codename,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.file_size,
+    ).start()
+    print("Fake EvalAI API listening on {}".format(fake.url))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
+    print(json.dumps(fake.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Load test of the remote evaluation worker against a local fake EvalAI API
+
+The worker of `remote_challenge_evaluation/` is started against
+`fake_evalai.FakeEvalAI` and stopped once the whole queue is processed. The
+end-to-end throughput, the queue wait, the p50/p95/p99 latency of every stage
+and the API call counts are reported. The worker reads its usual environment
+variables, e.g. `NUM_WORKERS` or `WORKER_MODE`.
+
+Usage:
+    python -m benchmarks.load_test --queue-depth 200 --latency 0.05 --error-rate 0.01
+    NUM_WORKERS=8 python -m benchmarks.load_test --worker async_main.py --output report.json
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from .fake_evalai import FakeEvalAI
+
+REMOTE_EVALUATION_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "remote_challenge_evaluation",
+)
+
+# Stages of a submission, as the intervals between the events recorded by the fake API
+STAGES = [
+    ("queue_wait", "queued_at", "dequeued_at"),
+    ("metadata", "dequeued_at", "download_started_at"),
+    ("download", "download_started_at", "downloaded_at"),
+    ("evaluate_and_report", "downloaded_at", "completed_at"),
+    ("end_to_end", "dequeued_at", "completed_at"),
+]
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a list of values
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(int(round(percent / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize_timeline(timeline):
+    """
+    Returns the throughput and the latency percentiles of every stage from the
+    timeline of the submissions recorded by the fake API
+    """
+    completed = []
+    for submission in timeline.values():
+        completed_at = submission.get("finished_at") or submission.get("failed_at")
+        if completed_at:
+            completed.append(dict(submission, completed_at=completed_at))
+    stages = {}
+    for name, start, end in STAGES:
+        durations = [
+            submission[end] - submission[start]
+            for submission in completed
+            if start in submission and end in submission
+        ]
+        stages[name] = {
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "p99": percentile(durations, 99),
+            "max": max(durations) if durations else None,
+        }
+    report = {
+        "submissions": len(timeline),
+        "finished": sum(1 for s in timeline.values() if s["status"] == "finished"),
+        "failed": sum(1 for s in timeline.values() if s["status"] == "failed"),
+        "stages": stages,
+        "submissions_per_minute": None,
+    }
+    if completed:
+        first = min(s.get("dequeued_at", s["queued_at"]) for s in completed)
+        last = max(s["completed_at"] for s in completed)
+        if last > first:
+            report["submissions_per_minute"] = len(completed) * 60 / (last - first)
+    return report
+
+
+def run_load_test(
+    worker="main.py",
+    queue_depth=100,
+    phase_codename="dev",
+    latency=0,
+    jitter=0,
+    error_rate=0,
+    file_size=1024,
+    timeout=600,
+):
+    """
+    Runs the remote evaluation worker against a fake EvalAI API until the queue
+    is processed or `timeout` seconds elapsed, and returns the report
+
+    Arguments:
+
+        `worker`: Script of `remote_challenge_evaluation/` to run
+        `queue_depth`: Number of queued submissions
+        `phase_codename`: Codename of the challenge phase of the submissions
+        `latency`, `jitter`: Seconds added to every API request
+        `error_rate`: Fraction of the API requests answered with a 503 error
+        `file_size`: Size in bytes of the submission files
+        `timeout`: Seconds after which the worker is stopped
+    """
+    fake = FakeEvalAI(
+        queue_depth=queue_depth,
+        phase_codename=phase_codename,
+        latency=latency,
+        jitter=jitter,
+        error_rate=error_rate,
+        file_size=file_size,
+    ).start()
+    with tempfile.TemporaryDirectory() as save_dir:
+        env = dict(
+            os.environ,
+            AUTH_TOKEN="load-test",
+            API_SERVER=fake.url,
+            QUEUE_NAME="load-test-queue",
+            CHALLENGE_PK="1",
+            SAVE_DIR=save_dir,
+        )
+        env.setdefault("POLL_MAX_INTERVAL", "1")
+        start = time.time()
+        process = subprocess.Popen(
+            [sys.executable, worker],
+            cwd=REMOTE_EVALUATION_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            while not fake.is_done() and time.time() - start < timeout:
+                if process.poll() is not None:
+                    break
+                time.sleep(0.1)
+            elapsed = time.time() - start
+        finally:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+            try:
+                _, stderr = process.communicate(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                _, stderr = process.communicate()
+            fake.stop()
+
+    report = summarize_timeline(fake.timeline())
+    report.update(fake.stats())
+    report.update(
+        {
+            "worker": worker,
+            "queue_depth": queue_depth,
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "file_size": file_size,
+            "elapsed": elapsed,
+            "timed_out": not fake.is_done(),
+            "worker_exit_code": process.returncode,
+            "worker_stderr_tail": stderr.splitlines()[-20:],
+            "environment": {
+                name: os.environ[name]
+                for name in ("NUM_WORKERS", "MAX_IN_FLIGHT", "WORKER_MODE", "PREFETCH")
+                if name in os.environ
+            },
+        }
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--worker",
+        default="main.py",
+        help="Script of remote_challenge_evaluation/ to run",
+    )
+    parser.add_argument("--queue-depth", type=int, default=100)
+    parser.add_argument("--phase-codename", default="dev")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds per request")
+    parser.add_argument("--jitter", type=float, default=0, help="Random extra seconds")
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="Fraction of 503 responses"
+    )
+    parser.add_argument("--file-size", type=int, default=1024, help="Bytes per file")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds")
+    parser.add_argument("--output", help="Path of the JSON report")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        args.worker,
+        args.queue_depth,
+        args.phase_codename,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.file_size,
+        args.timeout,
+    )
+    print(
+        "{finished} finished, {failed} failed out of {submissions} in {elapsed:.1f}s".format(
+            **report
+        )
+    )
+    if report["submissions_per_minute"]:
+        print("{:.1f} submissions/minute".format(report["submissions_per_minute"]))
+    for name, stage in report["stages"].items():
+        if stage["p50"] is not None:
+            print(
+                "{:<20} p50 {:.3f}s  p95 {:.3f}s  p99 {:.3f}s".format(
+                    name, stage["p50"], stage["p95"], stage["p99"]
+                )
+            )
+    print("API calls: {}".format(json.dumps(report["calls"], sort_keys=True)))
+    if report["injected_errors"]:
+        print(
+            "Injected errors: {}".format(
+                json.dumps(report["injected_errors"], sort_keys=True)
+            )
+        )
+    if report["timed_out"]:
+        print(
+            "Timed out, worker output:\n{}".format(
+                "\n".join(report["worker_stderr_tail"])
+            )
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Saved the report to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Upload test of the challenge zip file against a local fake EvalAI challenge server
+
+A challenge zip file of `--size` MiB is uploaded by `github/uploader.py` to
+`fake_challenge_server.FakeChallengeServer`, as a streamed multipart form and
+as a chunked resumable upload. The duration, the throughput, the peak memory
+allocated by Python during the upload and the calls and injected errors seen
+by the server are reported.
+
+Usage:
+    python -m benchmarks.upload_test --size 512 --error-rate 0.1 --drop-rate 0.1
+    python -m benchmarks.upload_test --mode chunked --chunk-size 4 --output report.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from .fake_challenge_server import FakeChallengeServer
+
+GITHUB_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "github"
+)
+
+VALIDATION_PATH = (
+    "/api/challenges/challenge/challenge_host_team/1/validate_challenge_config/"
+)
+
+
+def make_challenge_zip(path, size):
+    """
+    Writes a zip file holding `size` bytes of random data, stored without compression
+    """
+    with zipfile.ZipFile(path, "w") as zip_file:
+        with zip_file.open("annotations/test_annotations.bin", "w") as f:
+            while size > 0:
+                block = os.urandom(min(1024 * 1024, size))
+                f.write(block)
+                size -= len(block)
+
+
+def run_upload_test(
+    size_mb=64,
+    modes=("stream", "chunked"),
+    chunk_size_mb=8,
+    error_rate=0,
+    drop_rate=0,
+    latency=0,
+    max_retries=5,
+    backoff_factor=0.1,
+):
+    """
+    Uploads a generated challenge zip file with every mode and returns the report
+
+    Arguments:
+
+        `size_mb`: Size in MiB of the random content of the zip file
+        `modes`: "stream" for the multipart upload, "chunked" for the resumable upload
+        `chunk_size_mb`: Size in MiB of the chunks of the resumable upload
+        `error_rate`, `drop_rate`: Fractions of the requests answered with a 503 error or dropped
+        `latency`: Seconds added to every request
+        `max_retries`, `backoff_factor`: Retries of every request and wait after the first failure
+    """
+    # Read by github/config.py when the uploader is imported
+    os.environ["CHALLENGE_UPLOAD_BACKOFF_FACTOR"] = str(backoff_factor)
+    sys.path.insert(0, GITHUB_DIR)
+    import requests
+    from uploader import upload_challenge_zip, upload_challenge_zip_chunked
+
+    report = {"size_mb": size_mb, "runs": []}
+    with tempfile.TemporaryDirectory() as directory:
+        zip_path = os.path.join(directory, "challenge_config.zip")
+        make_challenge_zip(zip_path, size_mb * 1024 * 1024)
+        with open(zip_path, "rb") as f:
+            expected_sha256 = hashlib.sha256(f.read()).hexdigest()
+        file_size = os.path.getsize(zip_path)
+
+        for mode in modes:
+            fake = FakeChallengeServer(
+                error_rate=error_rate, drop_rate=drop_rate, latency=latency
+            ).start()
+            url = fake.url + VALIDATION_PATH
+            data = {"GITHUB_REPOSITORY": "org/challenge"}
+            headers = {"Authorization": "Bearer test"}
+            tracemalloc.start()
+            start = time.perf_counter()
+            error = None
+            try:
+                with requests.Session() as session:
+                    if mode == "chunked":
+                        response = upload_challenge_zip_chunked(
+                            session,
+                            fake.upload_url,
+                            url,
+                            data,
+                            headers,
+                            zip_path,
+                            max_retries=max_retries,
+                            chunk_size=chunk_size_mb * 1024 * 1024,
+                        )
+                    else:
+                        response = upload_challenge_zip(
+                            session,
+                            url,
+                            data,
+                            headers,
+                            zip_path,
+                            max_retries=max_retries,
+                        )
+                status = response.status_code
+            except Exception as e:
+                status, error = None, repr(e)
+            seconds = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            stats = fake.stats()
+            fake.stop()
+            received = stats.pop("challenges")
+            report["runs"].append(
+                {
+                    "mode": mode,
+                    "status": status,
+                    "error": error,
+                    "seconds": round(seconds, 3),
+                    "mb_per_second": round(file_size / 2**20 / seconds, 2),
+                    "peak_python_memory_mb": round(peak_memory / 2**20, 2),
+                    "intact": bool(received)
+                    and received[-1]["sha256"] == expected_sha256,
+                    "bytes_sent": stats["bytes_received"],
+                    "server": stats,
+                }
+            )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=64, help="MiB of content")
+    parser.add_argument("--mode", choices=["stream", "chunked", "both"], default="both")
+    parser.add_argument("--chunk-size", type=int, default=8, help="MiB per chunk")
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="Fraction of 503 responses"
+    )
+    parser.add_argument(
+        "--drop-rate", type=float, default=0, help="Fraction of dropped connections"
+    )
+    parser.add_argument("--latency", type=float, default=0, help="Seconds per request")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument(
+        "--backoff", type=float, default=0.1, help="Seconds before the first retry"
+    )
+    parser.add_argument("--output", help="Path of the JSON report")
+    args = parser.parse_args()
+
+    report = run_upload_test(
+        args.size,
+        ("stream", "chunked") if args.mode == "both" else (args.mode,),
+        args.chunk_size,
+        args.error_rate,
+        args.drop_rate,
+        args.latency,
+        args.retries,
+        args.backoff,
+    )
+    for run in report["runs"]:
+        print(
+            "{mode:>8}: status {status}, {seconds:.2f}s, {mb_per_second:.1f} MiB/s, "
+            "peak Python memory {peak_python_memory_mb:.1f} MiB, intact {intact}".format(
+                **run
+            )
+        )
+        if run["error"]:
+            print("          error: {}".format(run["error"]))
+        print("          server: {}".format(json.dumps(run["server"])))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+# Upper bound of the memory used by the parsed annotations of a worker process
+DEFAULT_MAX_BYTES = int(os.environ.get("ANNOTATION_CACHE_MAX_BYTES", 4 * 1024**3))
+
+
+def load_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def freeze(value, consume=False):
+    """
+    Returns a read-only copy of parsed JSON along with its approximate size in bytes
+
+    Dicts become `MappingProxyType` views and lists become tuples, so one
+    evaluation can't modify the annotations seen by the next one. With
+    `consume`, the dicts and lists of `value` are emptied while they are copied,
+    so the memory of the original is released as the copy grows instead of
+    both being held at once.
+    """
+    if isinstance(value, dict):
+        frozen, size = {}, sys.getsizeof(value)
+        for key in list(value) if consume else value:
+            item = value.pop(key) if consume else value[key]
+            frozen_item, item_size = freeze(item, consume)
+            frozen[key] = frozen_item
+            size += sys.getsizeof(key) + item_size
+        return MappingProxyType(frozen), size
+    if isinstance(value, list):
+        frozen, size = [], sys.getsizeof(value)
+        if consume:
+            # Popping from the end is cheap, the copy is reversed afterwards
+            while value:
+                frozen_item, item_size = freeze(value.pop(), consume)
+                frozen.append(frozen_item)
+                size += item_size
+            frozen.reverse()
+        else:
+            for item in value:
+                frozen_item, item_size = freeze(item)
+                frozen.append(frozen_item)
+                size += item_size
+        return tuple(frozen), size
+    return value, sys.getsizeof(value)
+
+
+def get_size(value):
+    """
+    Returns the approximate size in bytes of parsed JSON, as computed by `freeze`
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(key) + get_size(item) for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(get_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class AnnotationStore:
+    """
+    Parses annotation files once per worker process and hands the parsed,
+    read-only annotations to every later `evaluate` call
+
+    Entries are keyed by the path, modification time and size of the file and
+    by the phase codename, so an updated annotation file is parsed again. The
+    least recently used entries are evicted once the parsed annotations of all
+    the phases take more than `max_bytes`.
+
+    Arguments:
+
+        `max_bytes`: Approximate memory cap of the store, in bytes
+        `parser`: Function parsing an annotation file path, defaults to JSON
+        `read_only`: Whether to freeze the parsed annotations
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, parser=load_json, read_only=True):
+        self.max_bytes = max_bytes
+        self.parser = parser
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Events set once the entries being parsed are loaded
+        self._loading = {}
+
+    def load(self, path, phase_codename=None):
+        """
+        Returns the parsed annotations of `path` for `phase_codename`
+
+        The file is parsed without holding the lock of the store, so the other
+        lookups aren't blocked meanwhile. Concurrent loads of the same entry
+        wait for the first one instead of parsing the file again.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, phase_codename)
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                loading = self._loading.get(key)
+                if loading is None:
+                    self.misses += 1
+                    loading = self._loading[key] = threading.Event()
+                    break
+            # Another thread is parsing the file, it is parsed again only if
+            # it failed or its annotations were too large to be stored
+            loading.wait()
+
+        try:
+            annotations = self.parser(path)
+            if self.read_only:
+                annotations, size = freeze(annotations, consume=True)
+            else:
+                size = get_size(annotations)
+            with self._lock:
+                # Drop the entries of older versions of the same file
+                for stale_key in [
+                    k for k in self._entries if k[0] == path and k[3] == phase_codename
+                ]:
+                    self._evict(stale_key)
+                if size <= self.max_bytes:
+                    self._entries[key] = (annotations, size)
+                    self._size += size
+                    while self._size > self.max_bytes:
+                        self._evict(next(iter(self._entries)))
+                        self.evictions += 1
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+        return annotations
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Returns the number of hits, misses, evictions, entries and cached bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _evict(self, key):
+        self._size -= self._entries.pop(key)[1]
+
+
+_default_store = AnnotationStore()
+
+
+def load_annotations(test_annotation_file, phase_codename=None):
+    """
+    Returns the parsed, read-only annotations of `test_annotation_file`,
+    parsing the file only the first time it is requested in this process
+
+    Example:
+        >>> from .annotation_store import load_annotations
+        >>> annotations = load_annotations(test_annotation_file, phase_codename)
+    """
+    return _default_store.load(test_annotation_file, phase_codename)
@@ -0,0 +1,242 @@
+"""
+Compiles JSON annotation files into a columnar binary format that evaluation
+scripts can memory-map instead of parsing
+
+A compiled annotation file is a directory holding one `.npy` file per column and
+a `manifest.json`. Loading it maps the arrays read-only, so every worker process
+on a node shares the same page-cached copy of the ground truth.
+
+Usage:
+    python -m evaluation_script.binary_annotations annotations/test_annotations_devsplit.json
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+MANIFEST_FILE_NAME = "manifest.json"
+FORMAT_VERSION = 1
+# Prefix of the directories of conversions in progress and of replaced ones
+TMP_DIR_PREFIX = ".annotations-"
+# Attempts of a reader to load a compiled version while it is being replaced
+LOAD_ATTEMPTS = 10
+
+
+def get_default_output_dir(json_path):
+    root, _ = os.path.splitext(json_path)
+    return root + ".columns"
+
+
+def to_columns(annotations):
+    """
+    Returns the columns of parsed JSON annotations as a dict of lists
+
+    Arguments:
+
+        `annotations`: Either a list of flat records (dicts with the same keys)
+            or a dict mapping column names to lists of the same length
+    """
+    if isinstance(annotations, list):
+        if not annotations:
+            return {}
+        if not all(isinstance(record, dict) for record in annotations):
+            raise ValueError("Annotation records must be JSON objects")
+        names = list(annotations[0])
+        columns = {name: [] for name in names}
+        for index, record in enumerate(annotations):
+            if len(record) != len(names):
+                raise ValueError(
+                    "Annotation record {} doesn't have the keys {}".format(index, names)
+                )
+            for name in names:
+                try:
+                    columns[name].append(record[name])
+                except KeyError:
+                    raise ValueError(
+                        "Annotation record {} is missing the key {!r}".format(
+                            index, name
+                        )
+                    )
+        return columns
+    if isinstance(annotations, dict):
+        lengths = {len(values) for values in annotations.values()}
+        if not all(isinstance(values, list) for values in annotations.values()) or (
+            len(lengths) > 1
+        ):
+            raise ValueError("Annotation columns must be lists of the same length")
+        return annotations
+    raise ValueError("Annotations must be a list of records or a dict of columns")
+
+
+def read_manifest(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_FILE_NAME), "r") as f:
+        return json.load(f)
+
+
+def is_up_to_date(json_path, output_dir):
+    """
+    Returns True if `output_dir` holds the compiled version of `json_path`
+    """
+    try:
+        manifest = read_manifest(output_dir)
+    except FileNotFoundError:
+        # Not compiled yet, or being replaced by another process
+        return False
+    stat = os.stat(json_path)
+    return (
+        manifest.get("format_version") == FORMAT_VERSION
+        and manifest.get("source_mtime_ns") == stat.st_mtime_ns
+        and manifest.get("source_size") == stat.st_size
+    )
+
+
+def compile_annotations(json_path, output_dir=None, force=False):
+    """
+    Compiles a JSON annotation file into memory-mappable `.npy` columns and
+    returns the directory holding them
+
+    The conversion is skipped when the compiled version is up to date.
+
+    Arguments:
+
+        `json_path`: Path to the JSON annotation file
+        `output_dir`: Directory of the compiled annotations, defaults to
+            `<json_path without extension>.columns`
+        `force`: Compile even if the compiled version is up to date
+    """
+    output_dir = output_dir or get_default_output_dir(json_path)
+    if not force and is_up_to_date(json_path, output_dir):
+        return output_dir
+
+    stat = os.stat(json_path)
+    with open(json_path, "r") as f:
+        columns = to_columns(json.load(f))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "source": os.path.basename(json_path),
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_size": stat.st_size,
+        "num_records": len(next(iter(columns.values()))) if columns else 0,
+        # Lets readers check that no other conversion replaced it while loading
+        "build_id": uuid.uuid4().hex,
+        "columns": [],
+    }
+    # Write to a temporary directory first so readers never see a partial conversion
+    parent_dir = os.path.dirname(os.path.abspath(output_dir))
+    tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix=TMP_DIR_PREFIX)
+    try:
+        for index, (name, values) in enumerate(columns.items()):
+            array = np.asarray(values)
+            if array.dtype == object:
+                raise ValueError(
+                    "Column {!r} holds nested or mixed-type values".format(name)
+                )
+            file_name = "column_{}.npy".format(index)
+            np.save(os.path.join(tmp_dir, file_name), array, allow_pickle=False)
+            manifest["columns"].append(
+                {
+                    "name": name,
+                    "file": file_name,
+                    "dtype": array.dtype.str,
+                    "shape": list(array.shape),
+                }
+            )
+        with open(os.path.join(tmp_dir, MANIFEST_FILE_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        _swap_in(tmp_dir, output_dir, json_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return output_dir
+
+
+def _swap_in(tmp_dir, output_dir, json_path):
+    """
+    Moves a conversion to `output_dir`, replacing the previous one
+
+    A non-empty directory can't be replaced in one step, so the previous one is
+    first renamed aside and only deleted once the new one is in place. Readers
+    meanwhile see a complete conversion or none, see `load_columns`. When
+    another process swaps in its own conversion first, this one is dropped if
+    that one is up to date.
+    """
+    aside_dir = os.path.join(
+        os.path.dirname(os.path.abspath(output_dir)),
+        "{}{}".format(TMP_DIR_PREFIX, uuid.uuid4().hex),
+    )
+    try:
+        os.rename(output_dir, aside_dir)
+    except FileNotFoundError:
+        # Not compiled yet, or moved aside by another process
+        aside_dir = None
+    try:
+        os.rename(tmp_dir, output_dir)
+    except OSError:
+        # Another process swapped in its conversion in between
+        if not is_up_to_date(json_path, output_dir):
+            raise
+    finally:
+        if aside_dir is not None:
+            shutil.rmtree(aside_dir, ignore_errors=True)
+
+
+def load_columns(output_dir, mmap_mode="r"):
+    """
+    Returns the compiled annotation columns as a dict of read-only, memory-mapped
+    NumPy arrays
+
+    The compiled version may be replaced by another process while it is
+    loaded. The columns are loaded again if it is missing for a moment or if
+    its manifest changed meanwhile, so they always come from a single
+    conversion.
+
+    Arguments:
+
+        `output_dir`: Directory of the compiled annotations
+        `mmap_mode`: Mode passed to `numpy.load`, `None` reads the arrays in memory
+    """
+    for attempt in range(LOAD_ATTEMPTS):
+        try:
+            manifest = read_manifest(output_dir)
+            columns = {
+                column["name"]: np.load(
+                    os.path.join(output_dir, column["file"]),
+                    mmap_mode=mmap_mode,
+                    allow_pickle=False,
+                )
+                for column in manifest["columns"]
+            }
+            if read_manifest(output_dir).get("build_id") == manifest.get("build_id"):
+                return columns
+        except FileNotFoundError:
+            if attempt == LOAD_ATTEMPTS - 1:
+                raise
+        time.sleep(0.01 * 2**attempt)
+    raise RuntimeError("{} kept being replaced while it was loaded".format(output_dir))
+
+
+def load_binary_annotations(test_annotation_file, output_dir=None):
+    """
+    Returns the memory-mapped columns of a JSON annotation file, compiling it
+    first if needed
+
+    Example:
+        >>> from .binary_annotations import load_binary_annotations
+        >>> columns = load_binary_annotations(test_annotation_file)
+        >>> labels = columns["label"]
+    """
+    return load_columns(compile_annotations(test_annotation_file, output_dir))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for json_path in sys.argv[1:]:
+        print("Compiled {} to {}".format(json_path, compile_annotations(json_path)))
@@ -10,6 +10,19 @@ def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwarg
         `test_annotations_file`: Path to test_annotation_file on the server
         `user_submission_file`: Path to file submitted by the user
         `phase_codename`: Phase to which submission is made
+            The annotations can be loaded with `load_annotations` from
+            `annotation_store.py`, which parses the file only once per worker
+            process and returns the same read-only annotations to later submissions:
+            ```
+            from .annotation_store import load_annotations
+            annotations = load_annotations(test_annotation_file, phase_codename)
+            ```
+            Annotations made of flat records can instead be compiled once into
+            memory-mapped NumPy columns, shared by all the worker processes:
+            ```
+            from .binary_annotations import load_binary_annotations
+            columns = load_binary_annotations(test_annotation_file)
+            ```
 
         `**kwargs`: keyword arguments that contains additional submission
         metadata that challenge hosts can use to send slack notification.
@@ -39,6 +52,9 @@ def evaluate(test_annotation_file, user_submission_file, phase_codename, **kwarg
             'submitted_at': u'2017-03-20T19:22:03.880652Z'
         }
     """
+    # The metrics of every split can be computed over whole prediction arrays
+    # and turned into `output` with the helpers of `metrics.py`, for example:
+    # output = build_output([("train_split", {"Metric1": accuracy(labels, predictions)})])
     output = {}
     if phase_codename == "dev":
         print("Evaluating for Dev Phase")
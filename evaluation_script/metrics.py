@@ -0,0 +1,462 @@
+"""
+Vectorized leaderboard metrics for evaluation scripts
+
+Every metric works on whole NumPy arrays at once instead of looping over the
+predictions in Python, and `build_output` turns the per-split metrics into the
+structure `evaluate` has to return.
+
+Example:
+    >>> from .metrics import accuracy, build_output, precision_recall_f1
+    >>> metrics = {"Accuracy": accuracy(labels, predictions)}
+    >>> metrics.update(precision_recall_f1(labels, predictions))
+    >>> return build_output([("train_split", metrics)])
+"""
+
+from fractions import Fraction
+
+import numpy as np
+
+
+def _safe_divide(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros(np.broadcast(numerator, denominator).shape),
+        where=denominator != 0,
+    )
+
+
+def accuracy(y_true, y_pred):
+    """
+    Returns the fraction of predictions equal to the ground truth
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    if y_true.size == 0:
+        return 0.0
+    return float(np.mean(y_true == y_pred))
+
+
+def confusion_counts(y_true, y_pred, labels=None):
+    """
+    Returns the labels and, for each of them, the number of true positives,
+    predicted positives and actual positives
+
+    Arguments:
+
+        `y_true`: Ground truth labels
+        `y_pred`: Predicted labels
+        `labels`: Labels to count, defaults to every label of `y_true` and `y_pred`
+    """
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    labels = np.union1d(y_true, y_pred) if labels is None else np.unique(labels)
+    num_labels = len(labels)
+    if num_labels == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return labels, empty, empty, empty
+
+    def index_of(values):
+        # Values outside `labels` are mapped to an extra bucket that is dropped
+        index = np.searchsorted(labels, values)
+        index[labels[np.minimum(index, num_labels - 1)] != values] = num_labels
+        return index
+
+    true_index, pred_index = index_of(y_true), index_of(y_pred)
+    correct = true_index == pred_index
+    true_positives = np.bincount(true_index[correct], minlength=num_labels + 1)
+    predicted = np.bincount(pred_index, minlength=num_labels + 1)
+    actual = np.bincount(true_index, minlength=num_labels + 1)
+    return (
+        labels,
+        true_positives[:num_labels],
+        predicted[:num_labels],
+        actual[:num_labels],
+    )
+
+
+def precision_recall_f1(y_true, y_pred, average="macro", labels=None, pos_label=1):
+    """
+    Returns a dict with the precision, recall and F1 score of the predictions
+
+    Arguments:
+
+        `y_true`: Ground truth labels
+        `y_pred`: Predicted labels
+        `average`: "macro" (unweighted mean over labels), "micro" (global counts),
+            "weighted" (mean weighted by the support of each label) or "binary"
+            (scores of `pos_label` only)
+        `labels`: Labels to score, defaults to every label of `y_true` and `y_pred`
+        `pos_label`: Positive label when `average` is "binary"
+    """
+    if average == "binary":
+        labels = [pos_label]
+    labels, true_positives, predicted, actual = confusion_counts(y_true, y_pred, labels)
+    return _precision_recall_f1_from_counts(true_positives, predicted, actual, average)
+
+
+def _precision_recall_f1_from_counts(true_positives, predicted, actual, average):
+    if average == "micro":
+        true_positives, predicted, actual = (
+            true_positives.sum(),
+            predicted.sum(),
+            actual.sum(),
+        )
+    precision = _safe_divide(true_positives, predicted)
+    recall = _safe_divide(true_positives, actual)
+    f1 = _safe_divide(2 * precision * recall, precision + recall)
+    if average in ("macro", "binary"):
+        precision, recall, f1 = precision.mean(), recall.mean(), f1.mean()
+    elif average == "weighted":
+        weights = _safe_divide(actual, actual.sum())
+        precision, recall, f1 = (
+            (precision * weights).sum(),
+            (recall * weights).sum(),
+            (f1 * weights).sum(),
+        )
+    elif average != "micro":
+        raise ValueError("Unknown average: {!r}".format(average))
+    return {"Precision": float(precision), "Recall": float(recall), "F1": float(f1)}
+
+
+def average_precision(y_true, y_score):
+    """
+    Returns the average precision of each column of scores
+
+    Arguments:
+
+        `y_true`: Binary relevance, of shape (n,) or (n, num_classes)
+        `y_score`: Confidence scores, of the same shape as `y_true`
+
+    Columns without any positive get an average precision of NaN.
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_score = np.asarray(y_score, dtype=np.float64)
+    squeeze = y_true.ndim == 1
+    if squeeze:
+        y_true, y_score = y_true[:, None], y_score[:, None]
+    order = np.argsort(-y_score, axis=0, kind="stable")
+    relevant = np.take_along_axis(y_true, order, axis=0)
+    ranks = np.arange(1, len(relevant) + 1, dtype=np.float64)[:, None]
+    precision_at_rank = np.cumsum(relevant, axis=0) / ranks
+    positives = relevant.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ap = (precision_at_rank * relevant).sum(axis=0) / positives
+    ap[positives == 0] = np.nan
+    return ap[0] if squeeze else ap
+
+
+def mean_average_precision(y_true, y_score):
+    """
+    Returns the mean over the classes having a positive of their average precision
+
+    Arguments:
+
+        `y_true`: Binary relevance, of shape (n, num_classes)
+        `y_score`: Confidence scores, of shape (n, num_classes)
+    """
+    ap = np.atleast_1d(average_precision(y_true, y_score))
+    ap = ap[~np.isnan(ap)]
+    return float(ap.mean()) if ap.size else 0.0
+
+
+def rmse(y_true, y_pred):
+    """
+    Returns the root mean squared error of the predictions
+
+    The squared errors are summed exactly, so the result is the same as the one
+    of a `MeanErrorAccumulator` fed the predictions in any number of batches.
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    if y_true.size == 0:
+        return 0.0
+    mse = ExactSum().add(np.square(y_true - y_pred)).mean(y_true.size)
+    return float(np.sqrt(mse))
+
+
+def top_k_accuracy(y_true, y_score, k=5):
+    """
+    Returns the fraction of samples whose label is among the `k` highest scores
+
+    Arguments:
+
+        `y_true`: Ground truth class indices, of shape (n,)
+        `y_score`: Scores of each class, of shape (n, num_classes)
+        `k`: Number of highest scores considered
+    """
+    hits = _top_k_hits(y_true, y_score, k)
+    return float(np.mean(hits)) if hits.size else 0.0
+
+
+def _top_k_hits(y_true, y_score, k):
+    y_true = np.asarray(y_true)
+    y_score = np.asarray(y_score, dtype=np.float64)
+    if y_true.size == 0:
+        return np.zeros(0, dtype=bool)
+    k = min(k, y_score.shape[1])
+    top_k = np.argpartition(-y_score, k - 1, axis=1)[:, :k]
+    return (top_k == y_true[:, None]).any(axis=1)
+
+
+def _to_builtin(value):
+    # JSON can't serialize NumPy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def build_output(split_metrics, submission_result_split=None):
+    """
+    Returns the output of `evaluate` for the metrics computed on every split
+
+    Arguments:
+
+        `split_metrics`: List of (split codename, metrics dict) pairs, or a dict,
+            in the order of the dataset splits of the phase
+        `submission_result_split`: Split whose metrics are shown in the result
+            file, defaults to the first split
+
+    Example:
+        >>> build_output([("train_split", {"Metric1": 0.9, "Total": 0.9})])
+        {
+            "result": [{"train_split": {"Metric1": 0.9, "Total": 0.9}}],
+            "submission_result": {"Metric1": 0.9, "Total": 0.9},
+        }
+    """
+    if isinstance(split_metrics, dict):
+        split_metrics = list(split_metrics.items())
+    result = [
+        {split: {name: _to_builtin(value) for name, value in metrics.items()}}
+        for split, metrics in split_metrics
+    ]
+    output = {"result": result}
+    if result:
+        splits = [split for split, _ in split_metrics]
+        index = splits.index(submission_result_split) if submission_result_split else 0
+        # To display the results in the result file
+        output["submission_result"] = result[index][splits[index]]
+    return output
+
+
+def build_remote_result(split_metrics, hidden_splits=()):
+    """
+    Returns the `result` list expected from a remote evaluation script
+
+    Arguments:
+
+        `split_metrics`: List of (split codename, metrics dict) pairs, or a dict
+        `hidden_splits`: Splits whose metrics are not shown to the participants
+    """
+    if isinstance(split_metrics, dict):
+        split_metrics = list(split_metrics.items())
+    return [
+        {
+            "split": split,
+            "show_to_participant": split not in hidden_splits,
+            "accuracies": {name: _to_builtin(value) for name, value in metrics.items()},
+        }
+        for split, metrics in split_metrics
+    ]
+
+
+class AccuracyAccumulator:
+    """
+    Accumulates the accuracy of predictions given in batches
+
+    Accumulators of different batches can be combined with `merge`, and the
+    result only depends on the batches seen, not on their order.
+    """
+
+    def __init__(self):
+        self.correct = 0
+        self.total = 0
+
+    def update(self, y_true, y_pred):
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        self.correct += int(np.count_nonzero(y_true == y_pred))
+        self.total += int(y_true.size)
+        return self
+
+    def merge(self, other):
+        self.correct += other.correct
+        self.total += other.total
+        return self
+
+    def result(self):
+        return {"Accuracy": self.correct / self.total if self.total else 0.0}
+
+
+class ClassificationAccumulator:
+    """
+    Accumulates the accuracy, precision, recall and F1 score of predicted labels
+    given in batches
+
+    Arguments:
+
+        `average`: Averaging of the precision, recall and F1 score, as in
+            `precision_recall_f1`
+        `pos_label`: Positive label when `average` is "binary"
+    """
+
+    def __init__(self, average="macro", pos_label=1):
+        self.average = average
+        self.pos_label = pos_label
+        self.accuracy = AccuracyAccumulator()
+        self.true_positives = {}
+        self.predicted = {}
+        self.actual = {}
+
+    def update(self, y_true, y_pred):
+        self.accuracy.update(y_true, y_pred)
+        labels, true_positives, predicted, actual = confusion_counts(y_true, y_pred)
+        for label, tp, pred, act in zip(
+            labels.tolist(), true_positives, predicted, actual
+        ):
+            self.true_positives[label] = self.true_positives.get(label, 0) + int(tp)
+            self.predicted[label] = self.predicted.get(label, 0) + int(pred)
+            self.actual[label] = self.actual.get(label, 0) + int(act)
+        return self
+
+    def merge(self, other):
+        self.accuracy.merge(other.accuracy)
+        for counts, other_counts in (
+            (self.true_positives, other.true_positives),
+            (self.predicted, other.predicted),
+            (self.actual, other.actual),
+        ):
+            for label, count in other_counts.items():
+                counts[label] = counts.get(label, 0) + count
+        return self
+
+    def result(self):
+        labels = sorted(self.actual)
+        if self.average == "binary":
+            labels = [self.pos_label]
+        true_positives = np.array([self.true_positives.get(l, 0) for l in labels])
+        predicted = np.array([self.predicted.get(l, 0) for l in labels])
+        actual = np.array([self.actual.get(l, 0) for l in labels])
+        metrics = self.accuracy.result()
+        metrics.update(
+            _precision_recall_f1_from_counts(
+                true_positives, predicted, actual, self.average
+            )
+        )
+        return metrics
+
+
+class ExactSum:
+    """
+    Sums float64 values exactly, whatever their number, order or grouping
+
+    Every finite float64 is a 53-bit integer mantissa times a power of two no
+    smaller than 2**-1126, so the sum is kept as an integer multiple of
+    2**-1126. Its size is bounded by the exponent range, not by the number of
+    values. Infinities and NaNs are summed apart.
+    """
+
+    # Exponents of np.frexp range from -1073 to 1024
+    _MIN_EXPONENT = -1073
+    _NUM_EXPONENTS = 1024 - _MIN_EXPONENT + 1
+    _SHIFT = 53 - _MIN_EXPONENT
+
+    def __init__(self):
+        self.total = 0
+        self.special = 0.0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        if not finite.all():
+            with np.errstate(invalid="ignore"):
+                self.special += float(values[~finite].sum())
+            values = values[finite]
+        mantissas, exponents = np.frexp(values)
+        # The 53 bits of every mantissa as an integer, split in two halves so
+        # that the per-exponent sums of up to 2**36 values fit in 64 bits
+        mantissas = (mantissas * 2.0**53).astype(np.int64)
+        index = exponents - self._MIN_EXPONENT
+        high = np.zeros(self._NUM_EXPONENTS, dtype=np.int64)
+        low = np.zeros(self._NUM_EXPONENTS, dtype=np.int64)
+        np.add.at(high, index, mantissas >> 26)
+        np.add.at(low, index, mantissas & (2**26 - 1))
+        for position in np.flatnonzero(high | low).tolist():
+            self.total += ((int(high[position]) << 26) + int(low[position])) << position
+        return self
+
+    def merge(self, other):
+        self.total += other.total
+        self.special += other.special
+        return self
+
+    def mean(self, count):
+        """
+        Returns the sum divided by `count`, correctly rounded to a float
+        """
+        if self.special != 0.0 or np.isnan(self.special):
+            return self.special
+        return float(Fraction(self.total, count << self._SHIFT))
+
+
+class MeanErrorAccumulator:
+    """
+    Accumulates the mean absolute error, mean squared error and RMSE of
+    predictions given in batches
+
+    The errors are summed exactly with `ExactSum`, so the result is the same
+    however the predictions are split into batches and merged, and matches
+    `rmse()` over all of them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.absolute_error_sum = ExactSum()
+        self.squared_error_sum = ExactSum()
+
+    def update(self, y_true, y_pred):
+        errors = np.asarray(y_pred, dtype=np.float64) - np.asarray(
+            y_true, dtype=np.float64
+        )
+        self.count += int(errors.size)
+        self.absolute_error_sum.add(np.abs(errors))
+        self.squared_error_sum.add(np.square(errors))
+        return self
+
+    def merge(self, other):
+        self.count += other.count
+        self.absolute_error_sum.merge(other.absolute_error_sum)
+        self.squared_error_sum.merge(other.squared_error_sum)
+        return self
+
+    def result(self):
+        if not self.count:
+            return {"MAE": 0.0, "MSE": 0.0, "RMSE": 0.0}
+        mse = self.squared_error_sum.mean(self.count)
+        return {
+            "MAE": self.absolute_error_sum.mean(self.count),
+            "MSE": mse,
+            "RMSE": float(np.sqrt(mse)),
+        }
+
+
+class TopKAccumulator:
+    """
+    Accumulates the top-k accuracy of class scores given in batches
+    """
+
+    def __init__(self, k=5):
+        self.k = k
+        self.accuracy = AccuracyAccumulator()
+
+    def update(self, y_true, y_score):
+        hits = _top_k_hits(y_true, y_score, self.k)
+        self.accuracy.correct += int(np.count_nonzero(hits))
+        self.accuracy.total += int(hits.size)
+        return self
+
+    def merge(self, other):
+        self.accuracy.merge(other.accuracy)
+        return self
+
+    def result(self):
+        return {"Top{}".format(self.k): self.accuracy.result()["Accuracy"]}
@@ -0,0 +1,234 @@
+"""
+Helpers to spread the evaluation of a submission over several CPU cores
+
+`evaluate_sharded` splits the predictions and the matching annotations into
+shards, computes a mergeable accumulator (see `metrics.py`) for each shard in a
+`multiprocessing` pool and merges them in shard order.
+
+Example:
+    >>> from .metrics import ClassificationAccumulator
+    >>> from .parallel import evaluate_sharded
+    >>> def evaluate_shard(predictions, annotations):
+    ...     return ClassificationAccumulator().update(annotations, predictions)
+    >>> metrics = evaluate_sharded(evaluate_shard, predictions, labels).result()
+
+`evaluate_splits` computes the metrics of every dataset split of a phase on its
+own pool process and gathers them, in the configured split order, into the
+output of `evaluate`.
+
+Example:
+    >>> from .parallel import evaluate_splits
+    >>> return evaluate_splits(
+    ...     [
+    ...         ("train_split", lambda: evaluate_split(submission, "train_split")),
+    ...         ("test_split", lambda: evaluate_split(submission, "test_split")),
+    ...     ]
+    ... )
+"""
+
+import multiprocessing
+import os
+
+from .metrics import build_output
+
+DEFAULT_SHARD_SIZE = 100000
+
+# Data of the running `evaluate_sharded` or `evaluate_split_metrics` call,
+# inherited by forked pool processes
+_shared = None
+
+
+def get_length(data):
+    """
+    Returns the number of records of a sequence, an array or a dict of columns
+    """
+    if isinstance(data, dict):
+        lengths = {len(column) for column in data.values()}
+        if len(lengths) > 1:
+            raise ValueError("All the columns must have the same length")
+        return lengths.pop() if lengths else 0
+    return len(data)
+
+
+def get_slice(data, start, stop):
+    """
+    Returns the records `start` to `stop` of a sequence, an array or a dict of columns
+    """
+    if isinstance(data, dict):
+        return {name: column[start:stop] for name, column in data.items()}
+    return data[start:stop]
+
+
+def get_shards(length, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Returns the (start, stop) bounds of the shards of `length` records
+
+    The bounds only depend on `length` and `shard_size`, never on the number of
+    workers, which keeps the merged results identical whatever the parallelism.
+    """
+    return [
+        (start, min(start + shard_size, length))
+        for start in range(0, length, shard_size)
+    ]
+
+
+def get_pool_context(num_workers):
+    """
+    Returns the multiprocessing context used for a pool, or None if the
+    evaluation has to run serially in this process
+    """
+    if num_workers <= 1 or multiprocessing.current_process().daemon:
+        # Daemonic processes are not allowed to have children
+        return None
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _evaluate_shared_shard(bounds):
+    shard_fn, predictions, annotations = _shared
+    start, stop = bounds
+    return shard_fn(
+        get_slice(predictions, start, stop), get_slice(annotations, start, stop)
+    )
+
+
+def _evaluate_shard(task):
+    shard_fn, predictions, annotations = task
+    return shard_fn(predictions, annotations)
+
+
+def evaluate_sharded(
+    shard_fn,
+    predictions,
+    annotations,
+    shard_size=DEFAULT_SHARD_SIZE,
+    num_workers=None,
+):
+    """
+    Evaluates the shards of a submission in parallel and returns their merged
+    accumulator
+
+    The final result is identical to a serial run (`num_workers=1`): shard
+    bounds only depend on `shard_size` and shards are always merged in order.
+    The accumulators of `metrics.py` also merge exactly, so their result is the
+    same as a single pass over the whole submission, whatever `shard_size`.
+
+    Arguments:
+
+        `shard_fn`: Function called as `shard_fn(predictions, annotations)` on
+            every shard, returning an accumulator with a `merge` method
+        `predictions`: Predictions of the submission, as a sequence, an array or
+            a dict of columns
+        `annotations`: Annotations matching the predictions record by record
+        `shard_size`: Number of records per shard
+        `num_workers`: Number of pool processes, defaults to the number of CPUs
+    """
+    length = get_length(predictions)
+    if get_length(annotations) != length:
+        raise ValueError("The submission and the annotations have different lengths")
+    shards = get_shards(length, shard_size)
+    if not shards:
+        shards = [(0, 0)]
+    num_workers = min(num_workers or os.cpu_count() or 1, len(shards))
+    context = get_pool_context(num_workers)
+
+    global _shared
+    if context is None:
+        _shared = (shard_fn, predictions, annotations)
+        try:
+            partials = [_evaluate_shared_shard(bounds) for bounds in shards]
+        finally:
+            _shared = None
+    elif context.get_start_method() == "fork":
+        # Forked processes inherit the data, so the shards are never pickled
+        _shared = (shard_fn, predictions, annotations)
+        try:
+            with context.Pool(num_workers) as pool:
+                partials = pool.map(_evaluate_shared_shard, shards, chunksize=1)
+        finally:
+            _shared = None
+    else:
+        tasks = [
+            (
+                shard_fn,
+                get_slice(predictions, start, stop),
+                get_slice(annotations, start, stop),
+            )
+            for start, stop in shards
+        ]
+        with context.Pool(num_workers) as pool:
+            partials = pool.map(_evaluate_shard, tasks, chunksize=1)
+
+    result = partials[0]
+    for partial in partials[1:]:
+        result = result.merge(partial)
+    return result
+
+
+def _evaluate_shared_split(index):
+    return _shared[index][1]()
+
+
+def _evaluate_split(split_fn):
+    return split_fn()
+
+
+def evaluate_split_metrics(split_fns, num_workers=None):
+    """
+    Computes the metrics of every split in parallel and returns the list of
+    (split codename, metrics dict) pairs in the order of `split_fns`
+
+    Arguments:
+
+        `split_fns`: List of (split codename, function) pairs, or a dict, in the
+            order of the dataset splits. Each function takes no argument and
+            returns the metrics dict of its split
+        `num_workers`: Number of pool processes, defaults to one per split up to
+            the number of CPUs
+    """
+    if isinstance(split_fns, dict):
+        split_fns = list(split_fns.items())
+    num_workers = min(num_workers or os.cpu_count() or 1, len(split_fns))
+    context = get_pool_context(num_workers)
+
+    global _shared
+    if context is None:
+        metrics = [split_fn() for _, split_fn in split_fns]
+    elif context.get_start_method() == "fork":
+        # Forked processes inherit the functions, so they don't need to be picklable
+        _shared = split_fns
+        try:
+            with context.Pool(num_workers) as pool:
+                metrics = pool.map(
+                    _evaluate_shared_split, range(len(split_fns)), chunksize=1
+                )
+        finally:
+            _shared = None
+    else:
+        with context.Pool(num_workers) as pool:
+            metrics = pool.map(
+                _evaluate_split, [split_fn for _, split_fn in split_fns], chunksize=1
+            )
+    return [
+        (split, split_metrics) for (split, _), split_metrics in zip(split_fns, metrics)
+    ]
+
+
+def evaluate_splits(split_fns, num_workers=None, submission_result_split=None):
+    """
+    Computes the metrics of every split in parallel and returns the output of
+    `evaluate`, with the splits in the order of `split_fns`
+
+    Arguments:
+
+        `split_fns`: List of (split codename, function) pairs, or a dict, as in
+            `evaluate_split_metrics`
+        `num_workers`: Number of pool processes, defaults to one per split up to
+            the number of CPUs
+        `submission_result_split`: Split whose metrics are shown in the result
+            file, defaults to the first split
+    """
+    return build_output(
+        evaluate_split_metrics(split_fns, num_workers), submission_result_split
+    )
@@ -0,0 +1,231 @@
+"""
+Streaming readers for large submission files
+
+The records of a submission are read in bounded-size batches, so evaluating a
+prediction file only needs memory for one batch at a time whatever its size.
+Supported formats are JSON arrays of records, JSON objects (read as
+(key, value) pairs), JSON lines, CSV and TSV, each optionally gzip-compressed.
+
+Example:
+    >>> from .metrics import ClassificationAccumulator
+    >>> from .submission_reader import iter_batches
+    >>> accumulator = ClassificationAccumulator()
+    >>> for batch in iter_batches(user_submission_file):
+    ...     accumulator.update(
+    ...         [labels[record["id"]] for record in batch],
+    ...         [record["label"] for record in batch],
+    ...     )
+    >>> metrics = accumulator.result()
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import re
+
+DEFAULT_BATCH_SIZE = 10000
+READ_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# Characters that can continue a number, e.g. "-6." followed by "5e3"
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+def get_file_format(path):
+    """
+    Returns the format ("json", "jsonl", "csv" or "tsv") of a submission file and
+    whether it is gzip-compressed, from its extension
+
+    Files without an extension, e.g. "<uuid>.gz" as stored by EvalAI, get the
+    format sniffed from their content.
+    """
+    name = os.path.basename(path).lower()
+    compressed = name.endswith(".gz")
+    if compressed:
+        name = name[: -len(".gz")]
+    file_format = os.path.splitext(name)[1].lstrip(".")
+    if not file_format:
+        return sniff_file_format(path, compressed), compressed
+    if file_format not in ("json", "jsonl", "csv", "tsv"):
+        raise ValueError("Unsupported submission file format: {}".format(path))
+    return file_format, compressed
+
+
+def sniff_file_format(path, compressed=None):
+    """
+    Returns the format ("json", "jsonl", "csv" or "tsv") of a submission file
+    from its first characters, decompressing it if needed
+
+    A file starting with an object that ends on the first line and is followed
+    by other lines is read as JSON lines, any other array or object as JSON.
+    Other files are read as TSV if their header row has a tab, as CSV otherwise.
+    """
+    with open_text(path, compressed) as f:
+        text = f.read(READ_SIZE).lstrip(_WHITESPACE)
+    if text.startswith("["):
+        return "json"
+    first_line, _, rest = text.partition("\n")
+    if text.startswith("{"):
+        try:
+            _, end = _decoder.raw_decode(first_line)
+        except json.JSONDecodeError:
+            return "json"
+        if first_line[end:].strip(_WHITESPACE) or not rest.strip(_WHITESPACE):
+            return "json"
+        return "jsonl"
+    return "tsv" if "\t" in first_line else "csv"
+
+
+def open_text(path, compressed=None):
+    """
+    Opens a submission file for reading text, decompressing it on the fly if needed
+    """
+    if compressed is None:
+        with open(path, "rb") as f:
+            compressed = f.read(2) == b"\x1f\x8b"
+    if compressed:
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+class _JSONStream:
+    """
+    Incremental parser of the top-level array or object of a JSON text file
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self, size=READ_SIZE):
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        # Drop the parsed part of the buffer
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+
+    def _skip(self, characters):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in characters:
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return
+            self._read()
+
+    def _peek(self):
+        self._skip(_WHITESPACE)
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else ""
+
+    def _expect(self, character):
+        if self._peek() != character:
+            raise ValueError(
+                "Invalid JSON submission: expected {!r} near {!r}".format(
+                    character, self.buffer[self.pos : self.pos + 20]
+                )
+            )
+        self.pos += 1
+
+    def _value(self):
+        self._skip(_WHITESPACE)
+        read_size = READ_SIZE
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next
+                # chunk, even when its start is a valid number on its own
+                if self.eof or _NUMBER_TAIL.match(self.buffer, end).end() < len(
+                    self.buffer
+                ):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # The value is incomplete, read more of the file, faster for big values
+            self._read(read_size)
+            read_size *= 2
+
+    def _items(self, closing):
+        self._skip(_WHITESPACE)
+        if self._peek() == closing:
+            self.pos += 1
+            return
+        while True:
+            yield
+            character = self._peek()
+            self.pos += 1
+            if character == closing:
+                return
+            if character != ",":
+                raise ValueError("Invalid JSON submission: expected ',' or " + closing)
+
+    def __iter__(self):
+        opening = self._peek()
+        if opening == "[":
+            self.pos += 1
+            for _ in self._items("]"):
+                yield self._value()
+        elif opening == "{":
+            self.pos += 1
+            for _ in self._items("}"):
+                key = self._value()
+                self._expect(":")
+                yield key, self._value()
+        else:
+            raise ValueError("A JSON submission must be an array or an object")
+
+
+def iter_records(path, file_format=None):
+    """
+    Yields the records of a submission file one at a time
+
+    Records are dicts for JSON arrays, JSON lines, CSV and TSV files (CSV/TSV
+    values are strings, keyed by the header row) and (key, value) pairs for
+    JSON objects.
+
+    Arguments:
+
+        `path`: Path to the submission file
+        `file_format`: One of "json", "jsonl", "csv" or "tsv", defaults to the
+            format given by the file extension
+    """
+    if file_format is None:
+        file_format, compressed = get_file_format(path)
+    else:
+        compressed = None
+    with open_text(path, compressed) as f:
+        if file_format == "json":
+            for record in _JSONStream(f):
+                yield record
+        elif file_format == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format in ("csv", "tsv"):
+            delimiter = "\t" if file_format == "tsv" else ","
+            for record in csv.DictReader(f, delimiter=delimiter):
+                yield record
+        else:
+            raise ValueError(
+                "Unsupported submission file format: {}".format(file_format)
+            )
+
+
+def iter_batches(path, batch_size=DEFAULT_BATCH_SIZE, file_format=None):
+    """
+    Yields the records of a submission file in lists of at most `batch_size` records
+    """
+    batch = []
+    for record in iter_records(path, file_format):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -14,10 +14,14 @@ from utils import (
     check_if_pull_request,
     create_challenge_zip_file,
     create_github_repository_issue,
+    get_processed_digest,
     get_request_header,
     load_host_configs,
+    save_processed_digest,
     validate_token,
 )
+from uploader import upload_challenge_zip, upload_challenge_zip_chunked
+from zip_builder import hash_file
 
 sys.dont_write_bytecode = True
 
@@ -72,61 +76,45 @@ def configure_requests_for_localhost():
     print("INFO: SSL verification disabled for localhost development server")
 
 
-if __name__ == "__main__":
-    
-    configs = load_host_configs(HOST_CONFIG_FILE_PATH)
-    if configs:
-        HOST_AUTH_TOKEN = configs[0]
-        CHALLENGE_HOST_TEAM_PK = configs[1]
-        EVALAI_HOST_URL = configs[2]
-    else:
-        sys.exit(1)
-
-    # Check if we're using a localhost server and configure accordingly
-    is_localhost = is_localhost_url(EVALAI_HOST_URL)
-    runner_info = get_runner_info()
-    
-    print(f"\n🌐 EvalAI Server: {EVALAI_HOST_URL}")
-    print(f"🏠 Localhost Mode: {is_localhost}")
-    print(f"🤖 Self-hosted Runner: {runner_info['is_self_hosted']}")
-    
-    if is_localhost:
-        configure_requests_for_localhost()
-        print(f"INFO: Using localhost server: {EVALAI_HOST_URL}")
-        
-    # Fetching the url
-    if VALIDATION_STEP == "True":
-        print(f"\n🔍 VALIDATION MODE: Validating challenge configuration...")
-        url = "{}{}".format(
-            EVALAI_HOST_URL,
-            CHALLENGE_CONFIG_VALIDATION_URL.format(CHALLENGE_HOST_TEAM_PK),
-        )
-    else:
-        print(f"\n🚀 CREATION MODE: Creating/updating challenge...")
-        url = "{}{}".format(
-            EVALAI_HOST_URL,
-            CHALLENGE_CREATE_OR_UPDATE_URL.format(CHALLENGE_HOST_TEAM_PK),
-        )
-
-    print(f"📡 API Endpoint: {url}")
-    
-    headers = get_request_header(HOST_AUTH_TOKEN)
-
-    # Creating the challenge zip file and storing in a dict to send to EvalAI
-    print(f"\n📦 Creating challenge configuration package...")
-    create_challenge_zip_file(CHALLENGE_ZIP_FILE_PATH, IGNORE_DIRS, IGNORE_FILES)
-    zip_file = open(CHALLENGE_ZIP_FILE_PATH, "rb")
-    file = {"zip_configuration": zip_file}
+def process_challenge_zip(session, url, headers, is_localhost, is_validation):
+    """
+    Sends the challenge zip file to an EvalAI endpoint, the errors are stored in
+    the CHALLENGE_ERRORS environment variable
 
+    Arguments:
+        session {requests.Session}: The session sending the requests, its connections are reused across endpoints
+        url {str}: The url of the EvalAI endpoint
+        headers {dict}: The headers of the request
+        is_localhost {bool}: Whether EvalAI runs on localhost, the SSL certificate isn't verified then
+        is_validation {bool}: Whether the endpoint only validates the challenge config
+    """
     data = {"GITHUB_REPOSITORY": GITHUB_REPOSITORY}
 
-    # Configure SSL verification based on whether we're using localhost
-    verify_ssl = not is_localhost
-    print(f"🔒 SSL Verification: {'Disabled (localhost)' if not verify_ssl else 'Enabled'}")
-
     try:
         print(f"\n🌐 Sending request to EvalAI server...")
-        response = requests.post(url, data=data, headers=headers, files=file, verify=verify_ssl)
+        # Retrying the creation after the server processed it could create the
+        # challenge twice, only the validation is retried on any server error
+        if CHALLENGE_UPLOAD_URL:
+            response = upload_challenge_zip_chunked(
+                session,
+                CHALLENGE_UPLOAD_URL,
+                url,
+                data,
+                headers,
+                CHALLENGE_ZIP_FILE_PATH,
+                verify=not is_localhost,
+                idempotent=is_validation,
+            )
+        else:
+            response = upload_challenge_zip(
+                session,
+                url,
+                data,
+                headers,
+                CHALLENGE_ZIP_FILE_PATH,
+                verify=not is_localhost,
+                idempotent=is_validation,
+            )
 
         if response.status_code != http.HTTPStatus.OK and response.status_code != http.HTTPStatus.CREATED:
             response.raise_for_status()
@@ -143,7 +131,7 @@ if __name__ == "__main__":
             error_message += f"   2. Is it accessible at {EVALAI_HOST_URL}?\n"
             error_message += "   3. Check server logs for any startup errors\n"
             
-            if runner_info['is_self_hosted']:
+            if get_runner_info()['is_self_hosted']:
                 error_message += "\n💡 Self-hosted runner troubleshooting:\n"
                 error_message += "   • Verify runner can reach the server: ping/curl test\n"
                 error_message += "   • Check network configuration and firewall settings\n"
@@ -167,6 +155,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     except requests.exceptions.HTTPError as err:
+        response = err.response
         if response.status_code in EVALAI_ERROR_CODES:
             is_token_valid = validate_token(response.json())
             if is_token_valid:
@@ -185,7 +174,7 @@ if __name__ == "__main__":
             os.environ["CHALLENGE_ERRORS"] = str(err)
 
     except Exception as e:
-        if VALIDATION_STEP == "True":
+        if is_validation:
             error_message = "\nFollowing errors occurred while validating the challenge config: {}".format(
                 e
             )
@@ -198,10 +187,102 @@ if __name__ == "__main__":
             print(error_message)
             os.environ["CHALLENGE_ERRORS"] = error_message
 
-    zip_file.close()
-    os.remove(zip_file.name)
 
+if __name__ == "__main__":
+    
+    configs = load_host_configs(HOST_CONFIG_FILE_PATH)
+    if configs:
+        HOST_AUTH_TOKEN = configs[0]
+        CHALLENGE_HOST_TEAM_PK = configs[1]
+        EVALAI_HOST_URL = configs[2]
+    else:
+        sys.exit(1)
+
+    # Check if we're using a localhost server and configure accordingly
+    is_localhost = is_localhost_url(EVALAI_HOST_URL)
+    runner_info = get_runner_info()
+    
+    print(f"\n🌐 EvalAI Server: {EVALAI_HOST_URL}")
+    print(f"🏠 Localhost Mode: {is_localhost}")
+    print(f"🤖 Self-hosted Runner: {runner_info['is_self_hosted']}")
+    
+    if is_localhost:
+        configure_requests_for_localhost()
+        print(f"INFO: Using localhost server: {EVALAI_HOST_URL}")
+        
+    # Fetching the urls, IS_VALIDATION=Both validates the challenge config and
+    # then creates or updates the challenge from the same zip file in one run
+    validation_url = "{}{}".format(
+        EVALAI_HOST_URL,
+        CHALLENGE_CONFIG_VALIDATION_URL.format(CHALLENGE_HOST_TEAM_PK),
+    )
+    creation_url = "{}{}".format(
+        EVALAI_HOST_URL,
+        CHALLENGE_CREATE_OR_UPDATE_URL.format(CHALLENGE_HOST_TEAM_PK),
+    )
+    if VALIDATION_STEP == "Both":
+        print(f"\n🔍🚀 VALIDATION AND CREATION MODE: Validating challenge configuration, then creating/updating challenge...")
+        steps = [(True, validation_url), (False, creation_url)]
+    elif VALIDATION_STEP == "True":
+        print(f"\n🔍 VALIDATION MODE: Validating challenge configuration...")
+        steps = [(True, validation_url)]
+    else:
+        print(f"\n🚀 CREATION MODE: Creating/updating challenge...")
+        steps = [(False, creation_url)]
+
+    for _, url in steps:
+        print(f"📡 API Endpoint: {url}")
+    
+    headers = get_request_header(HOST_AUTH_TOKEN)
+
+    # Creating the challenge zip file once, every endpoint is sent the same file
+    print(f"\n📦 Creating challenge configuration package...")
+    create_challenge_zip_file(
+        CHALLENGE_ZIP_FILE_PATH, IGNORE_DIRS, IGNORE_FILES, CHALLENGE_ZIP_CACHE_DIR
+    )
+    challenge_zip_digest = hash_file(CHALLENGE_ZIP_FILE_PATH)
+    print(f"🔑 Package digest: sha256:{challenge_zip_digest}")
+
+    # The archive is byte-identical when the challenge files didn't change, so
+    # the request can be skipped if this endpoint already processed it. Once the
+    # challenge was created from the archive, validating it again is skipped too
+    if FORCE_CHALLENGE_UPLOAD != "True" and (
+        get_processed_digest(CHALLENGE_STATE_FILE_PATH, steps[-1][1])
+        == challenge_zip_digest
+    ):
+        print(
+            "\n⏭️  The challenge configuration didn't change since it was last processed successfully, skipping the request"
+        )
+        os.remove(CHALLENGE_ZIP_FILE_PATH)
+        print("\nExiting the {} script after success\n".format(os.path.basename(__file__)))
+        sys.exit(0)
+
+    # Configure SSL verification based on whether we're using localhost
+    verify_ssl = not is_localhost
+    print(f"🔒 SSL Verification: {'Disabled (localhost)' if not verify_ssl else 'Enabled'}")
+
+    # A single session keeps the connection to EvalAI open between the requests
+    session = requests.Session()
     is_valid, errors = check_for_errors()
+    # Whether the errors come from the validation request, which are then
+    # reported on the pull request
+    failed_is_validation = VALIDATION_STEP == "True"
+    for is_validation, url in steps:
+        if FORCE_CHALLENGE_UPLOAD != "True" and (
+            get_processed_digest(CHALLENGE_STATE_FILE_PATH, url) == challenge_zip_digest
+        ):
+            print(f"\n⏭️  {url} already processed this challenge configuration, skipping the request")
+            continue
+        process_challenge_zip(session, url, headers, is_localhost, is_validation)
+        is_valid, errors = check_for_errors()
+        if not is_valid:
+            failed_is_validation = is_validation
+            break
+        save_processed_digest(CHALLENGE_STATE_FILE_PATH, url, challenge_zip_digest)
+    session.close()
+
+    os.remove(CHALLENGE_ZIP_FILE_PATH)
+
     if not is_valid:
         # Check if this is a localhost connection error - don't create GitHub issues for expected localhost failures
         is_localhost_connection_error = (
@@ -229,7 +310,7 @@ if __name__ == "__main__":
             # Fail the job so CI visibly reports the problem
             sys.exit(1)
 
-        elif VALIDATION_STEP == "True" and check_if_pull_request():
+        elif failed_is_validation and check_if_pull_request():
             pr_number = GITHUB_CONTEXT.get("event", {}).get("number")
             if not pr_number:
                 print("⚠️  Warning: Could not get PR number from GITHUB_CONTEXT")
@@ -9,13 +9,24 @@ CHALLENGE_CREATE_OR_UPDATE_URL = "/api/challenges/challenge/challenge_host_team/
 EVALAI_ERROR_CODES = [400, 401, 406]
 API_HOST_URL = "https://eval.ai"
 IGNORE_DIRS = [
+    ".challenge_zip_cache",
     ".git",
+    "__pycache__",
+    "benchmarks",
     ".github",
     "github",
     "code_upload_challenge_evaluation",
+    "profiles",
     "remote_challenge_evaluation",
+    "tests",
+    "worker",
+    # Compiled annotations of evaluation_script/binary_annotations.py, rebuilt
+    # from the JSON annotation files by the workers
+    "*.columns",
+    ".annotations-*",
 ]
 IGNORE_FILES = [
+    ".DS_Store",
     ".gitignore",
     "challenge_config.zip",
     "README.md",
@@ -23,6 +34,48 @@ IGNORE_FILES = [
     "submission.json",
 ]
 CHALLENGE_ZIP_FILE_PATH = "challenge_config.zip"
+# Previous archives and their manifests, unchanged files are copied from them
+CHALLENGE_ZIP_CACHE_DIR = ".challenge_zip_cache"
+# Digests of the challenge zip files last processed successfully by every EvalAI endpoint
+CHALLENGE_STATE_FILE_PATH = os.path.join(CHALLENGE_ZIP_CACHE_DIR, "processed.json")
+# Files which are already compressed and are stored in the archives as is
+ZIP_STORED_EXTENSIONS = [
+    ".7z",
+    ".bz2",
+    ".gif",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".mp4",
+    ".npz",
+    ".png",
+    ".tgz",
+    ".webp",
+    ".xz",
+    ".zip",
+]
+# Deflate level of the other files by extension, from 1 (fastest) to 9 (smallest)
+ZIP_COMPRESSION_LEVELS = {
+    ".csv": 6,
+    ".json": 6,
+    ".txt": 6,
+}
+ZIP_DEFAULT_COMPRESSION_LEVEL = 6
+# Number of threads compressing the members of the zip files
+ZIP_NUM_WORKERS = int(os.getenv("ZIP_NUM_WORKERS", os.cpu_count() or 1))
+# Timeouts in seconds and retries, with exponential backoff, of the challenge upload
+CHALLENGE_UPLOAD_CONNECT_TIMEOUT = float(
+    os.getenv("CHALLENGE_UPLOAD_CONNECT_TIMEOUT", 10)
+)
+CHALLENGE_UPLOAD_READ_TIMEOUT = float(os.getenv("CHALLENGE_UPLOAD_READ_TIMEOUT", 300))
+CHALLENGE_UPLOAD_MAX_RETRIES = int(os.getenv("CHALLENGE_UPLOAD_MAX_RETRIES", 3))
+CHALLENGE_UPLOAD_BACKOFF_FACTOR = float(os.getenv("CHALLENGE_UPLOAD_BACKOFF_FACTOR", 2))
+# Resumable upload endpoint, the challenge zip file is uploaded in chunks to it if set
+CHALLENGE_UPLOAD_URL = os.getenv("CHALLENGE_UPLOAD_URL")
+CHALLENGE_UPLOAD_CHUNK_SIZE = int(
+    os.getenv("CHALLENGE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+)
 GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY")
 GITHUB_EVENT_NAME = os.getenv("GITHUB_EVENT_NAME")
 VALIDATION_STEP = os.getenv("IS_VALIDATION")
+FORCE_CHALLENGE_UPLOAD = os.getenv("FORCE_CHALLENGE_UPLOAD")
@@ -0,0 +1,402 @@
+import hashlib
+import http
+import os
+import time
+import uuid
+
+import requests
+import urllib3
+
+from config import (
+    CHALLENGE_UPLOAD_BACKOFF_FACTOR,
+    CHALLENGE_UPLOAD_CHUNK_SIZE,
+    CHALLENGE_UPLOAD_CONNECT_TIMEOUT,
+    CHALLENGE_UPLOAD_MAX_RETRIES,
+    CHALLENGE_UPLOAD_READ_TIMEOUT,
+)
+
+# Size of the blocks in which the file is read while streaming it
+BLOCK_SIZE = 64 * 1024
+
+# Maximum seconds between two retries
+MAX_BACKOFF = 60
+
+
+class UploadProgress:
+    """
+    Prints the number of uploaded bytes and the throughput every `interval` seconds
+
+    Arguments:
+        total {int}: The number of bytes to upload
+        interval {float}: The seconds between two progress lines
+    """
+
+    def __init__(self, total, interval=5):
+        self.total = total
+        self.interval = interval
+        self.sent = 0
+        self.start = self.last_print = time.monotonic()
+
+    def update(self, size):
+        self.sent += size
+        now = time.monotonic()
+        if now - self.last_print >= self.interval or self.sent >= self.total:
+            self.last_print = now
+            self.print()
+
+    def print(self):
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        print(
+            "   {:.1f}/{:.1f} MiB uploaded ({:.0f}%) at {:.2f} MiB/s".format(
+                self.sent / 2**20,
+                self.total / 2**20,
+                100.0 * self.sent / self.total if self.total else 100.0,
+                self.sent / 2**20 / elapsed,
+            )
+        )
+
+
+class MultipartFileStream:
+    """
+    File-like multipart/form-data body reading the uploaded file block by block
+
+    The body is never held in memory, requests sends it with a Content-Length
+    header as it is read
+
+    Arguments:
+        fields {dict}: The form fields sent before the file
+        file_field {str}: The name of the file field
+        file_path {str}: The path of the uploaded file
+        progress {UploadProgress}: The progress updated with the bytes read from the file
+    """
+
+    def __init__(self, fields, file_field, file_path, progress=None):
+        self.boundary = uuid.uuid4().hex
+        self.file_path = file_path
+        self.file_size = os.path.getsize(file_path)
+        self.progress = progress
+        self.preamble = b"".join(
+            '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(
+                self.boundary, name, value
+            ).encode("utf-8")
+            for name, value in fields.items()
+            if value is not None
+        ) + (
+            '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+            "Content-Type: application/zip\r\n\r\n".format(
+                self.boundary, file_field, os.path.basename(file_path)
+            ).encode("utf-8")
+        )
+        self.epilogue = "\r\n--{}--\r\n".format(self.boundary).encode("utf-8")
+        self.content_type = "multipart/form-data; boundary={}".format(self.boundary)
+        self._parts = [self.preamble, None, self.epilogue]
+        self._file = None
+
+    def __len__(self):
+        return len(self.preamble) + self.file_size + len(self.epilogue)
+
+    def __iter__(self):
+        block = self.read(BLOCK_SIZE)
+        while block:
+            yield block
+            block = self.read(BLOCK_SIZE)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self)
+        while self._parts:
+            part = self._parts[0]
+            if part is None:
+                if self._file is None:
+                    self._file = open(self.file_path, "rb")
+                block = self._file.read(size)
+                if block:
+                    if self.progress:
+                        self.progress.update(len(block))
+                    return block
+                self._file.close()
+                self._parts.pop(0)
+            elif part:
+                self._parts[0] = part[size:]
+                return part[:size]
+            else:
+                self._parts.pop(0)
+        return b""
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def get_backoff(attempt, backoff_factor=CHALLENGE_UPLOAD_BACKOFF_FACTOR):
+    """
+    Returns the seconds to wait before retrying a failed request
+
+    Arguments:
+        attempt {int}: The number of failed attempts so far, starting at 1
+        backoff_factor {float}: The wait after the first failure, doubled on every failure
+    """
+    return min(backoff_factor * 2 ** (attempt - 1), MAX_BACKOFF)
+
+
+def _is_connect_error(error):
+    """
+    Returns whether a request failed before it reached the server
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.exceptions.ConnectionError) and isinstance(
+        reason, urllib3.exceptions.NewConnectionError
+    )
+
+
+def _is_retryable(response, idempotent):
+    if idempotent:
+        return response.status_code >= http.HTTPStatus.INTERNAL_SERVER_ERROR
+    # A 503 without a body comes from a proxy or a server refusing the request
+    # before handling it, other errors may come after the request was processed
+    return (
+        response.status_code == http.HTTPStatus.SERVICE_UNAVAILABLE
+        and not response.content
+    )
+
+
+def _send_with_retries(send, description, max_retries, idempotent=True):
+    """
+    Calls send() until it returns a response which is not a 5xx error, retrying
+    connection errors and timeouts with exponential backoff
+
+    A request which isn't idempotent, e.g. the creation of the challenge, may
+    have been processed by the server when its response is an error or is lost,
+    so it is only retried when it didn't reach the server: connection failures,
+    connect timeouts and 503 responses without a body.
+
+    Arguments:
+        send {callable}: Sends the request and returns the response
+        description {str}: The description of the request used in the logs
+        max_retries {int}: The number of retries after the first attempt
+        idempotent {bool}: Whether sending the request twice has the same effect as once
+
+    Returns:
+        requests.Response: The last response, possibly a 5xx error once the retries are exhausted
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt > max_retries or not (idempotent or _is_connect_error(e)):
+                raise
+            reason = str(e)
+        else:
+            if not _is_retryable(response, idempotent) or attempt > max_retries:
+                return response
+            reason = "HTTP {}".format(response.status_code)
+        backoff = get_backoff(attempt)
+        print(
+            "⚠️  {} failed ({}), retrying in {:.1f}s ({}/{})".format(
+                description, reason, backoff, attempt, max_retries
+            )
+        )
+        time.sleep(backoff)
+
+
+def upload_challenge_zip(
+    session,
+    url,
+    data,
+    headers,
+    file_path,
+    verify=True,
+    timeout=(CHALLENGE_UPLOAD_CONNECT_TIMEOUT, CHALLENGE_UPLOAD_READ_TIMEOUT),
+    max_retries=CHALLENGE_UPLOAD_MAX_RETRIES,
+    idempotent=True,
+):
+    """
+    Uploads the challenge zip file as the `zip_configuration` field of a multipart
+    form, streaming it from the disk
+
+    Connection errors, timeouts and 5xx responses are retried with exponential
+    backoff, only the failures that didn't reach the server if the request isn't
+    `idempotent`
+
+    Arguments:
+        session {requests.Session}: The session sending the request
+        url {str}: The url of the EvalAI endpoint
+        data {dict}: The other form fields
+        headers {dict}: The headers of the request, e.g. the authorization header
+        file_path {str}: The path of the challenge zip file
+        verify {bool}: Whether the SSL certificate of the server is verified
+        timeout {tuple}: The connect and read timeouts in seconds
+        max_retries {int}: The number of retries after the first attempt
+        idempotent {bool}: Whether the endpoint can process the same request twice, False for the challenge creation
+
+    Returns:
+        requests.Response: The response of EvalAI
+    """
+    start = time.monotonic()
+    size = os.path.getsize(file_path)
+
+    def send():
+        progress = UploadProgress(size)
+        body = MultipartFileStream(data, "zip_configuration", file_path, progress)
+        try:
+            return session.post(
+                url,
+                data=body,
+                headers=dict(headers, **{"Content-Type": body.content_type}),
+                verify=verify,
+                timeout=timeout,
+            )
+        finally:
+            body.close()
+
+    response = _send_with_retries(send, "Upload", max_retries, idempotent)
+    print(
+        "📤 Uploaded {:.1f} MiB in {:.1f}s".format(
+            size / 2**20, time.monotonic() - start
+        )
+    )
+    return response
+
+
+def upload_challenge_zip_chunked(
+    session,
+    upload_url,
+    url,
+    data,
+    headers,
+    file_path,
+    verify=True,
+    timeout=(CHALLENGE_UPLOAD_CONNECT_TIMEOUT, CHALLENGE_UPLOAD_READ_TIMEOUT),
+    max_retries=CHALLENGE_UPLOAD_MAX_RETRIES,
+    chunk_size=CHALLENGE_UPLOAD_CHUNK_SIZE,
+    idempotent=True,
+):
+    """
+    Uploads the challenge zip file in chunks to a resumable upload endpoint, then
+    sends the upload id to the EvalAI endpoint in place of the file
+
+    The upload is created with a POST of the size and the sha256 digest of the
+    file to `upload_url`, which returns its id and the offset already received,
+    so an interrupted upload of the same file resumes where it stopped. Every
+    chunk is sent with a PUT to `<upload_url><id>/` and a `Content-Range` header,
+    and retried on its own. A GET of `<upload_url><id>/` returns the offset
+    received by the server. See `benchmarks/fake_challenge_server.py` for a
+    server implementing this protocol.
+
+    Arguments:
+        session {requests.Session}: The session sending the requests
+        upload_url {str}: The url of the resumable upload endpoint
+        url {str}: The url of the EvalAI endpoint
+        data {dict}: The other form fields
+        headers {dict}: The headers of the requests, e.g. the authorization header
+        file_path {str}: The path of the challenge zip file
+        verify {bool}: Whether the SSL certificate of the server is verified
+        timeout {tuple}: The connect and read timeouts in seconds
+        max_retries {int}: The number of retries of every request after the first attempt
+        chunk_size {int}: The size in bytes of the chunks
+        idempotent {bool}: Whether the EvalAI endpoint can process the same request twice, False for the challenge creation
+
+    Returns:
+        requests.Response: The response of EvalAI
+    """
+    start = time.monotonic()
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+
+    def create():
+        return session.post(
+            upload_url,
+            json={
+                "filename": os.path.basename(file_path),
+                "size": size,
+                "sha256": digest.hexdigest(),
+            },
+            headers=headers,
+            verify=verify,
+            timeout=timeout,
+        )
+
+    response = _send_with_retries(create, "Upload creation", max_retries)
+    response.raise_for_status()
+    upload = response.json()
+    upload_id, offset = upload["upload_id"], upload["offset"]
+    chunk_url = "{}{}/".format(upload_url, upload_id)
+    if offset:
+        print("⏯️  Resuming the upload at {:.1f} MiB".format(offset / 2**20))
+
+    progress = UploadProgress(size)
+    progress.sent = offset
+    with open(file_path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            end = offset + len(chunk)
+
+            def send_chunk():
+                return session.put(
+                    chunk_url,
+                    data=chunk,
+                    headers=dict(
+                        headers,
+                        **{
+                            "Content-Range": "bytes {}-{}/{}".format(
+                                offset, end - 1, size
+                            ),
+                            "Content-Type": "application/octet-stream",
+                        }
+                    ),
+                    verify=verify,
+                    timeout=timeout,
+                )
+
+            try:
+                response = _send_with_retries(send_chunk, "Chunk upload", max_retries)
+            except requests.exceptions.RequestException:
+                response = None
+            if response is not None and response.ok:
+                offset = response.json()["offset"]
+            else:
+                # Ask the server where to resume, e.g. after a chunk was received
+                # but its response was lost
+                response = _send_with_retries(
+                    lambda: session.get(
+                        chunk_url, headers=headers, verify=verify, timeout=timeout
+                    ),
+                    "Upload status",
+                    max_retries,
+                )
+                response.raise_for_status()
+                if response.json()["offset"] <= offset:
+                    raise requests.exceptions.HTTPError(
+                        "The server didn't accept the chunk at offset {}".format(
+                            offset
+                        ),
+                        response=response,
+                    )
+                offset = response.json()["offset"]
+            progress.update(offset - progress.sent)
+
+    print(
+        "📤 Uploaded {:.1f} MiB in {:.1f}s".format(
+            size / 2**20, time.monotonic() - start
+        )
+    )
+    return _send_with_retries(
+        lambda: session.post(
+            url,
+            data=dict(data, upload_id=upload_id),
+            headers=headers,
+            verify=verify,
+            timeout=timeout,
+        ),
+        "Upload completion",
+        max_retries,
+        idempotent,
+    )
@@ -1,10 +1,10 @@
 import json
 import os
 import sys
-import zipfile
 
 from config import *
 from github import Github
+from zip_builder import build_zip_file, get_zip_files, print_zip_report
 
 
 def check_for_errors():
@@ -72,7 +72,9 @@ def create_github_repository_issue(
         print("There was an error while creating an issue: {}".format(e))
 
 
-def create_challenge_zip_file(challenge_zip_file_path, ignore_dirs, ignore_files):
+def create_challenge_zip_file(
+    challenge_zip_file_path, ignore_dirs, ignore_files, cache_dir=None
+):
     """
     Creates the challenge zip file at a given path
     
@@ -80,6 +82,7 @@ def create_challenge_zip_file(challenge_zip_file_path, ignore_dirs, ignore_files
         challenge_zip_file_path {str}: The relative path of the created zip file
         ignore_dirs {list}: The list of directories to exclude from the zip file
         ignore_files {list}: The list of files to exclude from the zip file
+        cache_dir {str}: The directory of the previous zip files, unchanged files are copied from them
     """
     working_dir = (
         os.getcwd()
@@ -87,35 +90,53 @@ def create_challenge_zip_file(challenge_zip_file_path, ignore_dirs, ignore_files
 
     # Creating evaluation_script.zip file
     eval_script_dir = working_dir + "/evaluation_script"
-    eval_script_zip = zipfile.ZipFile(
-        "evaluation_script.zip", "w", zipfile.ZIP_DEFLATED
+    report = build_zip_file(
+        "evaluation_script.zip", get_zip_files(eval_script_dir), cache_dir
     )
-    for root, dirs, files in os.walk(eval_script_dir):
-        for file in files:
-            file_name = os.path.join(root, file)
-            name_in_zip_file = (
-                file_name[len(eval_script_dir) + 1 :]
-                if file_name.startswith(eval_script_dir)
-                else file_name
-            )
-            eval_script_zip.write(file_name, name_in_zip_file)
-    eval_script_zip.close()
+    print_zip_report("evaluation_script.zip", report)
 
     # Creating the challenge_config.zip file
-    zipf = zipfile.ZipFile(challenge_zip_file_path, "w", zipfile.ZIP_DEFLATED)
-    for root, dirs, files in os.walk(working_dir):
-        parents = root.split("/")
-        if not set(parents) & set(ignore_dirs):
-            for file in files:
-                if file not in ignore_files:
-                    file_name = os.path.join(root, file)
-                    name_in_zip_file = (
-                        file_name[len(working_dir) + 1 :]
-                        if file_name.startswith(working_dir)
-                        else file_name
-                    )
-                    zipf.write(file_name, name_in_zip_file)
-    zipf.close()
+    report = build_zip_file(
+        challenge_zip_file_path,
+        get_zip_files(working_dir, ignore_dirs, ignore_files),
+        cache_dir,
+    )
+    print_zip_report(challenge_zip_file_path, report)
+
+
+def get_processed_digest(state_file_path, url):
+    """
+    Returns the digest of the challenge zip file last processed successfully by an EvalAI endpoint
+
+    Arguments:
+        state_file_path {str}: The path of the file recording the processed digests
+        url {str}: The url of the EvalAI endpoint
+    """
+    try:
+        with open(state_file_path, "r") as f:
+            return json.load(f).get(url)
+    except (OSError, ValueError):
+        return None
+
+
+def save_processed_digest(state_file_path, url, digest):
+    """
+    Records the digest of a challenge zip file processed successfully by an EvalAI endpoint
+
+    Arguments:
+        state_file_path {str}: The path of the file recording the processed digests
+        url {str}: The url of the EvalAI endpoint
+        digest {str}: The digest of the challenge zip file
+    """
+    try:
+        with open(state_file_path, "r") as f:
+            digests = json.load(f)
+    except (OSError, ValueError):
+        digests = {}
+    digests[url] = digest
+    os.makedirs(os.path.dirname(state_file_path) or ".", exist_ok=True)
+    with open(state_file_path, "w") as f:
+        json.dump(digests, f, indent=2, sort_keys=True)
 
 
 def get_request_header(token):
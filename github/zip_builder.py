@@ -0,0 +1,623 @@
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    CHALLENGE_ZIP_CACHE_DIR,
+    CHALLENGE_ZIP_FILE_PATH,
+    IGNORE_DIRS,
+    IGNORE_FILES,
+    ZIP_COMPRESSION_LEVELS,
+    ZIP_DEFAULT_COMPRESSION_LEVEL,
+    ZIP_NUM_WORKERS,
+    ZIP_STORED_EXTENSIONS,
+)
+
+# Size of the chunks in which files are hashed, compressed and copied
+CHUNK_SIZE = 1024 * 1024
+
+# Version of the manifest format, manifests of another version are ignored
+MANIFEST_VERSION = 2
+
+# Timestamp of all the members, so that the same files give the same archive
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Headers of the zip format, the same as the ones written by zipfile
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+END_RECORD = struct.Struct("<4s4H2LH")
+END_RECORD_SIGNATURE = b"PK\x05\x06"
+ZIP_VERSION = 20
+ZIP_UTF8_FLAG = 0x800
+
+# Limits of the archives written without the ZIP64 extensions, as in zipfile.
+# Larger archives are written by zipfile, compressing every member again
+ZIP_MAX_SIZE = (1 << 31) - 1
+ZIP_MAX_MEMBERS = (1 << 16) - 1
+
+
+class ZipLimitError(Exception):
+    """
+    Raised when an archive needs the ZIP64 extensions
+    """
+
+
+def get_zip_files(base_dir, ignore_dirs=(), ignore_files=()):
+    """
+    Returns the files to archive below a directory, sorted by their name in the archive
+
+    Ignored directories are pruned during the walk, so their content is never listed
+
+    Arguments:
+        base_dir {str}: The directory to archive
+        ignore_dirs {list}: The names, or fnmatch patterns, of the directories to exclude
+        ignore_files {list}: The names, or fnmatch patterns, of the files to exclude
+    """
+    files = []
+    for root, dirs, file_names in os.walk(base_dir):
+        dirs[:] = sorted(d for d in dirs if not is_ignored(d, ignore_dirs))
+        for file_name in sorted(file_names):
+            if is_ignored(file_name, ignore_files):
+                continue
+            file_path = os.path.join(root, file_name)
+            files.append((file_path, os.path.relpath(file_path, base_dir)))
+    return sorted(files, key=lambda file: file[1])
+
+
+def is_ignored(name, patterns):
+    """
+    Returns whether a file or directory name matches one of the ignored names or patterns
+
+    Arguments:
+        name {str}: The name of the file or directory
+        patterns {list}: The names or fnmatch patterns to exclude
+    """
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def get_compression_level(name):
+    """
+    Returns the deflate level of an archive member, 0 if it is stored without compression
+
+    Already compressed files are stored as is, the level of the other files is
+    looked up by extension in ZIP_COMPRESSION_LEVELS
+
+    Arguments:
+        name {str}: The name of the member
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension in ZIP_STORED_EXTENSIONS:
+        return 0
+    return ZIP_COMPRESSION_LEVELS.get(extension, ZIP_DEFAULT_COMPRESSION_LEVEL)
+
+
+def hash_file(file_path):
+    """
+    Returns the sha256 hex digest of the content of a file
+
+    Arguments:
+        file_path {str}: The path of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """
+    Returns the members recorded in a manifest, an empty dict if it is missing or unreadable
+
+    Arguments:
+        manifest_path {str}: The path of the manifest
+    """
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("members", {})
+
+
+def get_previous_members(zip_file_path):
+    """
+    Returns the members of a previous archive whose compressed data can be copied,
+    an empty dict if it is missing or unreadable
+
+    Arguments:
+        zip_file_path {str}: The path of the previous archive
+
+    Returns:
+        dict: The zipfile.ZipInfo and the offset of the compressed data of every member by name
+    """
+    members = {}
+    try:
+        with zipfile.ZipFile(zip_file_path, "r") as zip_file:
+            infos = zip_file.infolist()
+        with open(zip_file_path, "rb") as f:
+            for info in infos:
+                # Encrypted members and members followed by a data descriptor
+                # can't be copied as is
+                if info.flag_bits & 0x09:
+                    continue
+                f.seek(info.header_offset)
+                header = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+                if header[0] != LOCAL_HEADER_SIGNATURE:
+                    return {}
+                members[info.filename] = (
+                    info,
+                    info.header_offset + LOCAL_HEADER.size + header[-2] + header[-1],
+                )
+    except (OSError, struct.error, zipfile.BadZipFile):
+        return {}
+    return members
+
+
+def _compress_file(file_path, level):
+    """
+    Compresses a file to a temporary file, in the raw deflate format of zip files
+
+    Arguments:
+        file_path {str}: The path of the file
+        level {int}: The deflate level, 0 copies the file as is
+
+    Returns:
+        tuple: The temporary file, the CRC-32, the size of the file and the size of the content
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if level else None
+    data_file = tempfile.TemporaryFile()
+    crc = file_size = 0
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            data_file.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        data_file.write(compressor.flush())
+    return data_file, crc, file_size, data_file.tell()
+
+
+def _prepare_member(file_path, name_in_zip_file, previous, reusable):
+    """
+    Hashes a file and compresses it, unless the member of the previous archive can be reused
+
+    Runs in the thread pool of build_zip_file, zlib releases the GIL while compressing
+
+    Arguments:
+        file_path {str}: The path of the file
+        name_in_zip_file {str}: The name of the member
+        previous {dict}: The manifest entry of the member in the previous archive
+        reusable {bool}: Whether the previous archive has the member
+    """
+    start = time.perf_counter()
+    file_stat = os.stat(file_path)
+    level = get_compression_level(name_in_zip_file)
+    executable = bool(file_stat.st_mode & 0o111)
+    if previous.get("size") == file_stat.st_size and (
+        previous.get("mtime_ns") == file_stat.st_mtime_ns
+    ):
+        digest = previous["sha256"]
+    else:
+        digest = hash_file(file_path)
+    member = {
+        "file_path": file_path,
+        "name": name_in_zip_file,
+        "manifest": {
+            "sha256": digest,
+            "size": file_stat.st_size,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "level": level,
+            "executable": executable,
+        },
+    }
+    if reusable and all(
+        previous.get(key) == member["manifest"][key]
+        for key in ("sha256", "level", "executable")
+    ):
+        member["action"] = "reused"
+    else:
+        member["action"] = "compressed" if level else "stored"
+        (
+            member["data_file"],
+            member["crc"],
+            member["file_size"],
+            member["compress_size"],
+        ) = _compress_file(file_path, level)
+    member["seconds"] = time.perf_counter() - start
+    return member
+
+
+def _copy_bytes(source, target, size):
+    while size > 0:
+        chunk = source.read(min(CHUNK_SIZE, size))
+        if not chunk:
+            raise zipfile.BadZipFile("Unexpected end of the archive data")
+        target.write(chunk)
+        size -= len(chunk)
+
+
+def _encode_name(info):
+    try:
+        return info.filename.encode("ascii"), info.flag_bits
+    except UnicodeEncodeError:
+        return info.filename.encode("utf-8"), info.flag_bits | ZIP_UTF8_FLAG
+
+
+def _get_dos_date_time(info):
+    year, month, day, hours, minutes, seconds = info.date_time
+    return (
+        (year - 1980) << 9 | month << 5 | day,
+        hours << 11 | minutes << 5 | seconds // 2,
+    )
+
+
+def _write_member(zip_file, info, source):
+    """
+    Appends a member to an archive from its already compressed data
+
+    Arguments:
+        zip_file {file}: The archive being written
+        info {zipfile.ZipInfo}: The member with its CRC and sizes, its header_offset is set here
+        source {file}: The file to copy from, positioned at the start of the compressed data
+    """
+    info.header_offset = zip_file.tell()
+    if max(info.file_size, info.compress_size, info.header_offset) > ZIP_MAX_SIZE:
+        raise ZipLimitError(info.filename)
+    name, flag_bits = _encode_name(info)
+    dos_date, dos_time = _get_dos_date_time(info)
+    zip_file.write(
+        LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE,
+            ZIP_VERSION,
+            0,
+            flag_bits,
+            info.compress_type,
+            dos_time,
+            dos_date,
+            info.CRC,
+            info.compress_size,
+            info.file_size,
+            len(name),
+            0,
+        )
+        + name
+    )
+    _copy_bytes(source, zip_file, info.compress_size)
+
+
+def _write_central_directory(zip_file, infos):
+    """
+    Appends the central directory and the end record to an archive
+
+    Arguments:
+        zip_file {file}: The archive being written
+        infos {list}: The members written by _write_member
+    """
+    if len(infos) > ZIP_MAX_MEMBERS:
+        raise ZipLimitError("{} members".format(len(infos)))
+    start = zip_file.tell()
+    for info in infos:
+        name, flag_bits = _encode_name(info)
+        dos_date, dos_time = _get_dos_date_time(info)
+        zip_file.write(
+            CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_SIGNATURE,
+                ZIP_VERSION,
+                info.create_system,
+                ZIP_VERSION,
+                0,
+                flag_bits,
+                info.compress_type,
+                dos_time,
+                dos_date,
+                info.CRC,
+                info.compress_size,
+                info.file_size,
+                len(name),
+                0,
+                0,
+                0,
+                0,
+                info.external_attr,
+                info.header_offset,
+            )
+            + name
+        )
+    end = zip_file.tell()
+    if end > ZIP_MAX_SIZE:
+        raise ZipLimitError("central directory at {}".format(start))
+    zip_file.write(
+        END_RECORD.pack(
+            END_RECORD_SIGNATURE, 0, 0, len(infos), len(infos), end - start, start, 0
+        )
+    )
+
+
+def _get_zip_info(member):
+    """
+    Returns the header of a member prepared by _prepare_member, without its CRC and sizes
+
+    The timestamp and the permissions are fixed, so that the header only depends
+    on the name and the content of the file
+
+    Arguments:
+        member {dict}: The member returned by _prepare_member
+    """
+    info = zipfile.ZipInfo(member["name"], date_time=ZIP_DATE_TIME)
+    info.create_system = 3
+    mode = 0o755 if member["manifest"]["executable"] else 0o644
+    info.external_attr = (stat.S_IFREG | mode) << 16
+    info.compress_type = (
+        zipfile.ZIP_DEFLATED if member["manifest"]["level"] else zipfile.ZIP_STORED
+    )
+    return info
+
+
+def _write_zip64_file(zip_file_path, members):
+    """
+    Creates an archive with zipfile, which writes the ZIP64 extensions, compressing
+    every member again
+
+    Arguments:
+        zip_file_path {str}: The path of the created zip file
+        members {list}: The members returned by _prepare_member
+
+    Returns:
+        list: The written zipfile.ZipInfo members
+    """
+    infos = []
+    with zipfile.ZipFile(zip_file_path, "w") as zip_file:
+        for member in members:
+            member["action"] = "compressed" if member["manifest"]["level"] else "stored"
+            info = _get_zip_info(member)
+            with open(member["file_path"], "rb") as f:
+                zip_file.writestr(
+                    info, f.read(), compresslevel=member["manifest"]["level"] or None
+                )
+            infos.append(info)
+    return infos
+
+
+def _write_zip_file(zip_file_path, futures, previous_zip_file_path, previous_members):
+    """
+    Creates an archive from the members prepared in the thread pool, in the order of `futures`
+
+    Arguments:
+        zip_file_path {str}: The path of the created zip file
+        futures {list}: The futures of the members returned by _prepare_member
+        previous_zip_file_path {str}: The path of the previous archive, None if no member is reused
+        previous_members {dict}: The members of the previous archive returned by get_previous_members
+
+    Returns:
+        tuple: The members returned by _prepare_member and the written zipfile.ZipInfo members
+    """
+    prepared = []
+    infos = []
+    with open(zip_file_path, "wb") as zip_file:
+        previous_zip = (
+            open(previous_zip_file_path, "rb") if previous_zip_file_path else None
+        )
+        try:
+            for future in futures:
+                member = future.result()
+                prepared.append(member)
+                info = _get_zip_info(member)
+                if member["action"] == "reused":
+                    previous_info, data_offset = previous_members[member["name"]]
+                    info.CRC = previous_info.CRC
+                    info.file_size = previous_info.file_size
+                    info.compress_size = previous_info.compress_size
+                    previous_zip.seek(data_offset)
+                    _write_member(zip_file, info, previous_zip)
+                else:
+                    info.CRC = member["crc"]
+                    info.file_size = member["file_size"]
+                    info.compress_size = member["compress_size"]
+                    with member.pop("data_file") as data_file:
+                        data_file.seek(0)
+                        _write_member(zip_file, info, data_file)
+                infos.append(info)
+            _write_central_directory(zip_file, infos)
+        finally:
+            if previous_zip is not None:
+                previous_zip.close()
+    return prepared, infos
+
+
+def build_zip_file(zip_file_path, files, cache_dir=None, num_workers=ZIP_NUM_WORKERS):
+    """
+    Creates a zip file, compressing its members in parallel and copying the members
+    which didn't change from the previous build
+
+    Members are sorted by name and have a fixed timestamp, so the same files
+    always give a byte-identical archive.
+
+    A copy of the archive and a manifest of the content hashes of its members are
+    kept in `cache_dir`. Files whose hash matches the manifest are copied raw from
+    the previous archive instead of being compressed again. The other files are
+    compressed by a pool of `num_workers` threads and the archive is assembled in
+    the order of `files`. Archives which need the ZIP64 extensions are written by
+    zipfile instead, compressing every member again.
+
+    Arguments:
+        zip_file_path {str}: The path of the created zip file
+        files {list}: The (path, name in the zip file) pairs of the files to archive
+        cache_dir {str}: The directory of the previous archive and its manifest, None disables reuse
+        num_workers {int}: The number of compression threads
+
+    Returns:
+        dict: The bytes in and out and the time of every member and of the archive
+    """
+    start = time.perf_counter()
+    previous_members = {}
+    manifest = {}
+    if cache_dir:
+        cached_zip_file_path = os.path.join(cache_dir, os.path.basename(zip_file_path))
+        manifest_path = cached_zip_file_path + ".json"
+        manifest = load_manifest(manifest_path)
+        if manifest:
+            previous_members = get_previous_members(cached_zip_file_path)
+
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        futures = [
+            executor.submit(
+                _prepare_member,
+                file_path,
+                name_in_zip_file,
+                manifest.get(name_in_zip_file, {}),
+                name_in_zip_file in previous_members,
+            )
+            for file_path, name_in_zip_file in files
+        ]
+        try:
+            prepared, infos = _write_zip_file(
+                zip_file_path,
+                futures,
+                cached_zip_file_path if previous_members else None,
+                previous_members,
+            )
+        except ZipLimitError:
+            prepared = [future.result() for future in futures]
+            for member in prepared:
+                if "data_file" in member:
+                    member.pop("data_file").close()
+            infos = _write_zip64_file(zip_file_path, prepared)
+
+    report = {"members": [], "bytes_in": 0, "bytes_out": 0}
+    members = {}
+    for member, info in zip(prepared, infos):
+        members[member["name"]] = member["manifest"]
+        report["members"].append(
+            {
+                "name": member["name"],
+                "action": member["action"],
+                "bytes_in": info.file_size,
+                "bytes_out": info.compress_size,
+                "seconds": member["seconds"],
+            }
+        )
+        report["bytes_in"] += info.file_size
+        report["bytes_out"] += info.compress_size
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        shutil.copyfile(zip_file_path, cached_zip_file_path + ".tmp")
+        os.replace(cached_zip_file_path + ".tmp", cached_zip_file_path)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "members": members},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        os.replace(manifest_path + ".tmp", manifest_path)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def print_zip_report(zip_file_path, report):
+    """
+    Prints the bytes in and out and the time of every member of an archive built by build_zip_file
+
+    Arguments:
+        zip_file_path {str}: The path of the zip file
+        report {dict}: The report returned by build_zip_file
+    """
+    counts = {"reused": 0, "compressed": 0, "stored": 0}
+    for member in report["members"]:
+        counts[member["action"]] += 1
+        print(
+            "  {}: {}, {} -> {} bytes in {:.3f}s".format(
+                member["name"],
+                member["action"],
+                member["bytes_in"],
+                member["bytes_out"],
+                member["seconds"],
+            )
+        )
+    print(
+        "{}: {} members ({} reused, {} compressed, {} stored), {} -> {} bytes in {:.2f}s".format(
+            zip_file_path,
+            len(report["members"]),
+            counts["reused"],
+            counts["compressed"],
+            counts["stored"],
+            report["bytes_in"],
+            report["bytes_out"],
+            report["seconds"],
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Creates evaluation_script.zip and the challenge zip file from the current directory"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=ZIP_NUM_WORKERS,
+        help="Number of compression threads",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=CHALLENGE_ZIP_CACHE_DIR,
+        help="Directory of the previous archives, empty to always rebuild",
+    )
+    parser.add_argument(
+        "--ignore-dir",
+        action="append",
+        default=[],
+        help="Additional directory to exclude from the challenge zip file",
+    )
+    parser.add_argument(
+        "--ignore-file",
+        action="append",
+        default=[],
+        help="Additional file to exclude from both zip files",
+    )
+    parser.add_argument("--output", default=CHALLENGE_ZIP_FILE_PATH)
+    args = parser.parse_args()
+
+    working_dir = os.getcwd()
+    report = build_zip_file(
+        "evaluation_script.zip",
+        get_zip_files(
+            os.path.join(working_dir, "evaluation_script"),
+            IGNORE_DIRS,
+            [".DS_Store"] + args.ignore_file,
+        ),
+        args.cache_dir,
+        args.workers,
+    )
+    print_zip_report("evaluation_script.zip", report)
+    report = build_zip_file(
+        args.output,
+        get_zip_files(
+            working_dir,
+            IGNORE_DIRS + args.ignore_dir,
+            IGNORE_FILES + [os.path.basename(args.output)] + args.ignore_file,
+        ),
+        args.cache_dir,
+        args.workers,
+    )
+    print_zip_report(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from cache import TTLCache
+from eval_ai_interface import IDEMPOTENT_METHODS, RETRY_STATUS_CODES, URLS
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEvalAI_Interface:
+    def __init__(
+        self,
+        AUTH_TOKEN,
+        EVALAI_API_SERVER,
+        QUEUE_NAME,
+        CHALLENGE_PK,
+        pool_size=10,
+        connect_timeout=5,
+        read_timeout=60,
+        max_retries=3,
+        backoff_factor=0.5,
+        phase_cache_size=128,
+        phase_cache_ttl=300,
+    ):
+        """Class to initiate asynchronous calls to EvalAI backend
+
+        It mirrors EvalAI_Interface, with every API call being a coroutine. The
+        aiohttp session is created on first use, inside the running event loop,
+        and has to be released with `await close()` (or `async with`).
+
+        Arguments:
+            AUTH_TOKEN {[string]} -- The authentication token corresponding to EvalAI
+            EVALAI_API_SERVER {[string]} -- It should be set to https://eval.ai # For production server
+            QUEUE_NAME {[string]} -- Unique queue name corresponding to every challenge
+            CHALLENGE_PK {[integer]} -- Primary key corresponding to a challenge
+            pool_size {[integer]} -- Maximum number of simultaneous connections. Defaults to 10
+            connect_timeout {[float]} -- Seconds to wait for a connection. Defaults to 5
+            read_timeout {[float]} -- Seconds to wait for a response. Defaults to 60
+            max_retries {[integer]} -- Number of retries of a failed request. Defaults to 3
+            backoff_factor {[float]} -- Backoff between retries, in seconds: {backoff factor} * (2 ** ({retry number} - 1)). Defaults to 0.5
+            phase_cache_size {[integer]} -- Maximum number of challenge phases cached. Defaults to 128
+            phase_cache_ttl {[float]} -- Seconds for which a challenge phase is cached, 0 disables the cache. Defaults to 300
+        """
+
+        self.AUTH_TOKEN = AUTH_TOKEN
+        self.EVALAI_API_SERVER = EVALAI_API_SERVER
+        self.QUEUE_NAME = QUEUE_NAME
+        self.CHALLENGE_PK = CHALLENGE_PK
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout
+        )
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = None
+        # Challenge phases rarely change while a challenge is running
+        self.phase_cache = TTLCache(phase_cache_size, phase_cache_ttl)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def get_request_headers(self):
+        """Function to get the header of the EvalAI request in proper format
+
+        Returns:
+            [dict]: Authorization header
+        """
+        headers = {"Authorization": "Bearer {}".format(self.AUTH_TOKEN)}
+        return headers
+
+    def get_session(self):
+        """Function to get the pooled session, creating it on first use
+
+        Returns:
+            [aiohttp.ClientSession]: Session used for all the requests
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers=self.get_request_headers(),
+                timeout=self.timeout,
+            )
+        return self.session
+
+    async def close(self):
+        """Function to close the connections kept alive by the session"""
+        if self.session is not None:
+            await self.session.close()
+
+    async def make_request(self, url, method, data=None):
+        """Function to make request to EvalAI interface
+
+        Connection errors are retried for every method and 5xx responses only
+        for idempotent methods, like EvalAI_Interface does.
+
+        Args:
+            url ([str]): URL of the request
+            method ([str]): Method of the request
+            data ([dict], optional): Data of the request. Defaults to None.
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        session = self.get_session()
+        retryable = method in IDEMPOTENT_METHODS
+        attempt = 0
+        metrics.inc("evalai_api_requests_total", method=method)
+        while True:
+            try:
+                async with session.request(method, url, data=data) as response:
+                    if (
+                        retryable
+                        and response.status in RETRY_STATUS_CODES
+                        and attempt < self.max_retries
+                    ):
+                        raise _RetryableStatus(response.status)
+                    response.raise_for_status()
+                    return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, _RetryableStatus) as e:
+                if attempt >= self.max_retries or (
+                    not retryable and not isinstance(e, aiohttp.ClientConnectorError)
+                ):
+                    metrics.inc("evalai_api_errors_total", method=method)
+                    logger.info(
+                        "The server isn't able establish connection with EvalAI"
+                    )
+                    raise
+                attempt += 1
+                metrics.inc("evalai_api_retries_total", method=method)
+                await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+            except aiohttp.ClientError:
+                metrics.inc("evalai_api_errors_total", method=method)
+                logger.info("The server isn't able establish connection with EvalAI")
+                raise
+
+    def return_url_per_environment(self, url):
+        """Function to get the URL for API
+
+        Args:
+            url ([str]): API endpoint url to which the request is to be made
+
+        Returns:
+            [str]: API endpoint url with EvalAI base url attached
+        """
+        base_url = "{0}".format(self.EVALAI_API_SERVER)
+        url = "{0}{1}".format(base_url, url)
+        return url
+
+    async def get_message_from_sqs_queue(self):
+        """Function to get the message from SQS Queue
+
+        Docs: https://eval.ai/api/docs/#operation/get_submission_message_from_queue
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("get_message_from_sqs_queue").format(self.QUEUE_NAME)
+        url = self.return_url_per_environment(url)
+        response = await self.make_request(url, "GET")
+        return response
+
+    async def delete_message_from_sqs_queue(self, receipt_handle):
+        """Function to delete the submission message from the queue
+
+        Docs: https://eval.ai/api/docs/#operation/delete_submission_message_from_queue
+
+        Args:
+            receipt_handle ([str]): Receipt handle of the message to be deleted
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("delete_message_from_sqs_queue").format(self.QUEUE_NAME)
+        url = self.return_url_per_environment(url)
+        data = {"receipt_handle": receipt_handle}
+        response = await self.make_request(url, "POST", data)
+        return response
+
+    async def update_submission_data(self, data):
+        """Function to update the submission data on EvalAI
+
+        Docs: https://eval.ai/api/docs/#operation/update_submission
+
+        Args:
+            data ([dict]): Data to be updated
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("update_submission").format(self.CHALLENGE_PK)
+        url = self.return_url_per_environment(url)
+        response = await self.make_request(url, "PUT", data=data)
+        return response
+
+    async def update_submission_status(self, data):
+        """
+
+        Docs: https://eval.ai/api/docs/#operation/update_submission
+
+        Args:
+            data ([dict]): Data to be updated
+
+        Returns:
+            [JSON]: JSON response data
+        """
+        url = URLS.get("update_submission").format(self.CHALLENGE_PK)
+        url = self.return_url_per_environment(url)
+        response = await self.make_request(url, "PATCH", data=data)
+        return response
+
+    async def get_submission_by_pk(self, submission_pk):
+        url = URLS.get("get_submission_by_pk").format(submission_pk)
+        url = self.return_url_per_environment(url)
+        response = await self.make_request(url, "GET")
+        return response
+
+    async def get_challenge_phase_by_pk(self, phase_pk):
+        response = self.phase_cache.get(phase_pk)
+        # Counted in the metrics, which are merged across the pool processes
+        metrics.inc(
+            "evalai_api_cache_requests_total",
+            resource="challenge_phase",
+            result="miss" if response is None else "hit",
+        )
+        if response is None:
+            url = URLS.get("get_challenge_phase_by_pk").format(phase_pk)
+            url = self.return_url_per_environment(url)
+            response = await self.make_request(url, "GET")
+            self.phase_cache.set(phase_pk, response)
+        return response
+
+    def invalidate_challenge_phase(self, phase_pk=None):
+        """Function to drop a cached challenge phase
+
+        Args:
+            phase_pk ([int], optional): Primary key of the phase. Defaults to None, which drops every phase
+        """
+        if phase_pk is None:
+            self.phase_cache.invalidate()
+        else:
+            self.phase_cache.invalidate(phase_pk)
+
+    def get_cache_stats(self):
+        """Function to get the hit/miss counters of the cached resources
+
+        Returns:
+            [dict]: Counters of every cache, by resource
+        """
+        return {"challenge_phase": self.phase_cache.stats()}
+
+
+class _RetryableStatus(Exception):
+    """Raised internally when a response status should be retried"""
@@ -0,0 +1,250 @@
+import asyncio
+import functools
+import logging
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from async_eval_ai_interface import AsyncEvalAI_Interface
+from instrumentation import (
+    log_submission,
+    serve_metrics,
+    start_metrics_file_writer,
+    timed,
+    write_metrics_file,
+)
+from main import (
+    api_connect_timeout,
+    api_max_retries,
+    api_read_timeout,
+    auth_token,
+    challenge_pk,
+    download,
+    evalai_api_server,
+    evaluate_cached,
+    max_in_flight,
+    metrics_file,
+    metrics_interval,
+    metrics_port,
+    num_workers,
+    phase_cache_ttl,
+    poll_max_interval,
+    poll_min_interval,
+    queue_name,
+    remove_submission_file,
+    save_dir,
+)
+from poller import AdaptivePoller
+from worker_pool import ignore_shutdown_signals
+
+logger = logging.getLogger(__name__)
+
+
+async def update_running(evalai, submission_pk):
+    status_data = {
+        "submission": submission_pk,
+        "submission_status": "RUNNING",
+    }
+    update_status = await evalai.update_submission_status(status_data)
+
+
+async def update_failed(
+    evalai, phase_pk, submission_pk, submission_error, stdout="", metadata=""
+):
+    submission_data = {
+        "challenge_phase": phase_pk,
+        "submission": submission_pk,
+        "stdout": stdout,
+        "stderr": submission_error,
+        "submission_status": "FAILED",
+        "metadata": metadata,
+    }
+    update_data = await evalai.update_submission_data(submission_data)
+
+
+async def update_finished(
+    evalai,
+    phase_pk,
+    submission_pk,
+    result,
+    submission_error="",
+    stdout="",
+    metadata="",
+):
+    submission_data = {
+        "challenge_phase": phase_pk,
+        "submission": submission_pk,
+        "stdout": stdout,
+        "stderr": submission_error,
+        "submission_status": "FINISHED",
+        "result": result,
+        "metadata": metadata,
+    }
+    update_data = await evalai.update_submission_data(submission_data)
+
+
+async def process_submission(evalai, executor, message):
+    message_body = message.get("body")
+    submission_pk = message_body.get("submission_pk")
+    phase_pk = message_body.get("phase_pk")
+    timings = {}
+    if "poll_seconds" in message:
+        timings["poll"] = message["poll_seconds"]
+    with timed(timings, "metadata"):
+        # Get submission and phase details concurrently -- The submission contains the input file URL
+        submission, challenge_phase = await asyncio.gather(
+            evalai.get_submission_by_pk(submission_pk),
+            evalai.get_challenge_phase_by_pk(phase_pk),
+        )
+        if (
+            submission.get("status") == "finished"
+            or submission.get("status") == "failed"
+            or submission.get("status") == "cancelled"
+        ):
+            message_receipt_handle = message.get("receipt_handle")
+            await evalai.delete_message_from_sqs_queue(message_receipt_handle)
+            return
+
+        if submission.get("status") == "submitted":
+            await update_running(evalai, submission_pk)
+    job = {
+        "submission_pk": submission_pk,
+        "phase_codename": challenge_phase["codename"],
+        "submission_file_path": None,
+        "error": None,
+        "timings": timings,
+    }
+    try:
+        with timed(timings, "download"):
+            # The blocking download, with its resume of interrupted transfers,
+            # runs in a thread of the default executor
+            job[
+                "submission_file_path"
+            ] = await asyncio.get_running_loop().run_in_executor(
+                None, download, submission, save_dir
+            )
+        with timed(timings, "evaluate"):
+            # evaluate() is CPU bound, run it out of the event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                executor,
+                evaluate_cached,
+                job["submission_file_path"],
+                challenge_phase["codename"],
+                submission_pk,
+            )
+        with timed(timings, "upload"):
+            await update_finished(evalai, phase_pk, submission_pk, result)
+    except BrokenProcessPool:
+        # The submission wasn't evaluated, it must not be reported as failed
+        raise
+    except Exception as e:
+        job["error"] = str(e)
+        with timed(timings, "upload"):
+            await update_failed(evalai, phase_pk, submission_pk, str(e))
+    finally:
+        remove_submission_file(job)
+    log_submission(job)
+
+
+async def run(evalai, poller, executor_factory, max_in_flight):
+    """Coroutine to process queued submissions until SIGINT/SIGTERM is received
+
+    At most `max_in_flight` submissions are processed at once. Their API calls
+    overlap in the event loop and their downloads in threads, while `evaluate`
+    runs in the executor returned by `executor_factory`, which is replaced if
+    one of its processes dies.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    slots = asyncio.Semaphore(max_in_flight)
+    in_flight = {}
+    executor = executor_factory()
+
+    async def handle(submission_pk, message):
+        nonlocal executor
+        current_executor = executor
+        try:
+            await process_submission(evalai, current_executor, message)
+        except BrokenProcessPool:
+            # The message becomes visible on the queue again
+            logger.error(
+                "Submission {} was interrupted by the death of a pool process, leaving it on the queue".format(
+                    submission_pk
+                )
+            )
+            # Every submission of the broken pool fails, only the first one replaces it
+            if executor is current_executor:
+                logger.error("A pool process terminated abruptly, restarting the pool")
+                current_executor.shutdown(wait=False)
+                executor = executor_factory()
+        except Exception:
+            logger.exception("Processing of submission {} failed".format(submission_pk))
+        finally:
+            del in_flight[submission_pk]
+            slots.release()
+
+    while not stop.is_set():
+        await slots.acquire()
+        if stop.is_set():
+            # Stopped while waiting for a slot, don't take another message
+            slots.release()
+            break
+        message = await poller.async_poll()
+        submission_pk = message["body"].get("submission_pk") if message else None
+        if message is None or submission_pk in in_flight:
+            if message is not None:
+                # The message became visible again while still being processed
+                poller.record_duplicate()
+            slots.release()
+        else:
+            in_flight[submission_pk] = loop.create_task(handle(submission_pk, message))
+        try:
+            await asyncio.wait_for(stop.wait(), poller.next_delay())
+        except asyncio.TimeoutError:
+            pass
+
+    logger.info(
+        "Stopping the dispatcher, draining {} in-flight submission(s)".format(
+            len(in_flight)
+        )
+    )
+    await asyncio.gather(*in_flight.values())
+    executor.shutdown(wait=True)
+    logger.info("Queue polling stats: {}".format(poller.stats()))
+    logger.info("API cache stats: {}".format(evalai.get_cache_stats()))
+
+
+async def main():
+    if metrics_port:
+        serve_metrics(int(metrics_port))
+    if metrics_file:
+        start_metrics_file_writer(metrics_file, metrics_interval)
+    async with AsyncEvalAI_Interface(
+        auth_token,
+        evalai_api_server,
+        queue_name,
+        challenge_pk,
+        connect_timeout=api_connect_timeout,
+        read_timeout=api_read_timeout,
+        max_retries=api_max_retries,
+        phase_cache_ttl=phase_cache_ttl,
+    ) as evalai:
+        poller = AdaptivePoller(
+            evalai, min_interval=poll_min_interval, max_interval=poll_max_interval
+        )
+        executor_factory = functools.partial(
+            ProcessPoolExecutor,
+            max_workers=num_workers,
+            initializer=ignore_shutdown_signals,
+        )
+        await run(evalai, poller, executor_factory, max_in_flight)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
+    if metrics_file:
+        write_metrics_file(metrics_file)
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Marks a key missing from the cache, as None can be a cached value
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=128, ttl=300):
+        """Class to cache values for `ttl` seconds, evicting the least recently used ones
+
+        It is safe to share between threads.
+
+        Arguments:
+            maxsize {[integer]} -- Maximum number of cached values. Defaults to 128
+            ttl {[float]} -- Seconds after which a cached value expires. Defaults to 300
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Function to get a cached value
+
+        Args:
+            key ([hashable]): Key of the value
+            default ([any], optional): Returned when the key is missing or expired. Defaults to None.
+
+        Returns:
+            [any]: The cached value
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Function to cache a value
+
+        Args:
+            key ([hashable]): Key of the value
+            value ([any]): Value to cache
+        """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=_MISSING):
+        """Function to drop a cached value, or every value if no key is given
+
+        Args:
+            key ([hashable], optional): Key of the value to drop
+        """
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        """Function to get the cache counters
+
+        Returns:
+            [dict]: Number of hits, misses, evictions and cached values
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+            }
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import time
+
+import requests
+
+from eval_ai_interface import RETRY_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# Statuses of a storage server that is down or throttling, worth a retry
+DOWNLOAD_RETRY_STATUS_CODES = RETRY_STATUS_CODES | frozenset([429])
+
+
+class SubmissionTooLarge(Exception):
+    """Raised when a submission file is larger than the allowed size"""
+
+
+def download_file(
+    url,
+    file_path,
+    session=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_size=None,
+    timeout=(5, 60),
+    max_retries=3,
+    backoff_factor=0.5,
+    hash_algorithm=None,
+):
+    """Function to stream a file to disk in fixed-size chunks
+
+    Only one chunk is held in memory at a time. When the transfer is interrupted,
+    or the server answers with one of DOWNLOAD_RETRY_STATUS_CODES, it is resumed
+    with a Range request from the last byte written, or restarted if the server
+    does not support ranges.
+
+    Args:
+        url ([str]): URL of the file
+        file_path ([str]): Path where the file is written
+        session ([requests.Session], optional): Session used for the requests. Defaults to None.
+        chunk_size ([int], optional): Size in bytes of the chunks written to disk. Defaults to 1 MiB.
+        max_size ([int], optional): Maximum size in bytes of the file. Defaults to None (no limit).
+        timeout ([tuple], optional): Connect and read timeouts in seconds. Defaults to (5, 60).
+        max_retries ([int], optional): Number of times a failed or interrupted transfer is retried. Defaults to 3.
+        backoff_factor ([float], optional): Backoff factor between retries. Defaults to 0.5.
+        hash_algorithm ([str], optional): hashlib algorithm of the content hash, e.g. "sha256". Defaults to None.
+
+    Raises:
+        SubmissionTooLarge: The file is larger than `max_size`
+
+    Returns:
+        [str]: Hex digest of the file content, None if no `hash_algorithm` is given
+    """
+    if session is None:
+        with requests.Session() as session:
+            return download_file(
+                url,
+                file_path,
+                session,
+                chunk_size,
+                max_size,
+                timeout,
+                max_retries,
+                backoff_factor,
+                hash_algorithm,
+            )
+
+    try:
+        return _download_file(
+            session,
+            url,
+            file_path,
+            chunk_size,
+            max_size,
+            timeout,
+            max_retries,
+            backoff_factor,
+            hash_algorithm,
+        )
+    except Exception:
+        # Do not leave a partial file behind
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+
+def _download_file(
+    session,
+    url,
+    file_path,
+    chunk_size,
+    max_size,
+    timeout,
+    max_retries,
+    backoff_factor,
+    hash_algorithm,
+):
+    hasher = hashlib.new(hash_algorithm) if hash_algorithm else None
+    written = 0
+    attempt = 0
+    with open(file_path, "wb") as f:
+        while True:
+            headers = {"Range": "bytes={}-".format(written)} if written else {}
+            try:
+                with session.get(
+                    url, headers=headers, stream=True, timeout=timeout
+                ) as response:
+                    response.raise_for_status()
+                    if written and response.status_code != 206:
+                        # The server ignored the Range header, start over
+                        f.seek(0)
+                        f.truncate()
+                        written = 0
+                        hasher = hashlib.new(hash_algorithm) if hash_algorithm else None
+                    check_size(
+                        written + int(response.headers.get("Content-Length", 0)),
+                        max_size,
+                    )
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        written += len(chunk)
+                        check_size(written, max_size)
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                break
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+                requests.exceptions.HTTPError,
+            ) as e:
+                if attempt >= max_retries or (
+                    isinstance(e, requests.exceptions.HTTPError)
+                    and e.response.status_code not in DOWNLOAD_RETRY_STATUS_CODES
+                ):
+                    raise
+                attempt += 1
+                logger.info(
+                    "Download of {} interrupted after {} bytes, retrying: {}".format(
+                        url, written, e
+                    )
+                )
+                time.sleep(backoff_factor * (2 ** (attempt - 1)))
+    return hasher.hexdigest() if hasher else None
+
+
+def check_size(size, max_size):
+    """Function to check that a file does not exceed the allowed size
+
+    Args:
+        size ([int]): Size of the file in bytes
+        max_size ([int]): Maximum size in bytes, None for no limit
+
+    Raises:
+        SubmissionTooLarge: `size` is larger than `max_size`
+    """
+    if max_size is not None and size > max_size:
+        raise SubmissionTooLarge(
+            "The submission file is larger than the maximum allowed size of {} bytes".format(
+                max_size
+            )
+        )
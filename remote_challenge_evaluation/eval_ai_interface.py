@@ -1,6 +1,11 @@
 import logging
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache import TTLCache
+from instrumentation import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -13,21 +18,98 @@ URLS = {
 }
 
 
+# Methods that are safe to send again after the server has received them
+IDEMPOTENT_METHODS = frozenset(["HEAD", "GET", "PUT", "PATCH", "DELETE", "OPTIONS"])
+RETRY_STATUS_CODES = frozenset([500, 502, 503, 504])
+
+
+class CountingRetry(Retry):
+    """Retry policy counting the retried requests in the worker metrics"""
+
+    def increment(self, method=None, *args, **kwargs):
+        # Raises MaxRetryError when the retries are exhausted, so only actual retries are counted
+        retry = super().increment(method, *args, **kwargs)
+        metrics.inc("evalai_api_retries_total", method=method)
+        return retry
+
+
 class EvalAI_Interface:
-    def __init__(self, AUTH_TOKEN, EVALAI_API_SERVER, QUEUE_NAME, CHALLENGE_PK):
+    def __init__(
+        self,
+        AUTH_TOKEN,
+        EVALAI_API_SERVER,
+        QUEUE_NAME,
+        CHALLENGE_PK,
+        pool_size=10,
+        connect_timeout=5,
+        read_timeout=60,
+        max_retries=3,
+        backoff_factor=0.5,
+        phase_cache_size=128,
+        phase_cache_ttl=300,
+    ):
         """Class to initiate call to EvalAI backend
 
+        All the requests go through one pooled session, so the TCP/TLS connection
+        to EvalAI is kept alive between calls. Connection errors are retried for
+        every method; 5xx responses only for idempotent methods (GET, PUT, PATCH, ...).
+
         Arguments:
             AUTH_TOKEN {[string]} -- The authentication token corresponding to EvalAI
             EVALAI_API_SERVER {[string]} -- It should be set to https://eval.ai # For production server
             QUEUE_NAME {[string]} -- Unique queue name corresponding to every challenge
             CHALLENGE_PK {[integer]} -- Primary key corresponding to a challenge
+            pool_size {[integer]} -- Maximum number of connections kept alive. Defaults to 10
+            connect_timeout {[float]} -- Seconds to wait for a connection. Defaults to 5
+            read_timeout {[float]} -- Seconds to wait for a response. Defaults to 60
+            max_retries {[integer]} -- Number of retries of a failed request. Defaults to 3
+            backoff_factor {[float]} -- Backoff between retries, in seconds: {backoff factor} * (2 ** ({retry number} - 1)). Defaults to 0.5
+            phase_cache_size {[integer]} -- Maximum number of challenge phases cached. Defaults to 128
+            phase_cache_ttl {[float]} -- Seconds for which a challenge phase is cached, 0 disables the cache. Defaults to 300
         """
 
         self.AUTH_TOKEN = AUTH_TOKEN
         self.EVALAI_API_SERVER = EVALAI_API_SERVER
         self.QUEUE_NAME = QUEUE_NAME
         self.CHALLENGE_PK = CHALLENGE_PK
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self.create_session(pool_size, max_retries, backoff_factor)
+        # Challenge phases rarely change while a challenge is running
+        self.phase_cache = TTLCache(phase_cache_size, phase_cache_ttl)
+
+    def create_session(self, pool_size, max_retries, backoff_factor):
+        """Function to create the pooled keep-alive session used for all requests
+
+        Args:
+            pool_size ([int]): Maximum number of connections kept alive
+            max_retries ([int]): Number of retries of a failed request
+            backoff_factor ([float]): Backoff factor between retries
+
+        Returns:
+            [requests.Session]: Session with the retry policy mounted
+        """
+        retry = CountingRetry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(self.get_request_headers())
+        return session
+
+    def close(self):
+        """Function to close the connections kept alive by the session"""
+        self.session.close()
 
     def get_request_headers(self):
         """Function to get the header of the EvalAI request in proper format
@@ -50,12 +132,14 @@ class EvalAI_Interface:
             [JSON]: JSON response data
         """
         headers = self.get_request_headers()
+        metrics.inc("evalai_api_requests_total", method=method)
         try:
-            response = requests.request(
-                method=method, url=url, headers=headers, data=data
+            response = self.session.request(
+                method=method, url=url, headers=headers, data=data, timeout=self.timeout
             )
             response.raise_for_status()
         except requests.exceptions.RequestException:
+            metrics.inc("evalai_api_errors_total", method=method)
             logger.info("The server isn't able establish connection with EvalAI")
             raise
         return response.json()
@@ -142,7 +226,35 @@ class EvalAI_Interface:
         return response
 
     def get_challenge_phase_by_pk(self, phase_pk):
-        url = URLS.get("get_challenge_phase_by_pk").format(phase_pk)
-        url = self.return_url_per_environment(url)
-        response = self.make_request(url, "GET")
+        response = self.phase_cache.get(phase_pk)
+        # Counted in the metrics, which are merged across the pool processes
+        metrics.inc(
+            "evalai_api_cache_requests_total",
+            resource="challenge_phase",
+            result="miss" if response is None else "hit",
+        )
+        if response is None:
+            url = URLS.get("get_challenge_phase_by_pk").format(phase_pk)
+            url = self.return_url_per_environment(url)
+            response = self.make_request(url, "GET")
+            self.phase_cache.set(phase_pk, response)
         return response
+
+    def invalidate_challenge_phase(self, phase_pk=None):
+        """Function to drop a cached challenge phase
+
+        Args:
+            phase_pk ([int], optional): Primary key of the phase. Defaults to None, which drops every phase
+        """
+        if phase_pk is None:
+            self.phase_cache.invalidate()
+        else:
+            self.phase_cache.invalidate(phase_pk)
+
+    def get_cache_stats(self):
+        """Function to get the hit/miss counters of the cached resources
+
+        Returns:
+            [dict]: Counters of every cache, by resource
+        """
+        return {"challenge_phase": self.phase_cache.stats()}
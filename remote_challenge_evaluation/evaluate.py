@@ -15,6 +15,12 @@ def evaluate(user_submission_file, phase_codename, test_annotation_file=None, **
             ```
             test_annotation_file = json.loads(open("{phase_codename}_path", "r"))
             ```
+            To parse large annotation files only once per worker process, copy
+            `evaluation_script/annotation_store.py` next to this file and use:
+            ```
+            from annotation_store import load_annotations
+            test_annotations = load_annotations("{phase_codename}_path", phase_codename)
+            ```
         `**kwargs`: keyword arguments that contains additional submission
         metadata that challenge hosts can use to send slack notification.
         You can access the submission metadata
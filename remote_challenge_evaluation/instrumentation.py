@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Stages of the processing of a submission
+STAGES = ("poll", "metadata", "download", "evaluate", "upload")
+
+# Upper bounds in seconds of the buckets of the stage duration histograms
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800)
+
+
+class Metrics:
+    def __init__(self, buckets=BUCKETS):
+        """Class to keep the counters and the stage duration histograms of a worker process
+
+        It is safe to share between threads. The metrics of a pool process are
+        sent to the parent with `drain()` and added to its own with `merge()`.
+
+        Arguments:
+            buckets {[tuple]} -- Upper bounds in seconds of the histogram buckets. Defaults to BUCKETS
+        """
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """Function to increment a counter
+
+        Args:
+            name ([str]): Name of the counter
+            value ([int], optional): Increment. Defaults to 1.
+            **labels: Labels of the counter, e.g. method="GET"
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        """Function to add the duration of a stage to its histogram
+
+        Args:
+            stage ([str]): Name of the stage
+            seconds ([float]): Duration of the stage
+        """
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                stage, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """Function to get a picklable copy of the metrics
+
+        Returns:
+            [dict]: The counters and the histograms
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {
+                    stage: dict(histogram, buckets=list(histogram["buckets"]))
+                    for stage, histogram in self._histograms.items()
+                },
+            }
+
+    def drain(self):
+        """Function to get the metrics recorded since the last drain and reset them
+
+        Returns:
+            [dict]: The counters and the histograms
+        """
+        with self._lock:
+            snapshot = {"counters": self._counters, "histograms": self._histograms}
+            self._counters = {}
+            self._histograms = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Function to add the metrics of another process
+
+        Args:
+            snapshot ([dict]): Metrics returned by snapshot() or drain()
+        """
+        with self._lock:
+            for key, value in snapshot["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for stage, other in snapshot["histograms"].items():
+                histogram = self._histograms.setdefault(
+                    stage,
+                    {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0},
+                )
+                histogram["buckets"] = [
+                    a + b for a, b in zip(histogram["buckets"], other["buckets"])
+                ]
+                histogram["sum"] += other["sum"]
+                histogram["count"] += other["count"]
+
+    def render(self):
+        """Function to format the metrics in the Prometheus text exposition format
+
+        Returns:
+            [str]: The metrics
+        """
+        snapshot = self.snapshot()
+        lines = []
+        names = sorted({name for name, _ in snapshot["counters"]})
+        for name in names:
+            lines.append("# TYPE {} counter".format(name))
+            for (counter_name, labels), value in sorted(snapshot["counters"].items()):
+                if counter_name == name:
+                    lines.append("{}{} {}".format(name, _format_labels(labels), value))
+        if snapshot["histograms"]:
+            name = "evalai_worker_stage_seconds"
+            lines.append("# TYPE {} histogram".format(name))
+            for stage, histogram in sorted(snapshot["histograms"].items()):
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            name,
+                            _format_labels((("le", bound), ("stage", stage))),
+                            count,
+                        )
+                    )
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        name,
+                        _format_labels((("le", "+Inf"), ("stage", stage))),
+                        histogram["count"],
+                    )
+                )
+                labels = _format_labels((("stage", stage),))
+                lines.append("{}_sum{} {}".format(name, labels, histogram["sum"]))
+                lines.append("{}_count{} {}".format(name, labels, histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for key, value in labels
+        )
+    )
+
+
+# Metrics of this process
+metrics = Metrics()
+
+
+@contextmanager
+def timed(timings, stage):
+    """Context manager storing the duration of its block in `timings[stage]`
+
+    Args:
+        timings ([dict]): Stage durations of a submission
+        stage ([str]): Name of the stage
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def log_submission(job):
+    """Function to log the stage durations and the outcome of a processed submission
+    and add them to the metrics of this process
+
+    The stages may have run in other processes, e.g. the evaluation in a process
+    pool, so their durations travel with the job and are only observed here.
+
+    Args:
+        job ([dict]): Job with its `timings`
+    """
+    status = "failed" if job.get("error") is not None else "finished"
+    metrics.inc("evalai_worker_submissions_total", status=status)
+    timings = job.get("timings", {})
+    for stage, seconds in timings.items():
+        # Polls are observed by the poller, including the empty ones
+        if stage != "poll":
+            metrics.observe(stage, seconds)
+    logger.info(
+        json.dumps(
+            {
+                "event": "submission_processed",
+                "submission_pk": job.get("submission_pk"),
+                "phase_codename": job.get("phase_codename"),
+                "status": status,
+                "timings": {stage: round(timings[stage], 6) for stage in timings},
+            }
+        )
+    )
+
+
+def serve_metrics(port, host="0.0.0.0"):
+    """Function to serve the metrics of this process over HTTP in a daemon thread
+
+    Args:
+        port ([int]): Port of the endpoint, scraped at http://<host>:<port>/metrics
+        host ([str], optional): Address to listen on. Defaults to "0.0.0.0".
+
+    Returns:
+        [ThreadingHTTPServer]: The running server
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    logger.info("Serving metrics on port {}".format(port))
+    return server
+
+
+def write_metrics_file(path):
+    """Function to write the metrics of this process to a file, atomically
+
+    Args:
+        path ([str]): Path of the metrics file
+    """
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "w") as f:
+        f.write(metrics.render())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_file_writer(path, interval=15):
+    """Function to write the metrics to a file every `interval` seconds in a daemon thread
+
+    Args:
+        path ([str]): Path of the metrics file, e.g. read by the node exporter textfile collector
+        interval ([float], optional): Seconds between two writes. Defaults to 15.
+
+    Returns:
+        [threading.Thread]: The writer thread
+    """
+
+    def write_forever():
+        while True:
+            time.sleep(interval)
+            try:
+                write_metrics_file(path)
+            except OSError:
+                logger.exception("Failed to write the metrics to {}".format(path))
+
+    thread = threading.Thread(target=write_forever, name="metrics-writer", daemon=True)
+    thread.start()
+    return thread
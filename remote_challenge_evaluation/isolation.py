@@ -0,0 +1,211 @@
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import resource
+import signal
+import threading
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationError(Exception):
+    """Raised when an isolated evaluation fails, its message is reported to EvalAI"""
+
+
+class EvaluationTimeout(EvaluationError):
+    """Raised when an isolated evaluation runs longer than the wall-clock limit"""
+
+
+def _set_cpu_limit(cpu_limit):
+    # CPU time accumulates over the jobs of a warm child, so the soft limit is
+    # moved to the time used so far plus the budget of the next job
+    if cpu_limit is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(used + cpu_limit) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _child_loop(connection, parent_connection, target, memory_limit, cpu_limit):
+    """Function run by the warm child, evaluating the jobs sent by the parent until the pipe is closed"""
+    # The end of the parent is inherited on fork and would keep the pipe open
+    parent_connection.close()
+    # SIGINT goes to the whole process group, the parent decides when to stop
+    # the child. SIGTERM, ignored by pool processes, is restored so that the
+    # child is terminated when its parent exits
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    while True:
+        try:
+            args, kwargs = connection.recv()
+        except (EOFError, OSError):
+            return
+        _set_cpu_limit(cpu_limit)
+        try:
+            response = ("ok", target(*args, **kwargs))
+        except MemoryError:
+            response = (
+                "error",
+                "Evaluation exceeded the memory limit of {} bytes".format(memory_limit),
+            )
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            response = ("error", str(e))
+        try:
+            connection.send(response)
+        except OSError:
+            # The parent closed the pipe while the evaluation was running
+            return
+        except Exception as e:
+            # e.g. an unpicklable result
+            connection.send(("error", "Could not send the result: {}".format(e)))
+
+
+class IsolatedEvaluator:
+    def __init__(
+        self,
+        target,
+        timeout=None,
+        memory_limit=None,
+        cpu_limit=None,
+        max_jobs=None,
+    ):
+        """Class to run evaluations in a warm child process with resource limits
+
+        The child is started on the first evaluation and reused for the next
+        ones, so the evaluation script and its imports are only loaded once. It
+        is killed and replaced when an evaluation runs out of time or memory, or
+        dies, and the evaluation raises an EvaluationError telling why.
+
+        Arguments:
+            target {[callable]} -- Function evaluating a submission, called in the child
+            timeout {[float]} -- Wall-clock limit in seconds of an evaluation. Defaults to None (no limit)
+            memory_limit {[integer]} -- Address space limit (RLIMIT_AS) in bytes of the child. Defaults to None (no limit)
+            cpu_limit {[float]} -- CPU time limit (RLIMIT_CPU) in seconds of an evaluation. Defaults to None (no limit)
+            max_jobs {[integer]} -- Number of evaluations after which the child is replaced. Defaults to None (never)
+        """
+        self.target = target
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.max_jobs = max_jobs
+        # Forked children inherit the imported evaluation script
+        if "fork" in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context("fork")
+        else:
+            self._context = multiprocessing.get_context()
+        self._process = None
+        self._connection = None
+        self._jobs = 0
+        # The child evaluates one submission at a time
+        self._lock = threading.Lock()
+        self._finalizer_pid = None
+
+    def _start(self):
+        # The child isn't daemonic, so that the evaluation script can start its
+        # own processes, which means multiprocessing joins it when this process
+        # exits. The finalizer stops it before that join, at interpreter exit as
+        # well as when a pool process shuts down. Forked processes don't inherit
+        # finalizers, so it is registered by the process owning the child
+        if self._finalizer_pid != os.getpid():
+            multiprocessing.util.Finalize(None, self.close, exitpriority=10)
+            self._finalizer_pid = os.getpid()
+        parent_connection, child_connection = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_child_loop,
+            args=(
+                child_connection,
+                parent_connection,
+                self.target,
+                self.memory_limit,
+                self.cpu_limit,
+            ),
+            name="isolated-evaluator",
+        )
+        self._process.start()
+        child_connection.close()
+        self._connection = parent_connection
+        self._jobs = 0
+
+    def close(self):
+        """Function to stop the child process
+
+        The child exits once its pipe is closed, it is terminated if it is still
+        busy with an evaluation.
+        """
+        if self._process is None:
+            return
+        self._connection.close()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._process = None
+        self._connection = None
+
+    def _kill(self):
+        self._process.kill()
+        self._process.join()
+        exitcode = self._process.exitcode
+        self._connection.close()
+        self._process = None
+        self._connection = None
+        return exitcode
+
+    def _get_exit_reason(self, exitcode):
+        if exitcode == -signal.SIGXCPU:
+            return "Evaluation exceeded the CPU time limit of {} seconds".format(
+                self.cpu_limit
+            )
+        if exitcode == -signal.SIGKILL:
+            return "Evaluation process was killed, likely for running out of memory"
+        if exitcode is not None and exitcode < 0:
+            return "Evaluation process was killed by signal {}".format(
+                signal.Signals(-exitcode).name
+            )
+        return "Evaluation process exited with code {}".format(exitcode)
+
+    def evaluate(self, *args, **kwargs):
+        """Function to call target(*args, **kwargs) in the child process
+
+        Raises:
+            EvaluationTimeout: The evaluation ran longer than `timeout`
+            EvaluationError: The evaluation failed or the child process died
+
+        Returns:
+            [any]: The return value of target
+        """
+        with self._lock:
+            if self._process is None or not self._process.is_alive():
+                if self._process is not None:
+                    self._kill()
+                self._start()
+            self._jobs += 1
+            try:
+                self._connection.send((args, kwargs))
+                if not self._connection.poll(self.timeout):
+                    self._kill()
+                    raise EvaluationTimeout(
+                        "Evaluation exceeded the time limit of {} seconds".format(
+                            self.timeout
+                        )
+                    )
+                status, value = self._connection.recv()
+            except (EOFError, OSError):
+                raise EvaluationError(self._get_exit_reason(self._kill()))
+            if self.max_jobs is not None and self._jobs >= self.max_jobs:
+                self.close()
+        if status == "error":
+            raise EvaluationError(value)
+        return value
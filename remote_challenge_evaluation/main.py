@@ -1,11 +1,29 @@
+import functools
+import inspect
 import json
+import logging
 import os
-import time
-
-import requests
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
+from downloader import download_file
 from eval_ai_interface import EvalAI_Interface
 from evaluate import evaluate
+from instrumentation import (
+    log_submission,
+    serve_metrics,
+    start_metrics_file_writer,
+    timed,
+    write_metrics_file,
+)
+from isolation import IsolatedEvaluator
+from pipeline import SubmissionPipeline
+from poller import AdaptivePoller
+from profiling import profiler_from_environment
+from result_cache import ResultCache, hash_file, hash_paths
+from worker_pool import SubmissionWorkerPool, ignore_shutdown_signals
+
+logger = logging.getLogger(__name__)
 
 # Remote Evaluation Meta Data
 # See https://evalai.readthedocs.io/en/latest/evaluation_scripts.html#writing-remote-evaluation-script
@@ -15,14 +33,133 @@ queue_name = os.environ["QUEUE_NAME"]
 challenge_pk = os.environ["CHALLENGE_PK"]
 save_dir = os.environ.get("SAVE_DIR", "./")
 
+# Number of submissions evaluated concurrently
+num_workers = int(os.environ.get("NUM_WORKERS", os.cpu_count() or 1))
+max_in_flight = int(os.environ.get("MAX_IN_FLIGHT", num_workers))
+
+# "pool" evaluates every submission from start to end in a pool process,
+# "pipeline" downloads the next submissions while the current ones are evaluated
+worker_mode = os.environ.get("WORKER_MODE", "pool")
+prefetch = int(os.environ.get("PREFETCH", num_workers))
+
+# Timeouts in seconds and retries of the requests made to EvalAI
+api_connect_timeout = float(os.environ.get("API_CONNECT_TIMEOUT", 5))
+api_read_timeout = float(os.environ.get("API_READ_TIMEOUT", 60))
+api_max_retries = int(os.environ.get("API_MAX_RETRIES", 3))
+
+# Seconds for which challenge phase lookups are cached, 0 disables the cache
+phase_cache_ttl = float(os.environ.get("PHASE_CACHE_TTL", 300))
+
+# Limits of the submission file downloads
+max_submission_size = (
+    int(os.environ["MAX_SUBMISSION_SIZE"])
+    if os.environ.get("MAX_SUBMISSION_SIZE")
+    else None
+)
+download_chunk_size = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+download_timeout = float(os.environ.get("DOWNLOAD_TIMEOUT", 60))
+submission_hash_algorithm = os.environ.get("SUBMISSION_HASH_ALGORITHM") or None
+
+# Bounds in seconds of the backoff between polls of an empty queue
+poll_min_interval = float(os.environ.get("POLL_MIN_INTERVAL", 1))
+poll_max_interval = float(os.environ.get("POLL_MAX_INTERVAL", 60))
+
+# On-disk cache of the results of already evaluated submission files, disabled if empty
+result_cache_path = os.environ.get("RESULT_CACHE_PATH", "")
+result_cache_max_bytes = int(
+    os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+# Annotation files and directories, and evaluation script files whose changes invalidate cached results
+annotation_paths = [
+    path for path in os.environ.get("ANNOTATION_PATHS", "").split(",") if path
+]
+evaluation_script_paths = [
+    path for path in os.environ.get("EVALUATION_SCRIPT_PATHS", "").split(",") if path
+]
+
+if result_cache_path and not annotation_paths:
+    # Cached results would outlive an update of the annotations
+    logger.warning(
+        "RESULT_CACHE_PATH is ignored because ANNOTATION_PATHS is not set, "
+        "the result cache can't tell when the annotations change"
+    )
+    result_cache_path = ""
+result_cache = (
+    ResultCache(result_cache_path, result_cache_max_bytes)
+    if result_cache_path
+    else None
+)
+# Version of the evaluation script loaded by this worker, defaults to every
+# Python module of the directory of evaluate.py, so helper modules count too
+if result_cache is None:
+    script_version = None
+elif evaluation_script_paths:
+    script_version = hash_paths(evaluation_script_paths)
+else:
+    script_version = hash_paths(
+        [os.path.dirname(os.path.abspath(inspect.getsourcefile(evaluate)))],
+        suffixes=(".py",),
+    )
+
+# Port of the Prometheus metrics endpoint and path of the metrics file, disabled if empty
+metrics_port = os.environ.get("METRICS_PORT", "")
+metrics_file = os.environ.get("METRICS_FILE", "")
+metrics_interval = float(os.environ.get("METRICS_INTERVAL", 15))
+
+# Profiler of the evaluate() calls, enabled by PROFILE_MODE, see profiling.py
+profiler = profiler_from_environment()
+
+# Limits of an evaluation run in a separate process, see isolation.py. Setting
+# any of them, or EVALUATION_ISOLATION=1, evaluates submissions in a warm child
+# process which is killed when a limit is exceeded
+evaluation_timeout = (
+    float(os.environ["EVALUATION_TIMEOUT"])
+    if os.environ.get("EVALUATION_TIMEOUT")
+    else None
+)
+evaluation_memory_limit = (
+    int(os.environ["EVALUATION_MEMORY_LIMIT"])
+    if os.environ.get("EVALUATION_MEMORY_LIMIT")
+    else None
+)
+evaluation_cpu_limit = (
+    float(os.environ["EVALUATION_CPU_LIMIT"])
+    if os.environ.get("EVALUATION_CPU_LIMIT")
+    else None
+)
+evaluation_max_jobs = (
+    int(os.environ["EVALUATION_MAX_JOBS"])
+    if os.environ.get("EVALUATION_MAX_JOBS")
+    else None
+)
+evaluation_isolation = os.environ.get("EVALUATION_ISOLATION", "").lower() in (
+    "1",
+    "true",
+    "yes",
+) or any(
+    limit is not None
+    for limit in (evaluation_timeout, evaluation_memory_limit, evaluation_cpu_limit)
+)
+
 
 def download(submission, save_dir):
-    response = requests.get(submission["input_file"])
     submission_file_path = os.path.join(
         save_dir, submission["input_file"].split("/")[-1]
     )
-    with open(submission_file_path, "wb") as f:
-        f.write(response.content)
+    digest = download_file(
+        submission["input_file"],
+        submission_file_path,
+        chunk_size=download_chunk_size,
+        max_size=max_submission_size,
+        timeout=(api_connect_timeout, download_timeout),
+        hash_algorithm=submission_hash_algorithm,
+    )
+    if digest:
+        logger.info(
+            "Downloaded {} ({}: {})".format(
+                submission_file_path, submission_hash_algorithm, digest
+            )
+        )
     return submission_file_path
 
 
@@ -69,40 +206,259 @@ def update_finished(
     update_data = evalai.update_submission_data(submission_data)
 
 
-if __name__ == "__main__":
-    evalai = EvalAI_Interface(auth_token, evalai_api_server, queue_name, challenge_pk)
-
-    while True:
-        # Get the message from the queue
-        message = evalai.get_message_from_sqs_queue()
-        message_body = message.get("body")
-        if message_body:
-            submission_pk = message_body.get("submission_pk")
-            challenge_pk = message_body.get("challenge_pk")
-            phase_pk = message_body.get("phase_pk")
-            # Get submission details -- This will contain the input file URL
-            submission = evalai.get_submission_by_pk(submission_pk)
-            challenge_phase = evalai.get_challenge_phase_by_pk(phase_pk)
-            if (
-                submission.get("status") == "finished"
-                or submission.get("status") == "failed"
-                or submission.get("status") == "cancelled"
-            ):
-                message_receipt_handle = message.get("receipt_handle")
-                evalai.delete_message_from_sqs_queue(message_receipt_handle)
+def run_evaluate(submission_file_path, phase_codename, submission_pk=None):
+    """Function to call evaluate, under the profiler if profiling is enabled
+
+    Args:
+        submission_file_path ([str]): Path of the submission file
+        phase_codename ([str]): Codename of the challenge phase
+        submission_pk ([int], optional): Primary key of the submission, names the profile. Defaults to None.
+
+    Returns:
+        [dict]: Output of evaluate
+    """
+    if profiler is None:
+        return evaluate(submission_file_path, phase_codename)
+    profile_name = "submission_{}_{}".format(
+        submission_pk or os.path.basename(submission_file_path), phase_codename
+    )
+    return profiler.profile(
+        profile_name, evaluate, submission_file_path, phase_codename
+    )
+
+
+# Every process evaluating submissions starts its own child on first use
+isolated_evaluator = (
+    IsolatedEvaluator(
+        run_evaluate,
+        timeout=evaluation_timeout,
+        memory_limit=evaluation_memory_limit,
+        cpu_limit=evaluation_cpu_limit,
+        max_jobs=evaluation_max_jobs,
+    )
+    if evaluation_isolation
+    else None
+)
+
+
+def run_isolated_evaluate(submission_file_path, phase_codename, submission_pk=None):
+    """Function to call run_evaluate, in the isolated child process if isolation is enabled
+
+    Args:
+        submission_file_path ([str]): Path of the submission file
+        phase_codename ([str]): Codename of the challenge phase
+        submission_pk ([int], optional): Primary key of the submission. Defaults to None.
+
+    Returns:
+        [dict]: Output of evaluate
+    """
+    if isolated_evaluator is None:
+        return run_evaluate(submission_file_path, phase_codename, submission_pk)
+    return isolated_evaluator.evaluate(
+        submission_file_path, phase_codename, submission_pk
+    )
+
 
+def evaluate_cached(submission_file_path, phase_codename, submission_pk=None):
+    """Function to evaluate a submission file, unless the same file was already evaluated
+
+    Args:
+        submission_file_path ([str]): Path of the submission file
+        phase_codename ([str]): Codename of the challenge phase
+        submission_pk ([int], optional): Primary key of the submission. Defaults to None.
+
+    Returns:
+        [str]: JSON encoded result of the submission
+    """
+    if result_cache is None:
+        output = run_isolated_evaluate(
+            submission_file_path, phase_codename, submission_pk
+        )
+        return json.dumps(output["result"])
+
+    key = (
+        hash_file(submission_file_path),
+        hash_paths(annotation_paths),
+        phase_codename,
+        script_version,
+    )
+    result = result_cache.get(*key)
+    if result is not None:
+        logger.info("Found a cached result for {}".format(submission_file_path))
+        return result
+    output = run_isolated_evaluate(submission_file_path, phase_codename, submission_pk)
+    result = json.dumps(output["result"])
+    result_cache.set(*key, result)
+    return result
+
+
+def fetch_submission(evalai, message):
+    """Function to fetch the metadata and the file of a queued submission
+
+    Args:
+        evalai ([EvalAI_Interface]): Interface to EvalAI
+        message ([dict]): Message taken from the challenge queue
+
+    Returns:
+        [dict]: Job to pass to evaluate_submission, None if the submission
+        doesn't need to be evaluated
+    """
+    message_body = message.get("body")
+    submission_pk = message_body.get("submission_pk")
+    challenge_pk = message_body.get("challenge_pk")
+    phase_pk = message_body.get("phase_pk")
+    timings = {}
+    if "poll_seconds" in message:
+        timings["poll"] = message["poll_seconds"]
+    with timed(timings, "metadata"):
+        # Get submission details -- This will contain the input file URL
+        submission = evalai.get_submission_by_pk(submission_pk)
+        challenge_phase = evalai.get_challenge_phase_by_pk(phase_pk)
+        if (
+            submission.get("status") == "finished"
+            or submission.get("status") == "failed"
+            or submission.get("status") == "cancelled"
+        ):
+            message_receipt_handle = message.get("receipt_handle")
+            evalai.delete_message_from_sqs_queue(message_receipt_handle)
+            return None
+
+        if submission.get("status") == "submitted":
+            update_running(evalai, submission_pk)
+    job = {
+        "submission_pk": submission_pk,
+        "phase_pk": phase_pk,
+        "phase_codename": challenge_phase["codename"],
+        "submission_file_path": None,
+        "result": None,
+        "error": None,
+        "timings": timings,
+    }
+    try:
+        with timed(timings, "download"):
+            job["submission_file_path"] = download(submission, save_dir)
+    except Exception as e:
+        job["error"] = str(e)
+    return job
+
+
+def evaluate_submission(job):
+    """Function to evaluate a fetched submission
+
+    Args:
+        job ([dict]): Job returned by fetch_submission
+
+    Returns:
+        [dict]: The job with either its JSON encoded `result` or its `error` set
+    """
+    if job["error"] is None:
+        try:
+            with timed(job["timings"], "evaluate"):
+                job["result"] = evaluate_cached(
+                    job["submission_file_path"],
+                    job["phase_codename"],
+                    job["submission_pk"],
+                )
+        except Exception as e:
+            job["error"] = str(e)
+    return job
+
+
+def remove_submission_file(job):
+    """Function to delete the downloaded file of a submission once it isn't needed anymore
+
+    Args:
+        job ([dict]): Job returned by fetch_submission
+    """
+    submission_file_path = job["submission_file_path"]
+    if submission_file_path and os.path.exists(submission_file_path):
+        os.remove(submission_file_path)
+
+
+def report_submission(evalai, job):
+    """Function to send the outcome of an evaluated submission to EvalAI
+
+    The submission file is deleted afterwards, whether the evaluation succeeded
+    or not, so downloaded files don't pile up on the disk.
+
+    Args:
+        evalai ([EvalAI_Interface]): Interface to EvalAI
+        job ([dict]): Job returned by evaluate_submission
+    """
+    phase_pk, submission_pk = job["phase_pk"], job["submission_pk"]
+    try:
+        with timed(job["timings"], "upload"):
+            if job["error"] is not None:
+                update_failed(evalai, phase_pk, submission_pk, job["error"])
             else:
-                if submission.get("status") == "submitted":
-                    update_running(evalai, submission_pk)
-                submission_file_path = download(submission, save_dir)
                 try:
-                    results = evaluate(
-                        submission_file_path, challenge_phase["codename"]
-                    )
-                    update_finished(
-                        evalai, phase_pk, submission_pk, json.dumps(results["result"])
-                    )
+                    update_finished(evalai, phase_pk, submission_pk, job["result"])
                 except Exception as e:
+                    job["error"] = str(e)
                     update_failed(evalai, phase_pk, submission_pk, str(e))
-        # Poll challenge queue for new submissions
-        time.sleep(60)
+    finally:
+        remove_submission_file(job)
+    log_submission(job)
+
+
+def process_submission(evalai, message):
+    job = fetch_submission(evalai, message)
+    if job is not None:
+        report_submission(evalai, evaluate_submission(job))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if metrics_port:
+        serve_metrics(int(metrics_port))
+    if metrics_file:
+        start_metrics_file_writer(metrics_file, metrics_interval)
+    evalai_factory = functools.partial(
+        EvalAI_Interface,
+        auth_token,
+        evalai_api_server,
+        queue_name,
+        challenge_pk,
+        connect_timeout=api_connect_timeout,
+        read_timeout=api_read_timeout,
+        max_retries=api_max_retries,
+        phase_cache_ttl=phase_cache_ttl,
+    )
+    evalai = evalai_factory()
+    poller = AdaptivePoller(
+        evalai, min_interval=poll_min_interval, max_interval=poll_max_interval
+    )
+
+    # Poll challenge queue for new submissions and evaluate them in parallel
+    exit_code = 0
+    if worker_mode == "pipeline":
+        pipeline = SubmissionPipeline(
+            evalai,
+            fetch_submission,
+            evaluate_submission,
+            report_submission,
+            discard=remove_submission_file,
+            evaluators=num_workers,
+            prefetch=prefetch,
+            executor_factory=functools.partial(
+                ProcessPoolExecutor,
+                max_workers=num_workers,
+                initializer=ignore_shutdown_signals,
+            ),
+            poller=poller,
+        )
+        pipeline.run_forever()
+    else:
+        pool = SubmissionWorkerPool(
+            evalai,
+            evalai_factory,
+            process_submission,
+            num_workers=num_workers,
+            max_in_flight=max_in_flight,
+            poller=poller,
+        )
+        if not pool.run_forever():
+            exit_code = 1
+    if metrics_file:
+        write_metrics_file(metrics_file)
+    sys.exit(exit_code)
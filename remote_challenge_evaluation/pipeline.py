@@ -0,0 +1,237 @@
+import logging
+import queue
+import signal
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from poller import AdaptivePoller
+
+logger = logging.getLogger(__name__)
+
+# Tells the next stage that no more jobs will come
+_STOP = object()
+
+
+class SubmissionPipeline:
+    def __init__(
+        self,
+        evalai,
+        fetch,
+        evaluate,
+        report,
+        discard=None,
+        evaluators=1,
+        fetchers=None,
+        prefetch=None,
+        executor_factory=None,
+        poller=None,
+    ):
+        """Class to process queued submissions in a staged pipeline
+
+        Fetcher threads poll the queue, look up the submission and download its
+        file while evaluator threads evaluate the previously fetched submissions
+        and a reporter thread sends the outcomes to EvalAI. The stages are joined
+        by queues, and fetchers only take a message off the challenge queue when
+        fewer than `prefetch` fetched submissions are waiting to be evaluated, so
+        the downloads never run ahead of the evaluations.
+
+        Arguments:
+            evalai {[EvalAI_Interface]} -- Interface used by the fetch and report stages
+            fetch {[callable]} -- Called as fetch(evalai, message), returns a job or None
+            evaluate {[callable]} -- Called as evaluate(job), returns the evaluated job
+            report {[callable]} -- Called as report(evalai, job)
+            discard {[callable]} -- Called as discard(job) for a fetched job dropped without being reported. Defaults to None
+            evaluators {[integer]} -- Number of submissions evaluated at once. Defaults to 1
+            fetchers {[integer]} -- Number of submissions fetched at once. Defaults to evaluators
+            prefetch {[integer]} -- Maximum number of fetched submissions waiting for evaluation. Defaults to evaluators
+            executor_factory {[callable]} -- Returns the executor in which `evaluate` runs, e.g. a process pool, which is
+                replaced if one of its processes dies. Defaults to running `evaluate` in the evaluator threads
+            poller {[AdaptivePoller]} -- Poller used to fetch messages. Defaults to an AdaptivePoller on `evalai`
+        """
+        self.evalai = evalai
+        self.fetch = fetch
+        self.evaluate = evaluate
+        self.report = report
+        self.discard = discard
+        self.evaluators = evaluators
+        self.fetchers = fetchers or evaluators
+        self.prefetch = prefetch or evaluators
+        self.executor_factory = executor_factory
+        self.poller = poller or AdaptivePoller(evalai)
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._in_flight = set()
+        self._running_fetchers = self.fetchers
+        self._prefetch_slots = threading.BoundedSemaphore(self.prefetch)
+        self._fetched = queue.Queue()
+        self._evaluated = queue.Queue()
+        self._threads = []
+        self._executor = None
+
+    def start(self):
+        """Function to start the threads of every stage"""
+        if self.executor_factory is not None:
+            self._executor = self.executor_factory()
+        stages = [
+            (self._fetch_loop, self.fetchers, "fetcher"),
+            (self._evaluate_loop, self.evaluators, "evaluator"),
+            (self._report_loop, 1, "reporter"),
+        ]
+        for target, count, name in stages:
+            for index in range(count):
+                thread = threading.Thread(
+                    target=target, name="{}-{}".format(name, index), daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, signum=None, frame=None):
+        """Function to stop taking new submissions off the queue
+
+        It can be installed directly as a signal handler. The submissions that
+        were already fetched are still evaluated and reported.
+        """
+        if not self._stop.is_set():
+            logger.info(
+                "Stopping the pipeline, draining {} in-flight submission(s)".format(
+                    len(self._in_flight)
+                )
+            )
+        self._stop.set()
+
+    def join(self):
+        """Function to wait for the pipeline to stop and drain"""
+        while not self._stop.wait(1):
+            pass
+        for thread in self._threads:
+            thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        logger.info("All in-flight submissions have been processed")
+        logger.info("Queue polling stats: {}".format(self.poller.stats()))
+
+    def run_forever(self):
+        """Function to run the pipeline until SIGINT/SIGTERM is received"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.start()
+        self.join()
+
+    def _fetch_loop(self):
+        while not self._stop.is_set():
+            # Back-pressure: wait until a fetched submission can be queued
+            if not self._prefetch_slots.acquire(timeout=1):
+                continue
+            job = None
+            try:
+                job = self._fetch_next()
+            except Exception:
+                logger.exception("Failed to fetch a submission")
+            if job is None:
+                self._prefetch_slots.release()
+            else:
+                self._fetched.put(job)
+        with self._lock:
+            self._running_fetchers -= 1
+            if self._running_fetchers == 0:
+                # The last fetcher to stop tells every evaluator
+                for _ in range(self.evaluators):
+                    self._fetched.put(_STOP)
+
+    def _fetch_next(self):
+        with self._poll_lock:
+            message = self.poller.poll()
+            if message is not None:
+                submission_pk = message["body"].get("submission_pk")
+                with self._lock:
+                    duplicate = submission_pk in self._in_flight
+                    if not duplicate:
+                        self._in_flight.add(submission_pk)
+                if duplicate:
+                    # The message became visible again while still being
+                    # processed, it is left on the queue like an empty poll
+                    self.poller.record_duplicate()
+                    message = None
+            delay = self.poller.next_delay()
+        if message is None:
+            self._stop.wait(delay)
+            return None
+
+        job = None
+        try:
+            job = self.fetch(self.evalai, message)
+        finally:
+            if job is None:
+                self._done(submission_pk)
+        return job
+
+    def _evaluate_loop(self):
+        while True:
+            job = self._fetched.get()
+            if job is _STOP:
+                break
+            self._prefetch_slots.release()
+            try:
+                job = self._run_evaluate(job)
+            except BrokenProcessPool:
+                # The submission wasn't evaluated, its message becomes visible
+                # on the queue again instead of the submission being failed
+                logger.error(
+                    "Submission {} was interrupted by the death of a pool process, leaving it on the queue".format(
+                        job["submission_pk"]
+                    )
+                )
+                if self.discard is not None:
+                    self.discard(job)
+                self._done(job["submission_pk"])
+                continue
+            except Exception as e:
+                job["error"] = str(e)
+            self._evaluated.put(job)
+        self._evaluated.put(_STOP)
+
+    def _run_evaluate(self, job):
+        if self._executor is None:
+            return self.evaluate(job)
+        executor = self._executor
+        try:
+            future = executor.submit(self.evaluate, job)
+        except BrokenProcessPool:
+            # The job didn't start yet, so it can safely run in the new pool
+            executor = self._restart_executor(executor)
+            future = executor.submit(self.evaluate, job)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            raise
+
+    def _restart_executor(self, broken_executor):
+        with self._lock:
+            # Every evaluator of the broken pool sees the error, only one replaces it
+            if self._executor is broken_executor:
+                logger.error("A pool process terminated abruptly, restarting the pool")
+                broken_executor.shutdown(wait=False)
+                self._executor = self.executor_factory()
+            return self._executor
+
+    def _report_loop(self):
+        stopped_evaluators = 0
+        while stopped_evaluators < self.evaluators:
+            job = self._evaluated.get()
+            if job is _STOP:
+                stopped_evaluators += 1
+                continue
+            try:
+                self.report(self.evalai, job)
+            except Exception:
+                logger.exception(
+                    "Failed to report submission {}".format(job["submission_pk"])
+                )
+            self._done(job["submission_pk"])
+
+    def _done(self, submission_pk):
+        with self._lock:
+            self._in_flight.discard(submission_pk)
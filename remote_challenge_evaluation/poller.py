@@ -0,0 +1,140 @@
+import logging
+import random
+import time
+
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePoller:
+    def __init__(
+        self, evalai, min_interval=1, max_interval=60, multiplier=2, jitter=0.5
+    ):
+        """Class to poll the challenge queue with exponential backoff
+
+        The queue is polled again right away while messages keep arriving. Every
+        empty poll multiplies the wait before the next poll by `multiplier`, up to
+        `max_interval` seconds. A random fraction (`jitter`) is taken off each wait
+        so that several workers do not poll in lockstep.
+
+        Arguments:
+            evalai {[EvalAI_Interface]} -- Interface used to poll the queue, poll with async_poll() for an AsyncEvalAI_Interface
+            min_interval {[float]} -- Wait in seconds after the first empty poll. Defaults to 1
+            max_interval {[float]} -- Ceiling of the wait in seconds. Defaults to 60
+            multiplier {[float]} -- Growth factor of the wait per empty poll. Defaults to 2
+            jitter {[float]} -- Fraction of the wait that is randomized, between 0 and 1. Defaults to 0.5
+        """
+        self.evalai = evalai
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+        self._empty_streak = 0
+        # Streak before the last message, restored if it is a duplicate
+        self._streak_before_message = 0
+        self._started_at = time.monotonic()
+        self.polls = 0
+        self.empty_polls = 0
+        self.messages = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.time_waited = 0.0
+        self.first_pickup_seconds = None
+
+    def poll(self):
+        """Function to fetch the next message from the queue
+
+        Returns:
+            [dict]: The queue message, or None if the queue is empty or could not be reached
+        """
+        self.polls += 1
+        start = time.perf_counter()
+        try:
+            message = self.evalai.get_message_from_sqs_queue()
+        except Exception:
+            self._record_error()
+            return None
+        return self._record(message, time.perf_counter() - start)
+
+    async def async_poll(self):
+        """Coroutine to fetch the next message from the queue of an AsyncEvalAI_Interface
+
+        Returns:
+            [dict]: The queue message, or None if the queue is empty or could not be reached
+        """
+        self.polls += 1
+        start = time.perf_counter()
+        try:
+            message = await self.evalai.get_message_from_sqs_queue()
+        except Exception:
+            self._record_error()
+            return None
+        return self._record(message, time.perf_counter() - start)
+
+    def _record_error(self):
+        self.errors += 1
+        self._empty_streak += 1
+        logger.exception("Failed to fetch a submission from the queue")
+
+    def _record(self, message, seconds):
+        metrics.observe("poll", seconds)
+        if not message.get("body"):
+            self.empty_polls += 1
+            self._empty_streak += 1
+            return None
+
+        self.messages += 1
+        self._streak_before_message = self._empty_streak
+        self._empty_streak = 0
+        if self.first_pickup_seconds is None:
+            self.first_pickup_seconds = time.monotonic() - self._started_at
+        # Duration of the poll that returned the message, part of its timings
+        message["poll_seconds"] = seconds
+        return message
+
+    def record_duplicate(self):
+        """Function to count the last message as an empty poll
+
+        Used when the submission of the message is already being processed, so
+        the message is left on the queue and the next poll is delayed instead of
+        fetching the same message again right away.
+        """
+        self.messages -= 1
+        self.duplicates += 1
+        self._empty_streak = self._streak_before_message + 1
+
+    def next_delay(self):
+        """Function to get the wait before the next poll
+
+        Returns:
+            [float]: Seconds to wait, 0 while messages keep arriving
+        """
+        if self._empty_streak == 0:
+            return 0
+        delay = min(
+            self.max_interval,
+            self.min_interval * self.multiplier ** min(self._empty_streak - 1, 64),
+        )
+        delay -= random.uniform(0, delay * self.jitter)
+        self.time_waited += delay
+        return delay
+
+    def stats(self):
+        """Function to get the polling counters
+
+        Returns:
+            [dict]: Number of polls, empty polls, messages, duplicate messages,
+            errors, seconds spent waiting and seconds until the first message was
+            picked up
+        """
+        return {
+            "polls": self.polls,
+            "empty_polls": self.empty_polls,
+            "messages": self.messages,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "time_waited": round(self.time_waited, 3),
+            "first_pickup_seconds": self.first_pickup_seconds,
+        }
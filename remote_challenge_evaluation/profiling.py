@@ -0,0 +1,277 @@
+import cProfile
+import inspect
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+
+
+class _StackSampler:
+    def __init__(self, thread_id, interval):
+        """Class to sample the Python stack of a thread from a background thread
+
+        Arguments:
+            thread_id {[integer]} -- Identifier of the sampled thread
+            interval {[float]} -- Seconds between two samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    "{} ({}:{})".format(
+                        code.co_name,
+                        os.path.basename(code.co_filename),
+                        code.co_firstlineno,
+                    )
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, path):
+        """Function to write the samples as collapsed stacks, the input of flamegraph.pl or speedscope
+
+        Args:
+            path ([str]): Path of the output file
+        """
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write("{} {}\n".format(stack, count))
+
+
+class _PeakSnapshotter:
+    def __init__(self, interval, growth=1.1):
+        """Class to take a tracemalloc snapshot close to the peak of the traced memory
+
+        A snapshot taken once the function returned only shows the memory it
+        still holds, so a background thread takes a new snapshot every time
+        the traced memory grows `growth` times past the previous snapshot.
+
+        Arguments:
+            interval {[float]} -- Seconds between two checks of the traced memory
+            growth {[float]} -- Growth factor of the traced memory triggering a snapshot. Defaults to 1.1
+        """
+        self.interval = interval
+        self.growth = growth
+        self.snapshot = None
+        self.snapshot_size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="peak-snapshotter", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        # The memory held at the end may be the peak
+        self._take_snapshot_if_larger()
+
+    def _take_snapshot_if_larger(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.snapshot_size * self.growth:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._take_snapshot_if_larger()
+
+
+class Profiler:
+    def __init__(
+        self,
+        output_dir,
+        mode="cprofile",
+        allocations=False,
+        interval=0.005,
+        top=30,
+    ):
+        """Class to profile evaluate() calls and write one set of reports per submission
+
+        The time and the allocations are attributed to every function, and the
+        reports also list the functions of the evaluation script on their own,
+        so challenge hosts can find the hot spots of their metric code without
+        changing it.
+
+        Arguments:
+            output_dir {[string]} -- Directory of the reports
+            mode {[string]} -- "cprofile" writes deterministic pstats files, "sampling" writes collapsed stacks for flame graphs. Defaults to "cprofile"
+            allocations {[boolean]} -- Trace the memory allocations with tracemalloc. Defaults to False
+            interval {[float]} -- Seconds between two samples in "sampling" mode. Defaults to 0.005
+            top {[integer]} -- Number of functions and lines listed in the text reports. Defaults to 30
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(
+                "Unknown profile mode {!r}, use one of {}".format(mode, PROFILE_MODES)
+            )
+        self.output_dir = output_dir
+        self.mode = mode
+        self.allocations = allocations
+        self.interval = interval
+        self.top = top
+        os.makedirs(output_dir, exist_ok=True)
+
+    def profile(self, name, func, *args, **kwargs):
+        """Function to call func(*args, **kwargs) under the profiler
+
+        Reports are written to `output_dir` as `<name>.pstats` and `<name>.txt`
+        ("cprofile" mode), `<name>.collapsed` ("sampling" mode) and
+        `<name>.allocations.txt` (allocations).
+
+        Args:
+            name ([str]): Prefix of the report files, e.g. the submission pk
+            func ([callable]): Profiled function, usually evaluate
+            *args, **kwargs: Arguments of func
+
+        Returns:
+            [any]: The return value of func
+        """
+        script_path = _get_script_dir(func)
+        path = os.path.join(self.output_dir, re.sub(r"[^\w.-]", "_", str(name)))
+
+        tracing = self.allocations and not tracemalloc.is_tracing()
+        snapshotter = None
+        if tracing:
+            tracemalloc.start(25)
+            snapshotter = _PeakSnapshotter(max(self.interval, 0.01))
+            snapshotter.start()
+        profiler = sampler = None
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            snapshot = peak = None
+            if snapshotter is not None:
+                snapshotter.stop()
+                snapshot = snapshotter.snapshot
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            try:
+                if profiler is not None:
+                    self._write_pstats(path, profiler, script_path, elapsed)
+                if sampler is not None:
+                    sampler.write_collapsed(path + ".collapsed")
+                if snapshot is not None:
+                    self._write_allocations(path, snapshot, peak, script_path)
+                logger.info("Wrote the profile of {} to {}.*".format(name, path))
+            except OSError:
+                logger.exception("Failed to write the profile of {}".format(name))
+
+    def _write_pstats(self, path, profiler, script_path, elapsed):
+        profiler.dump_stats(path + ".pstats")
+        report = io.StringIO()
+        report.write("Total time: {:.3f}s\n\n".format(elapsed))
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        if script_path:
+            report.write("Functions of {}\n".format(script_path))
+            stats.sort_stats("tottime").print_stats(re.escape(script_path), self.top)
+        with open(path + ".txt", "w") as f:
+            f.write(report.getvalue())
+
+    def _write_allocations(self, path, snapshot, peak, script_path):
+        snapshot = snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+        with open(path + ".allocations.txt", "w") as f:
+            f.write("Peak traced memory: {:.1f} KiB\n".format(peak / 1024))
+            f.write(
+                "Memory held at the last snapshot: {:.1f} KiB\n\n".format(
+                    sum(stat.size for stat in snapshot.statistics("filename")) / 1024
+                )
+            )
+            f.write("Largest allocations by line\n")
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                f.write("{}\n".format(stat))
+            if script_path:
+                # Allocations made in libraries, e.g. by numpy, are attributed
+                # to the innermost line of the evaluation script calling them
+                sizes, counts = Counter(), Counter()
+                for trace in snapshot.traces:
+                    for frame in reversed(trace.traceback):
+                        if frame.filename.startswith(script_path + os.sep):
+                            line = "{}:{}".format(frame.filename, frame.lineno)
+                            sizes[line] += trace.size
+                            counts[line] += 1
+                            break
+                f.write("\nAllocations by line of {}\n".format(script_path))
+                for line, size in sizes.most_common(self.top):
+                    f.write(
+                        "{}: size={:.1f} KiB, count={}\n".format(
+                            line, size / 1024, counts[line]
+                        )
+                    )
+
+
+def _get_script_dir(func):
+    try:
+        return os.path.dirname(os.path.abspath(inspect.getsourcefile(func)))
+    except TypeError:
+        return None
+
+
+def profiler_from_environment():
+    """Function to create the profiler configured by the environment variables
+
+    PROFILE_MODE ("cprofile" or "sampling") enables the profiler, which writes
+    to PROFILE_DIR (default "profiles"). PROFILE_ALLOCATIONS=1 traces the
+    allocations and PROFILE_INTERVAL sets the seconds between two samples.
+
+    Returns:
+        [Profiler]: The profiler, None if profiling is disabled
+    """
+    mode = os.environ.get("PROFILE_MODE", "")
+    if not mode:
+        return None
+    return Profiler(
+        os.environ.get("PROFILE_DIR", "profiles"),
+        mode=mode,
+        allocations=os.environ.get("PROFILE_ALLOCATIONS", "").lower()
+        in ("1", "true", "yes"),
+        interval=float(os.environ.get("PROFILE_INTERVAL", 0.005)),
+    )
@@ -0,0 +1,237 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Hashes of the files already hashed by this process, keyed by (path, mtime, size)
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def hash_file(file_path, algorithm="sha256"):
+    """Function to compute the content hash of a file
+
+    The hash is computed again only when the modification time or the size of
+    the file changes, so large annotation files are read once per process.
+
+    Args:
+        file_path ([str]): Path of the file
+        algorithm ([str], optional): hashlib algorithm. Defaults to "sha256".
+
+    Returns:
+        [str]: Hex digest of the file content
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, algorithm)
+    with _file_hashes_lock:
+        if key in _file_hashes:
+            return _file_hashes[key]
+    hasher = hashlib.new(algorithm)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[key] = digest
+    return digest
+
+
+def hash_paths(paths, algorithm="sha256", suffixes=None):
+    """Function to compute a single hash of files and directories
+
+    Directories are walked recursively, skipping `__pycache__` and hidden
+    entries. The hash covers the relative path and the content of every file.
+
+    Args:
+        paths ([list]): Paths of files or directories
+        algorithm ([str], optional): hashlib algorithm. Defaults to "sha256".
+        suffixes ([tuple], optional): Only the files of the directories ending with one of them are hashed, e.g. (".py",). Defaults to None (every file).
+
+    Returns:
+        [str]: Hex digest of all the files
+    """
+    hasher = hashlib.new(algorithm)
+    for path in paths:
+        if os.path.isdir(path):
+            file_paths = []
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [
+                    d for d in dirs if d != "__pycache__" and not d.startswith(".")
+                ]
+                file_paths.extend(
+                    os.path.join(root, f)
+                    for f in files
+                    if not f.startswith(".")
+                    and not f.endswith(".pyc")
+                    and (suffixes is None or f.endswith(suffixes))
+                )
+            names = [os.path.relpath(p, path) for p in file_paths]
+        else:
+            file_paths, names = [path], [os.path.basename(path)]
+        for name, file_path in sorted(zip(names, file_paths)):
+            hasher.update(name.encode("utf-8"))
+            hasher.update(hash_file(file_path, algorithm).encode("ascii"))
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """Class to store evaluation results on disk, so that a resubmitted file is not evaluated again
+
+        Results are keyed by the hash of the submission file, the hash of the
+        annotations, the phase codename and the version of the evaluation
+        script. They are stored in a SQLite database, which survives restarts
+        and can be shared by the processes of a worker. The least recently
+        used results are evicted once they take more than `max_bytes`.
+
+        Arguments:
+            path {[string]} -- Path of the SQLite database
+            max_bytes {[integer]} -- Maximum total size of the stored results. Defaults to 256 MiB
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    submission_hash TEXT NOT NULL,
+                    annotation_hash TEXT NOT NULL,
+                    phase_codename TEXT NOT NULL,
+                    script_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (
+                        submission_hash, annotation_hash, phase_codename, script_version
+                    )
+                )
+                """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    def _connect(self):
+        # A connection per call, so the cache is safe to use from threads and forked processes
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def get(self, submission_hash, annotation_hash, phase_codename, script_version):
+        """Function to get a stored result
+
+        Args:
+            submission_hash ([str]): Hash of the submission file
+            annotation_hash ([str]): Hash of the annotation files
+            phase_codename ([str]): Codename of the challenge phase
+            script_version ([str]): Version of the evaluation script
+
+        Returns:
+            [str]: The stored result, None if there is none or the cache can't be read
+        """
+        key = (submission_hash, annotation_hash, phase_codename, script_version)
+        try:
+            with closing(self._connect()) as connection, connection:
+                row = connection.execute(
+                    """
+                    SELECT result FROM results WHERE submission_hash = ?
+                    AND annotation_hash = ? AND phase_codename = ? AND script_version = ?
+                    """,
+                    key,
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute(
+                    """
+                    UPDATE results SET last_used = ? WHERE submission_hash = ?
+                    AND annotation_hash = ? AND phase_codename = ? AND script_version = ?
+                    """,
+                    (time.time(),) + key,
+                )
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning("Could not read the result cache: {}".format(e))
+            return None
+
+    def set(
+        self, submission_hash, annotation_hash, phase_codename, script_version, result
+    ):
+        """Function to store a result
+
+        The results of the phase computed with other annotations or another
+        version of the evaluation script are removed, as they can't be hit anymore.
+
+        Args:
+            submission_hash ([str]): Hash of the submission file
+            annotation_hash ([str]): Hash of the annotation files
+            phase_codename ([str]): Codename of the challenge phase
+            script_version ([str]): Version of the evaluation script
+            result ([str]): Result to store
+        """
+        size = len(result.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    """
+                    DELETE FROM results WHERE phase_codename = ?
+                    AND (annotation_hash != ? OR script_version != ?)
+                    """,
+                    (phase_codename, annotation_hash, script_version),
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        submission_hash,
+                        annotation_hash,
+                        phase_codename,
+                        script_version,
+                        result,
+                        size,
+                        time.time(),
+                    ),
+                )
+                self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning("Could not write the result cache: {}".format(e))
+
+    def _evict(self, connection):
+        total_size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        evicted = []
+        for rowid, size in connection.execute(
+            "SELECT rowid, size FROM results ORDER BY last_used"
+        ):
+            if total_size <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total_size -= size
+        connection.executemany("DELETE FROM results WHERE rowid = ?", evicted)
+
+    def clear(self):
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM results")
+
+    def stats(self):
+        """Function to get the number and the total size of the stored results
+
+        Returns:
+            [dict]: Number of `entries` and their size in `bytes`
+        """
+        with closing(self._connect()) as connection:
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {"entries": entries, "bytes": size}
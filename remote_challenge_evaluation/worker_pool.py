@@ -0,0 +1,195 @@
+import logging
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from instrumentation import metrics
+from poller import AdaptivePoller
+
+logger = logging.getLogger(__name__)
+
+# EvalAI interface owned by each pool process, created once by the initializer
+_worker_evalai = None
+
+
+def ignore_shutdown_signals():
+    """Function to make a pool process ignore SIGINT/SIGTERM
+
+    The parent process is responsible for shutting the pool down, so the
+    children keep evaluating until they are drained.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def _init_worker(evalai_factory):
+    """Function to set up a pool process
+
+    Args:
+        evalai_factory ([callable]): Returns the EvalAI interface for this process
+    """
+    global _worker_evalai
+    ignore_shutdown_signals()
+    # Forked processes inherit the metrics of the parent, which keeps them
+    metrics.reset()
+    _worker_evalai = evalai_factory()
+
+
+def _run_handler(handler, message):
+    try:
+        handler(_worker_evalai, message)
+    finally:
+        # Hand the metrics of the submission over to the parent process
+        pending_metrics = metrics.drain()
+    return pending_metrics
+
+
+class SubmissionWorkerPool:
+    def __init__(
+        self,
+        evalai,
+        evalai_factory,
+        handler,
+        num_workers,
+        max_in_flight=None,
+        poller=None,
+    ):
+        """Class to evaluate queued submissions concurrently in a process pool
+
+        A dispatcher thread keeps pulling messages from the challenge queue and
+        hands them to the pool as long as fewer than `max_in_flight` submissions
+        are being processed.
+
+        Arguments:
+            evalai {[EvalAI_Interface]} -- Interface used by the dispatcher to poll the queue
+            evalai_factory {[callable]} -- Picklable callable returning an interface for every pool process
+            handler {[callable]} -- Picklable function called as handler(evalai, message) in a pool process
+            num_workers {[integer]} -- Number of pool processes
+            max_in_flight {[integer]} -- Maximum number of submissions dispatched at once. Defaults to num_workers
+            poller {[AdaptivePoller]} -- Poller used to fetch messages. Defaults to an AdaptivePoller on `evalai`
+        """
+        self.evalai = evalai
+        self.evalai_factory = evalai_factory
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_in_flight = max_in_flight or num_workers
+        self.poller = poller or AdaptivePoller(evalai)
+
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._executor = None
+        self._dispatcher = None
+        self.failed = False
+
+    def start(self):
+        """Function to start the pool processes and the dispatcher thread"""
+        self._executor = self._create_executor()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="submission-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def stop(self, signum=None, frame=None):
+        """Function to stop dispatching new submissions
+
+        It can be installed directly as a signal handler.
+        """
+        if not self._stop.is_set():
+            logger.info(
+                "Stopping the dispatcher, draining {} in-flight submission(s)".format(
+                    len(self._in_flight)
+                )
+            )
+        self._stop.set()
+
+    def join(self):
+        """Function to wait for the dispatcher to stop and drain the pool"""
+        while not self._stop.wait(1):
+            pass
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+        logger.info("All in-flight submissions have been processed")
+        logger.info("Queue polling stats: {}".format(self.poller.stats()))
+
+    def run_forever(self):
+        """Function to run the pool until SIGINT/SIGTERM is received
+
+        Returns:
+            [bool]: False if the pool was stopped by an unexpected error
+        """
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.start()
+        self.join()
+        return not self.failed
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_worker,
+            initargs=(self.evalai_factory,),
+        )
+
+    def _restart_executor(self):
+        # The submissions of the broken pool already failed with BrokenProcessPool
+        # and their messages become visible on the queue again
+        logger.error("A pool process terminated abruptly, restarting the pool")
+        self._executor.shutdown(wait=False)
+        self._executor = self._create_executor()
+
+    def _dispatch(self):
+        try:
+            while not self._stop.is_set():
+                # Wait for a free slot before taking a message off the queue
+                if not self._slots.acquire(timeout=1):
+                    continue
+                if not self._poll_and_submit():
+                    self._slots.release()
+                self._stop.wait(self.poller.next_delay())
+        except Exception:
+            logger.exception("The dispatcher failed, stopping the pool")
+            self.failed = True
+            self._stop.set()
+
+    def _poll_and_submit(self):
+        message = self.poller.poll()
+        if message is None:
+            return False
+
+        submission_pk = message["body"].get("submission_pk")
+        with self._lock:
+            if submission_pk in self._in_flight:
+                # The message became visible again while still being evaluated.
+                # It is left on the queue and the next poll backs off
+                self.poller.record_duplicate()
+                return False
+            self._in_flight.add(submission_pk)
+
+        try:
+            try:
+                future = self._executor.submit(_run_handler, self.handler, message)
+            except BrokenProcessPool:
+                self._restart_executor()
+                future = self._executor.submit(_run_handler, self.handler, message)
+        except BaseException:
+            with self._lock:
+                self._in_flight.discard(submission_pk)
+            raise
+        future.add_done_callback(lambda future: self._on_done(future, submission_pk))
+        return True
+
+    def _on_done(self, future, submission_pk):
+        with self._lock:
+            self._in_flight.discard(submission_pk)
+        self._slots.release()
+        if future.exception() is None:
+            metrics.merge(future.result())
+        else:
+            logger.error(
+                "Processing of submission {} failed: {!r}".format(
+                    submission_pk, future.exception()
+                )
+            )
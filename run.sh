@@ -1,11 +1,18 @@
 #!/bin/bash
 
+# With --parallel, compress the files in a thread pool, reusing the unchanged
+# files of the previous build (see github/zip_builder.py)
+if [ "$1" == "--parallel" ]; then
+    python3 github/zip_builder.py --ignore-dir evaluation_script --ignore-dir challenge_data
+    exit $?
+fi
+
 # Remove already existing zip files
 rm evaluation_script.zip
 rm challenge_config.zip
 
 # Create new zip configuration according the updated code
 cd evaluation_script
-zip -r ../evaluation_script.zip * -x "*.DS_Store"
+zip -r ../evaluation_script.zip * -x "*.DS_Store" -x "*__pycache__*"
 cd ..
-zip -r challenge_config.zip *  -x "*.DS_Store" -x "evaluation_script/*" -x "*.git" -x "run.sh" -x "code_upload_challenge_evaluation/*" -x "remote_challenge_evaluation/*" -x "worker/*" -x "challenge_data/*" -x "github/*" -x ".github/*" -x "README.md"
+zip -r challenge_config.zip *  -x "*.DS_Store" -x "evaluation_script/*" -x "*.git" -x "run.sh" -x "code_upload_challenge_evaluation/*" -x "remote_challenge_evaluation/*" -x "worker/*" -x "benchmarks/*" -x "challenge_data/*" -x "github/*" -x ".github/*" -x "tests/*" -x "profiles/*" -x "*__pycache__*" -x "*.columns/*" -x "*/.annotations-*" -x "README.md"
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The github and remote_challenge_evaluation scripts import their modules by
+# name, as they are run from their own directory
+for directory in ("github", "remote_challenge_evaluation"):
+    sys.path.insert(0, os.path.join(ROOT_DIR, directory))
+sys.path.insert(0, ROOT_DIR)
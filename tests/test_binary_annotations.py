@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from evaluation_script import binary_annotations
+from evaluation_script.binary_annotations import (
+    compile_annotations,
+    load_binary_annotations,
+    load_columns,
+    read_manifest,
+)
+
+ANNOTATIONS = [{"id": 1, "label": 0.5}, {"id": 2, "label": 1.5}]
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = tmp_path / "annotations.json"
+    path.write_text(json.dumps(ANNOTATIONS))
+    return str(path)
+
+
+def test_columns_are_loaded(json_path):
+    columns = load_binary_annotations(json_path)
+    assert list(columns["id"]) == [1, 2]
+    assert list(columns["label"]) == [0.5, 1.5]
+
+
+def test_recompiling_replaces_the_previous_version(tmp_path, json_path):
+    output_dir = compile_annotations(json_path)
+    build_id = read_manifest(output_dir)["build_id"]
+    compile_annotations(json_path, force=True)
+    assert read_manifest(output_dir)["build_id"] != build_id
+    # Neither the conversion nor the replaced version is left behind
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "annotations.columns",
+        "annotations.json",
+    ]
+
+
+def test_losing_the_race_keeps_the_other_conversion(tmp_path, json_path, monkeypatch):
+    output_dir = compile_annotations(json_path)
+    build_id = read_manifest(output_dir)["build_id"]
+    rename = os.rename
+
+    def rename_after_another_compiler(source, destination):
+        # The other compiler swaps in its conversion between both renames
+        if destination == output_dir:
+            rename(aside_dirs.pop(), output_dir)
+        else:
+            aside_dirs.append(destination)
+        rename(source, destination)
+
+    aside_dirs = []
+    monkeypatch.setattr(binary_annotations.os, "rename", rename_after_another_compiler)
+    assert compile_annotations(json_path, force=True) == output_dir
+    assert read_manifest(output_dir)["build_id"] == build_id
+    assert list(load_columns(output_dir)["id"]) == [1, 2]
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "annotations.columns",
+        "annotations.json",
+    ]
+
+
+def test_load_retries_while_the_conversion_is_replaced(json_path, monkeypatch):
+    output_dir = compile_annotations(json_path)
+    load = binary_annotations.np.load
+    replaced = []
+
+    def load_during_replacement(*args, **kwargs):
+        if not replaced:
+            replaced.append(True)
+            compile_annotations(json_path, force=True)
+            raise FileNotFoundError(args[0])
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(binary_annotations.np, "load", load_during_replacement)
+    columns = load_columns(output_dir)
+    assert list(columns["label"]) == [0.5, 1.5]
@@ -0,0 +1,109 @@
+import pytest
+import requests
+
+import downloader
+from downloader import SubmissionTooLarge, download_file
+
+CONTENT = bytes(range(256)) * 40
+
+
+class FakeResponse(requests.Response):
+    def __init__(self, status_code, content=b"", headers=None, fail_after=None):
+        super().__init__()
+        self.status_code = status_code
+        self.headers.update(headers or {})
+        self.content_chunks = [
+            content[start : start + 1000] for start in range(0, len(content), 1000)
+        ]
+        self.fail_after = fail_after
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for index, chunk in enumerate(self.content_chunks):
+            if index == self.fail_after:
+                raise requests.exceptions.ChunkedEncodingError("Connection broken")
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """
+    Session answering every GET with the next of `statuses`, serving the
+    requested range of CONTENT for the successful ones
+    """
+
+    def __init__(self, *statuses, fail_after=None):
+        self.statuses = list(statuses)
+        self.fail_after = fail_after
+        self.ranges = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        status = self.statuses.pop(0)
+        start = int(headers["Range"][len("bytes=") : -1]) if headers else 0
+        self.ranges.append(start)
+        if status >= 400:
+            return FakeResponse(status)
+        content = CONTENT[start:] if status == 206 else CONTENT
+        response = FakeResponse(
+            status,
+            content,
+            {"Content-Length": str(len(content))},
+            self.fail_after,
+        )
+        self.fail_after = None
+        return response
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(downloader.time, "sleep", lambda seconds: None)
+
+
+def download(tmp_path, session, **kwargs):
+    file_path = str(tmp_path / "submission.json")
+    download_file("http://storage/submission.json", file_path, session, **kwargs)
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def test_interrupted_download_is_resumed(tmp_path):
+    session = FakeSession(200, 206, fail_after=2)
+    assert download(tmp_path, session) == CONTENT
+    assert session.ranges == [0, 2000]
+
+
+def test_server_ignoring_the_range_restarts(tmp_path):
+    session = FakeSession(200, 200, fail_after=3)
+    assert download(tmp_path, session) == CONTENT
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retryable_statuses_are_retried(tmp_path, status):
+    session = FakeSession(status, status, 200)
+    assert download(tmp_path, session) == CONTENT
+
+
+def test_retryable_status_resumes_from_the_last_byte(tmp_path):
+    session = FakeSession(200, 503, 206, fail_after=1)
+    assert download(tmp_path, session) == CONTENT
+    assert session.ranges == [0, 1000, 1000]
+
+
+def test_other_statuses_fail_at_once(tmp_path):
+    session = FakeSession(404, 200)
+    with pytest.raises(requests.exceptions.HTTPError):
+        download(tmp_path, session)
+    assert session.ranges == [0]
+    assert not (tmp_path / "submission.json").exists()
+
+
+def test_retries_are_limited(tmp_path):
+    session = FakeSession(503, 503, 503)
+    with pytest.raises(requests.exceptions.HTTPError):
+        download(tmp_path, session, max_retries=2)
+
+
+def test_too_large(tmp_path):
+    with pytest.raises(SubmissionTooLarge):
+        download(tmp_path, FakeSession(200), max_size=len(CONTENT) - 1)
@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+
+from evaluation_script import metrics
+from evaluation_script.metrics import (
+    AccuracyAccumulator,
+    ClassificationAccumulator,
+    ExactSum,
+    MeanErrorAccumulator,
+    TopKAccumulator,
+)
+
+BATCH_SIZES = [1, 7, 100, 1000]
+
+
+def test_accuracy():
+    assert metrics.accuracy([1, 2, 3, 4], [1, 2, 0, 4]) == 0.75
+    assert metrics.accuracy([], []) == 0.0
+
+
+def test_confusion_counts_ignore_unlisted_labels():
+    labels, true_positives, predicted, actual = metrics.confusion_counts(
+        ["a", "b", "b", "c"], ["a", "b", "c", "d"], labels=["a", "b", "c"]
+    )
+    assert labels.tolist() == ["a", "b", "c"]
+    assert true_positives.tolist() == [1, 1, 0]
+    assert predicted.tolist() == [1, 1, 1]
+    assert actual.tolist() == [1, 2, 1]
+
+
+@pytest.mark.parametrize(
+    "average, expected",
+    [
+        ("micro", (0.5, 0.5, 0.5)),
+        ("macro", (0.5, 11 / 18, 47 / 90)),
+        ("weighted", (0.5, 0.5, 43 / 90)),
+        ("binary", (0.5, 0.5, 0.5)),
+    ],
+)
+def test_precision_recall_f1(average, expected):
+    y_true = [0, 1, 1, 2, 2, 2]
+    y_pred = [0, 1, 2, 2, 1, 0]
+    result = metrics.precision_recall_f1(y_true, y_pred, average=average)
+    assert [result["Precision"], result["Recall"], result["F1"]] == pytest.approx(
+        expected
+    )
+
+
+def test_precision_recall_f1_unknown_average():
+    with pytest.raises(ValueError):
+        metrics.precision_recall_f1([0], [0], average="samples")
+
+
+def test_average_precision():
+    y_true = np.array([[1, 0], [0, 0], [1, 0]])
+    y_score = np.array([[0.9, 0.1], [0.8, 0.2], [0.7, 0.3]])
+    ap = metrics.average_precision(y_true, y_score)
+    assert ap[0] == pytest.approx((1 + 2 / 3) / 2)
+    assert np.isnan(ap[1])
+    assert metrics.mean_average_precision(y_true, y_score) == pytest.approx(ap[0])
+
+
+def test_rmse_and_top_k_accuracy():
+    assert metrics.rmse([0, 0], [3, 4]) == pytest.approx(np.sqrt(12.5))
+    y_score = np.array([[0.1, 0.5, 0.4], [0.6, 0.3, 0.1]])
+    assert metrics.top_k_accuracy([2, 2], y_score, k=2) == 0.5
+
+
+def test_build_output_converts_numpy_scalars():
+    output = metrics.build_output(
+        [("train_split", {"Total": np.float64(0.5)}), ("test_split", {"Total": 1})],
+        submission_result_split="test_split",
+    )
+    assert output["result"][0]["train_split"]["Total"] == 0.5
+    assert type(output["result"][0]["train_split"]["Total"]) is float
+    assert output["submission_result"] == {"Total": 1}
+
+
+def get_batches(size, *arrays):
+    for start in range(0, len(arrays[0]), size):
+        yield [array[start : start + size] for array in arrays]
+
+
+def accumulate(accumulator_class, size, *arrays, **kwargs):
+    """
+    Returns the result of one accumulator per batch merged together
+    """
+    merged = accumulator_class(**kwargs)
+    for batch in get_batches(size, *arrays):
+        merged.merge(accumulator_class(**kwargs).update(*batch))
+    return merged.result()
+
+
+@pytest.fixture
+def labels():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 5, 1000), rng.integers(0, 6, 1000)
+
+
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def test_accuracy_merge(labels, size):
+    y_true, y_pred = labels
+    result = accumulate(AccuracyAccumulator, size, y_true, y_pred)
+    assert result == {"Accuracy": metrics.accuracy(y_true, y_pred)}
+
+
+@pytest.mark.parametrize("size", BATCH_SIZES)
+@pytest.mark.parametrize("average", ["macro", "micro", "weighted", "binary"])
+def test_classification_merge(labels, size, average):
+    y_true, y_pred = labels
+    result = accumulate(
+        ClassificationAccumulator, size, y_true, y_pred, average=average
+    )
+    expected = metrics.precision_recall_f1(y_true, y_pred, average=average)
+    for name in ("Precision", "Recall", "F1"):
+        assert result[name] == pytest.approx(expected[name], rel=1e-12)
+    assert result["Accuracy"] == metrics.accuracy(y_true, y_pred)
+
+
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def test_mean_error_merge(size):
+    rng = np.random.default_rng(1)
+    y_true, y_pred = rng.normal(size=1000) * 1e3, rng.normal(size=1000) * 1e3
+    result = accumulate(MeanErrorAccumulator, size, y_true, y_pred)
+    assert result == MeanErrorAccumulator().update(y_true, y_pred).result()
+    assert result["RMSE"] == metrics.rmse(y_true, y_pred)
+    errors = y_pred - y_true
+    assert result["MAE"] == pytest.approx(np.abs(errors).mean(), rel=1e-12)
+    assert result["MSE"] == pytest.approx(np.square(errors).mean(), rel=1e-12)
+
+
+def test_mean_error_merge_order():
+    rng = np.random.default_rng(2)
+    y_true = rng.normal(size=1000)
+    y_pred = rng.normal(size=1000) * 10.0 ** rng.integers(-8, 8, 1000)
+    accumulators = [
+        MeanErrorAccumulator().update(*batch)
+        for batch in get_batches(10, y_true, y_pred)
+    ]
+    forward, backward = MeanErrorAccumulator(), MeanErrorAccumulator()
+    for accumulator in accumulators:
+        forward.merge(accumulator)
+    for accumulator in reversed(accumulators):
+        backward.merge(accumulator)
+    assert forward.result() == backward.result()
+
+
+def test_exact_sum():
+    values = [1e16, 1.0, -1e16, 5e-324, 0.1, -0.1, 1e308, 1e308, -1e308]
+    exact_sum = ExactSum().add(values)
+    assert exact_sum.mean(1) == 1e308
+    assert ExactSum().add(values[:3]).merge(ExactSum()).mean(1) == 1.0
+    assert ExactSum().add([1.0, np.inf]).mean(2) == np.inf
+    assert np.isnan(ExactSum().add([np.inf, -np.inf]).mean(2))
+    assert ExactSum().add([]).mean(1) == 0.0
+
+
+@pytest.mark.parametrize("size", BATCH_SIZES)
+def test_top_k_merge(size):
+    rng = np.random.default_rng(3)
+    y_true, y_score = rng.integers(0, 10, 1000), rng.random((1000, 10))
+    result = accumulate(TopKAccumulator, size, y_true, y_score, k=3)
+    assert result == {"Top3": metrics.top_k_accuracy(y_true, y_score, k=3)}
+
+
+def test_empty_accumulators():
+    assert AccuracyAccumulator().result() == {"Accuracy": 0.0}
+    assert MeanErrorAccumulator().merge(MeanErrorAccumulator()).result() == {
+        "MAE": 0.0,
+        "MSE": 0.0,
+        "RMSE": 0.0,
+    }
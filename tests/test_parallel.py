@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from evaluation_script.metrics import ClassificationAccumulator, MeanErrorAccumulator
+from evaluation_script.parallel import evaluate_sharded
+
+
+def evaluate_shard(predictions, annotations):
+    return MeanErrorAccumulator().update(annotations, predictions)
+
+
+def classify_shard(predictions, annotations):
+    return ClassificationAccumulator().update(annotations, predictions)
+
+
+@pytest.mark.parametrize("shard_size", [1000, 4096, 100000])
+@pytest.mark.parametrize("num_workers", [1, 2, 3])
+def test_sharded_result_matches_a_single_pass(shard_size, num_workers):
+    rng = np.random.default_rng(0)
+    annotations, predictions = rng.random(20000), rng.random(20000) * 1e4
+    result = evaluate_sharded(
+        evaluate_shard, predictions, annotations, shard_size, num_workers
+    ).result()
+    assert result == evaluate_shard(predictions, annotations).result()
+
+
+def test_sharded_dict_of_columns():
+    rng = np.random.default_rng(1)
+    annotations = rng.integers(0, 4, 5000)
+    predictions = rng.integers(0, 4, 5000)
+    result = evaluate_sharded(
+        lambda predictions, annotations: classify_shard(
+            predictions["label"], annotations
+        ),
+        {"label": predictions},
+        annotations,
+        shard_size=700,
+        num_workers=2,
+    ).result()
+    assert result == classify_shard(predictions, annotations).result()
+
+
+def test_sharded_length_mismatch():
+    with pytest.raises(ValueError):
+        evaluate_sharded(evaluate_shard, [1.0, 2.0], [1.0])
@@ -0,0 +1,55 @@
+import pytest
+
+from poller import AdaptivePoller
+
+
+class FakeEvalAI:
+    def __init__(self, *messages):
+        self.messages = list(messages)
+
+    def get_message_from_sqs_queue(self):
+        message = self.messages.pop(0)
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+def message(submission_pk):
+    return {"body": {"submission_pk": submission_pk}, "receipt_handle": "handle"}
+
+
+def make_poller(*messages):
+    return AdaptivePoller(
+        FakeEvalAI(*messages), min_interval=1, max_interval=8, jitter=0
+    )
+
+
+def test_backoff_grows_on_empty_polls_and_resets_on_a_message():
+    poller = make_poller({}, {}, {}, RuntimeError("down"), {}, message(1))
+    delays = []
+    for _ in range(6):
+        poller.poll()
+        delays.append(poller.next_delay())
+    assert delays == [1, 2, 4, 8, 8, 0]
+    assert poller.stats()["errors"] == 1
+
+
+def test_duplicate_message_counts_as_an_empty_poll():
+    poller = make_poller({}, {}, message(1), message(1), message(1), message(2))
+    delays = []
+    for _ in range(6):
+        if poller.poll() is not None and len(delays) in (3, 4):
+            poller.record_duplicate()
+        delays.append(poller.next_delay())
+    assert delays == [1, 2, 0, 1, 2, 0]
+    stats = poller.stats()
+    assert (stats["messages"], stats["duplicates"]) == (2, 2)
+
+
+def test_duplicate_continues_the_empty_streak():
+    poller = make_poller({}, {}, message(1))
+    poller.poll()
+    poller.poll()
+    poller.poll()
+    poller.record_duplicate()
+    assert poller.next_delay() == 4
@@ -0,0 +1,62 @@
+import os
+
+from result_cache import ResultCache, hash_paths
+
+KEY = ("submission", "annotations", "dev", "v1")
+
+
+def test_get_and_set(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache" / "results.sqlite3"))
+    assert cache.get(*KEY) is None
+    cache.set(*KEY, result='{"Accuracy": 1.0}')
+    assert cache.get(*KEY) == '{"Accuracy": 1.0}'
+    assert cache.stats() == {"entries": 1, "bytes": len('{"Accuracy": 1.0}')}
+
+
+def test_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    ResultCache(path).set(*KEY, result="result")
+    assert ResultCache(path).get(*KEY) == "result"
+
+
+def test_new_annotations_or_script_version_drop_stale_results(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    cache.set(*KEY, result="old")
+    cache.set("other", "annotations", "test", "v1", result="other phase")
+    cache.set("submission", "new annotations", "dev", "v1", result="new")
+    assert cache.get(*KEY) is None
+    assert cache.get("other", "annotations", "test", "v1") == "other phase"
+    cache.set("submission", "new annotations", "dev", "v2", result="newer")
+    assert cache.get("submission", "new annotations", "dev", "v1") is None
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_bytes=10)
+    cache.set("a", "annotations", "dev", "v1", result="aaaa")
+    cache.set("b", "annotations", "dev", "v1", result="bbbb")
+    assert cache.get("a", "annotations", "dev", "v1") == "aaaa"
+    cache.set("c", "annotations", "dev", "v1", result="cccc")
+    assert cache.get("b", "annotations", "dev", "v1") is None
+    assert cache.get("a", "annotations", "dev", "v1") == "aaaa"
+    cache.set("d", "annotations", "dev", "v1", result="too large to store")
+    assert cache.get("d", "annotations", "dev", "v1") is None
+
+
+def test_hash_paths(tmp_path):
+    script_dir = tmp_path / "evaluation_script"
+    (script_dir / "__pycache__").mkdir(parents=True)
+    (script_dir / "main.py").write_text("print(1)\n")
+    (script_dir / "notes.txt").write_text("notes\n")
+    (script_dir / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"\0")
+    digest = hash_paths([str(script_dir)], suffixes=(".py",))
+
+    (script_dir / "notes.txt").write_text("other notes\n")
+    (script_dir / "__pycache__" / "main.cpython-311.pyc").write_bytes(b"\1")
+    assert hash_paths([str(script_dir)], suffixes=(".py",)) == digest
+    assert hash_paths([str(script_dir)]) != hash_paths(
+        [str(script_dir)], suffixes=(".py",)
+    )
+
+    (script_dir / "main.py").write_text("print(2)\n")
+    os.utime(str(script_dir / "main.py"), (1, 1))
+    assert hash_paths([str(script_dir)], suffixes=(".py",)) != digest
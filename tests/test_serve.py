@@ -0,0 +1,88 @@
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from worker import serve
+from worker.serve import Server, send_job
+
+
+class FakeChallengeModule:
+    """
+    Challenge module returning the `output` of every job, as a set if `as_set`
+    is given, after sleeping `delay` seconds
+    """
+
+    def evaluate(self, job):
+        time.sleep(job.get("delay", 0))
+        output = set(job["output"]) if job.get("as_set") else job["output"]
+        return {"status": "finished", "output": output, "evaluation_time": 0}
+
+
+def run_in_thread(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_non_serializable_output_fails_the_job(tmp_path):
+    server = Server(FakeChallengeModule(), interval=0.01)
+    (tmp_path / "bad.json").write_text(json.dumps({"output": [1], "as_set": True}))
+    (tmp_path / "good.json").write_text(json.dumps({"output": {"Total": 1}}))
+    thread = run_in_thread(server.watch, str(tmp_path))
+    results_dir = tmp_path / "results"
+    wait_for(lambda: len(list(results_dir.glob("*.json"))) == 2)
+    server.stopping = True
+    thread.join()
+    bad = json.loads((results_dir / "bad.json").read_text())
+    assert bad["status"] == "failed"
+    assert "JSON serializable" in bad["error"]
+    good = json.loads((results_dir / "good.json").read_text())
+    assert good["output"] == {"Total": 1}
+
+
+def test_client_disconnecting_doesnt_stop_the_server(tmp_path):
+    socket_path = str(tmp_path / "worker.sock")
+    server = Server(FakeChallengeModule(), interval=0.01)
+    thread = run_in_thread(server.serve, socket_path)
+    wait_for(lambda: os.path.exists(socket_path))
+
+    for _ in range(3):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            job = {"output": "x" * 2**20, "delay": 0.1}
+            client.sendall((json.dumps(job) + "\n").encode("utf-8"))
+            # Reset the connection instead of reading the reply
+            client.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, b"\x01\x00\x00\x00\x00\x00\x00\x00"
+            )
+    assert send_job(socket_path, {"output": 1})["output"] == 1
+    assert thread.is_alive()
+    server.stopping = True
+    thread.join()
+
+
+def test_claim_jobs_skips_files_claimed_meanwhile(tmp_path, monkeypatch):
+    for name in ("a.json", "b.json", "c.json"):
+        (tmp_path / name).write_text("{}")
+    scandir = os.scandir
+
+    def scandir_then_claim(path):
+        # Another server claims b.json after the directory was listed
+        entries = list(scandir(path))
+        os.replace(str(tmp_path / "b.json"), str(tmp_path / "b.json.processing"))
+        return iter(entries)
+
+    monkeypatch.setattr(serve.os, "scandir", scandir_then_claim)
+    claimed = [name for name, _ in Server(None).claim_jobs(str(tmp_path))]
+    assert sorted(claimed) == ["a.json", "c.json"]
@@ -0,0 +1,140 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from evaluation_script import submission_reader
+from evaluation_script.submission_reader import _JSONStream, iter_batches, iter_records
+
+RECORDS = [
+    {"id": 1, "label": 'a "quoted" \\ value', "scores": [0.5, 1e-3, -2]},
+    {"id": 2, "label": "unicode é中 😀", "nested": {"a": [{}, []]}},
+    {"id": 3, "label": "", "nested": {"b": {"c": [1, [2, [3]]]}}},
+    {"id": 12345678901234567890, "label": 'escapes \n\t"\\/ \u0000'},
+]
+
+
+class ChunkedReader:
+    """
+    File returning at most `size` characters per read, to put the chunk
+    boundaries anywhere in the JSON text
+    """
+
+    def __init__(self, text, size):
+        self.f = io.StringIO(text)
+        self.size = size
+
+    def read(self, size=-1):
+        return self.f.read(self.size)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_array_across_chunk_boundaries(indent, chunk_size):
+    text = json.dumps(RECORDS, indent=indent)
+    assert list(_JSONStream(ChunkedReader(text, chunk_size))) == RECORDS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1024])
+def test_object_across_chunk_boundaries(chunk_size):
+    value = {"key {}".format(i): record for i, record in enumerate(RECORDS)}
+    text = json.dumps(value, ensure_ascii=False)
+    assert list(_JSONStream(ChunkedReader(text, chunk_size))) == list(value.items())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_numbers_split_at_the_end_of_a_chunk(chunk_size):
+    numbers = [12345, -6.5e10, 0.125, 1.5e-07, -0.0]
+    text = json.dumps(numbers).replace(" ", "")
+    assert list(_JSONStream(ChunkedReader(text, chunk_size))) == numbers
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", "{}", "\n{\n}\n"])
+def test_empty_values(text):
+    assert list(_JSONStream(ChunkedReader(text, 1))) == []
+
+
+@pytest.mark.parametrize("text", ["[1 2]", '{"a" 1}', '[{"a": 1}', '"string"', "[1,"])
+def test_invalid_json(text):
+    with pytest.raises(ValueError):
+        list(_JSONStream(ChunkedReader(text, 1)))
+
+
+def test_gzip_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(submission_reader, "READ_SIZE", 3)
+    path = tmp_path / "submission.json.gz"
+    with gzip.open(str(path), "wt", encoding="utf-8") as f:
+        json.dump(RECORDS, f)
+    assert list(iter_records(str(path))) == RECORDS
+
+
+def test_gzip_detected_from_content(tmp_path):
+    path = tmp_path / "submission.json"
+    with gzip.open(str(path), "wt", encoding="utf-8") as f:
+        json.dump(RECORDS, f)
+    assert list(iter_records(str(path), file_format="json")) == RECORDS
+
+
+def test_gzip_jsonl(tmp_path):
+    path = tmp_path / "submission.jsonl.gz"
+    with gzip.open(str(path), "wt", encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(record) for record in RECORDS) + "\n\n")
+    assert list(iter_records(str(path))) == RECORDS
+
+
+def test_csv_and_tsv(tmp_path):
+    for file_format, delimiter in (("csv", ","), ("tsv", "\t")):
+        path = tmp_path / "submission.{}".format(file_format)
+        path.write_text(
+            delimiter.join(["id", "label"])
+            + "\n1{}a\n2{}b\n".format(delimiter, delimiter)
+        )
+        assert list(iter_records(str(path))) == [
+            {"id": "1", "label": "a"},
+            {"id": "2", "label": "b"},
+        ]
+
+
+def test_batches(tmp_path):
+    path = tmp_path / "submission.json"
+    path.write_text(json.dumps(list(range(25))))
+    assert [len(batch) for batch in iter_batches(str(path), batch_size=10)] == [
+        10,
+        10,
+        5,
+    ]
+
+
+@pytest.mark.parametrize(
+    "text, file_format",
+    [
+        (json.dumps(RECORDS, indent=2), "json"),
+        (json.dumps(RECORDS), "json"),
+        (json.dumps({"a": 1}), "json"),
+        ('{\n  "a": 1\n}\n', "json"),
+        ("\n".join(json.dumps(record) for record in RECORDS) + "\n", "jsonl"),
+        ("id,label\n1,a\n", "csv"),
+        ("id\tlabel\n1\ta\n", "tsv"),
+    ],
+)
+def test_bare_gz_name_is_sniffed(tmp_path, text, file_format):
+    path = tmp_path / "6f1c2a9e-4b7d-4e5f-9a3b-2c8d1e0f7a6b.gz"
+    with gzip.open(str(path), "wt", encoding="utf-8") as f:
+        f.write(text)
+    assert submission_reader.get_file_format(str(path)) == (file_format, True)
+    assert list(iter_records(str(path)))
+
+
+def test_bare_gz_records(tmp_path):
+    path = tmp_path / "submission.gz"
+    with gzip.open(str(path), "wt", encoding="utf-8") as f:
+        json.dump(RECORDS, f)
+    assert list(iter_records(str(path))) == RECORDS
+
+
+def test_unsupported_extension(tmp_path):
+    path = tmp_path / "submission.xml.gz"
+    path.write_bytes(gzip.compress(b"<xml/>"))
+    with pytest.raises(ValueError):
+        list(iter_records(str(path)))
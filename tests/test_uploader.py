@@ -0,0 +1,83 @@
+import pytest
+import requests
+import urllib3
+
+import uploader
+from uploader import _send_with_retries
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(uploader.time, "sleep", lambda seconds: None)
+
+
+def make_response(status_code, content=b""):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+def connection_refused():
+    reason = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(
+        urllib3.exceptions.MaxRetryError(None, "/", reason)
+    )
+
+
+class Sender:
+    """
+    Callable returning, or raising, the next of `outcomes` on every call
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504])
+def test_idempotent_requests_retry_server_errors(status):
+    send = Sender(make_response(status, b"error"), make_response(200))
+    assert _send_with_retries(send, "Upload", 3).status_code == 200
+    assert send.calls == 2
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_creation_isnt_retried_after_reaching_the_server(status):
+    send = Sender(make_response(status), make_response(201))
+    response = _send_with_retries(send, "Upload", 3, idempotent=False)
+    assert response.status_code == status
+    assert send.calls == 1
+
+
+def test_creation_retries_empty_503():
+    send = Sender(make_response(503), make_response(201))
+    assert _send_with_retries(send, "Upload", 3, idempotent=False).status_code == 201
+    send = Sender(make_response(503, b"Processing failed"), make_response(201))
+    assert _send_with_retries(send, "Upload", 3, idempotent=False).status_code == 503
+
+
+def test_creation_retries_connect_errors_only():
+    send = Sender(
+        connection_refused(),
+        requests.exceptions.ConnectTimeout("connect timeout"),
+        make_response(201),
+    )
+    assert _send_with_retries(send, "Upload", 3, idempotent=False).status_code == 201
+    send = Sender(requests.exceptions.ReadTimeout("read timeout"), make_response(201))
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        _send_with_retries(send, "Upload", 3, idempotent=False)
+    assert send.calls == 1
+
+
+def test_retries_are_limited():
+    send = Sender(*[make_response(502)] * 3)
+    assert _send_with_retries(send, "Upload", 2).status_code == 502
+    assert send.calls == 3
@@ -0,0 +1,114 @@
+import os
+import zipfile
+
+import pytest
+
+import zip_builder
+
+FILES = {
+    "evaluation_script/main.py": b"def evaluate():\n    pass\n" * 100,
+    "evaluation_script/__init__.py": b"",
+    "logo.png": os.urandom(4096),
+    "run.sh": b"#!/bin/sh\necho run\n",
+}
+
+
+@pytest.fixture
+def challenge_dir(tmp_path):
+    base_dir = tmp_path / "challenge"
+    for name, content in FILES.items():
+        path = base_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    os.chmod(str(base_dir / "run.sh"), 0o755)
+    return base_dir
+
+
+def build(tmp_path, base_dir, cache=True):
+    zip_file_path = str(tmp_path / "challenge_config.zip")
+    report = zip_builder.build_zip_file(
+        zip_file_path,
+        zip_builder.get_zip_files(str(base_dir)),
+        str(tmp_path / "cache") if cache else None,
+        num_workers=2,
+    )
+    with open(zip_file_path, "rb") as f:
+        data = f.read()
+    actions = {member["name"]: member["action"] for member in report["members"]}
+    return data, actions
+
+
+def read_members(tmp_path):
+    with zipfile.ZipFile(str(tmp_path / "challenge_config.zip")) as zip_file:
+        assert zip_file.testzip() is None
+        return {info.filename: zip_file.read(info) for info in zip_file.infolist()}
+
+
+def test_build_is_deterministic(tmp_path, challenge_dir):
+    first, _ = build(tmp_path, challenge_dir, cache=False)
+    os.utime(str(challenge_dir / "logo.png"), (0, 0))
+    second, _ = build(tmp_path, challenge_dir, cache=False)
+    assert first == second
+    assert read_members(tmp_path) == FILES
+
+
+def test_unchanged_members_are_reused(tmp_path, challenge_dir):
+    first, actions = build(tmp_path, challenge_dir)
+    assert set(actions.values()) == {"compressed", "stored"}
+    second, actions = build(tmp_path, challenge_dir)
+    assert set(actions.values()) == {"reused"}
+    assert first == second
+
+
+def test_changed_member_is_compressed_again(tmp_path, challenge_dir):
+    build(tmp_path, challenge_dir)
+    (challenge_dir / "evaluation_script" / "main.py").write_bytes(b"changed\n")
+    data, actions = build(tmp_path, challenge_dir)
+    assert actions["evaluation_script/main.py"] == "compressed"
+    assert actions["logo.png"] == "reused"
+    expected = dict(FILES, **{"evaluation_script/main.py": b"changed\n"})
+    assert read_members(tmp_path) == expected
+    assert data == build(tmp_path, challenge_dir, cache=False)[0]
+
+
+def test_executable_bit_is_kept(tmp_path, challenge_dir):
+    build(tmp_path, challenge_dir)
+    build(tmp_path, challenge_dir)
+    with zipfile.ZipFile(str(tmp_path / "challenge_config.zip")) as zip_file:
+        assert zip_file.getinfo("run.sh").external_attr >> 16 & 0o777 == 0o755
+        assert zip_file.getinfo("logo.png").external_attr >> 16 & 0o777 == 0o644
+
+
+def test_archive_is_the_same_as_zipfile_writes(tmp_path, challenge_dir):
+    data, _ = build(tmp_path, challenge_dir, cache=False)
+    files = zip_builder.get_zip_files(str(challenge_dir))
+    members = [
+        zip_builder._prepare_member(file_path, name, {}, False)
+        for file_path, name in files
+    ]
+    for member in members:
+        member.pop("data_file").close()
+    zip_builder._write_zip64_file(str(tmp_path / "zipfile.zip"), members)
+    assert (tmp_path / "zipfile.zip").read_bytes() == data
+
+
+def test_zip64_archives_are_written_by_zipfile(tmp_path, challenge_dir, monkeypatch):
+    expected, _ = build(tmp_path, challenge_dir)
+    monkeypatch.setattr(zip_builder, "ZIP_MAX_SIZE", 1024)
+    data, actions = build(tmp_path, challenge_dir)
+    assert "reused" not in actions.values()
+    assert data == expected
+    assert read_members(tmp_path) == FILES
+
+
+def test_compiled_annotations_are_ignored(tmp_path, challenge_dir):
+    columns_dir = challenge_dir / "annotations" / "test_annotations.columns"
+    columns_dir.mkdir(parents=True)
+    (columns_dir / "manifest.json").write_text("{}")
+    (challenge_dir / "annotations" / ".annotations-1234").mkdir()
+    files = zip_builder.get_zip_files(
+        str(challenge_dir), zip_builder.IGNORE_DIRS, zip_builder.IGNORE_FILES
+    )
+    names = [name for _, name in files]
+    assert "evaluation_script/main.py" in names
+    assert not any(".columns" in name or ".annotations-" in name for name in names)
@@ -1,4 +1,6 @@
 import importlib
+import importlib.util
+import json
 import os
 import sys
 
@@ -8,6 +10,26 @@ def get_curr_working_dir():
     return curr_working_dir
 
 
+def import_remote_module(name):
+    """
+    Imports a module of `remote_challenge_evaluation/` from its file
+
+    The directory isn't added to sys.path, so the modules of the remote worker
+    (main, evaluate, ...) can't shadow the ones of the challenge
+    """
+    module_name = "remote_challenge_evaluation_{}".format(name)
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name,
+        "{}/remote_challenge_evaluation/{}.py".format(get_curr_working_dir(), name),
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
 def run():
     current_working_directory = get_curr_working_dir()
     sys.path.append("{}".format(current_working_directory))
@@ -48,13 +70,52 @@ def run():
         "id": 123,
         "submitted_at": u"2017-03-20T19:22:03.880652Z",
     }
-    EVALUATION_SCRIPTS[challenge_id].evaluate(
-        annotation_file_path,
-        user_submission_file_path,
-        challenge_phase,
-        submission_metadata=submission_metadata,
+
+    # Set RESULT_CACHE_PATH to reuse the result of an already evaluated submission file
+    result_cache_path = os.environ.get("RESULT_CACHE_PATH")
+    if result_cache_path:
+        result_cache_module = import_remote_module("result_cache")
+
+        result_cache = result_cache_module.ResultCache(result_cache_path)
+        cache_key = (
+            result_cache_module.hash_file(user_submission_file_path),
+            result_cache_module.hash_file(annotation_file_path),
+            challenge_phase,
+            result_cache_module.hash_paths(
+                ["{}/challenge_data/challenge_1".format(current_working_directory)]
+            ),
+        )
+        cached_output = result_cache.get(*cache_key)
+        if cached_output is not None:
+            print("Found a cached result: {}".format(cached_output))
+            return json.loads(cached_output)
+
+    # Set PROFILE_MODE to "cprofile" or "sampling" to profile the evaluation
+    profiler = (
+        import_remote_module("profiling").profiler_from_environment()
+        if os.environ.get("PROFILE_MODE")
+        else None
     )
+    if profiler is None:
+        output = EVALUATION_SCRIPTS[challenge_id].evaluate(
+            annotation_file_path,
+            user_submission_file_path,
+            challenge_phase,
+            submission_metadata=submission_metadata,
+        )
+    else:
+        output = profiler.profile(
+            "{}_{}".format(submission_metadata["id"], challenge_phase),
+            EVALUATION_SCRIPTS[challenge_id].evaluate,
+            annotation_file_path,
+            user_submission_file_path,
+            challenge_phase,
+            submission_metadata=submission_metadata,
+        )
+    if result_cache_path:
+        result_cache.set(*cache_key, json.dumps(output))
     print("Evaluated Successfully!")
+    return output
 
 
 if __name__ == "__main__":
@@ -0,0 +1,291 @@
+"""
+Long-lived evaluation worker that keeps the challenge module loaded
+
+The challenge module is imported once, so the interpreter startup, the heavy
+imports of the evaluation script and anything it caches at module level (e.g.
+parsed annotations) are paid for once instead of once per submission. The
+module is reloaded only when a file of the evaluation script changes on disk.
+
+Submissions are jobs, JSON objects such as:
+    {
+        "user_submission_file": "submission.json",
+        "phase_codename": "test",
+        "test_annotation_file": "annotations/test_annotations_testsplit.json",
+        "submission_metadata": {}
+    }
+
+Usage:
+    python -m worker.serve --watch queue/
+        Evaluates every `*.json` job file written to `queue/` and writes its
+        outcome to `queue/results/`. Write job files atomically, e.g. to a
+        `.tmp` file renamed once complete.
+
+    python -m worker.serve --socket /tmp/evalai-worker.sock
+        Reads one job per line from the connections to a Unix socket and sends
+        back the outcome of each job as a JSON line.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from .run import get_curr_working_dir
+
+CHALLENGE_IMPORT_STRING = "challenge_data.challenge_1"
+
+
+class WarmChallengeModule:
+    """
+    Holds the imported challenge module and reloads it when one of its files changes
+
+    Arguments:
+
+        `import_string`: Import path of the challenge module
+    """
+
+    def __init__(self, import_string=CHALLENGE_IMPORT_STRING):
+        self.import_string = import_string
+        self.module = None
+        self.directory = None
+        self.mtimes = None
+        self.loads = 0
+
+    def get_mtimes(self):
+        mtimes = {}
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if d != "__pycache__"]
+            for name in files:
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    mtimes[path] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def unload(self):
+        # Drop the challenge package along with every module imported from its
+        # directory, including the ones imported without the package prefix
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if (
+                name == self.import_string
+                or name.startswith(self.import_string + ".")
+                or os.path.abspath(path).startswith(self.directory + os.sep)
+            ):
+                del sys.modules[name]
+        self.module = None
+
+    def get(self):
+        """
+        Returns the challenge module, reloading it if its files changed since it was imported
+        """
+        if self.module is not None and self.get_mtimes() != self.mtimes:
+            print("Evaluation script changed, reloading {}".format(self.import_string))
+            self.unload()
+        if self.module is None:
+            importlib.invalidate_caches()
+            self.module = importlib.import_module(self.import_string)
+            self.directory = os.path.dirname(os.path.abspath(self.module.__file__))
+            self.mtimes = self.get_mtimes()
+            self.loads += 1
+        return self.module
+
+    def evaluate(self, job):
+        """
+        Evaluates a job and returns its outcome, with the output of `evaluate`
+        if it succeeded or the traceback of the error otherwise
+        """
+        start = time.time()
+        try:
+            output = self.get().evaluate(
+                job["test_annotation_file"],
+                job["user_submission_file"],
+                job["phase_codename"],
+                submission_metadata=job.get("submission_metadata", {}),
+            )
+            outcome = {"status": "finished", "output": output}
+        except Exception:
+            outcome = {"status": "failed", "error": traceback.format_exc()}
+        outcome["evaluation_time"] = time.time() - start
+        return outcome
+
+
+def encode_outcome(outcome):
+    """
+    Returns the outcome of a job along with its JSON text, the job failing if
+    the output of `evaluate` can't be serialized
+    """
+    try:
+        return outcome, json.dumps(outcome)
+    except (TypeError, ValueError) as e:
+        outcome = {
+            "status": "failed",
+            "error": "The output of evaluate isn't JSON serializable: {}".format(e),
+            "evaluation_time": outcome.get("evaluation_time"),
+        }
+        return outcome, json.dumps(outcome)
+
+
+class Server:
+    """
+    Feeds the jobs of a local queue to a warm challenge module until SIGINT/SIGTERM is received
+
+    Arguments:
+
+        `challenge_module`: `WarmChallengeModule` evaluating the jobs
+        `interval`: Seconds between two scans of an empty watched directory
+    """
+
+    def __init__(self, challenge_module, interval=0.5):
+        self.challenge_module = challenge_module
+        self.interval = interval
+        self.stopping = False
+
+    def stop(self, signum, frame):
+        print("Stopping after the current submission")
+        self.stopping = True
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+    def claim_jobs(self, queue_dir):
+        """
+        Yields the paths of the job files of `queue_dir`, oldest first, after
+        renaming them so that another server watching the same directory skips them
+        """
+        entries = []
+        for entry in os.scandir(queue_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                if entry.is_file():
+                    entries.append((entry.stat().st_mtime_ns, entry))
+            except FileNotFoundError:
+                # Claimed by another server since the directory was listed
+                continue
+        for _, entry in sorted(entries, key=lambda item: item[0]):
+            claimed_path = entry.path + ".processing"
+            try:
+                os.replace(entry.path, claimed_path)
+            except FileNotFoundError:
+                continue
+            yield entry.name, claimed_path
+
+    def watch(self, queue_dir):
+        results_dir = os.path.join(queue_dir, "results")
+        os.makedirs(results_dir, exist_ok=True)
+        while not self.stopping:
+            processed = False
+            for name, claimed_path in self.claim_jobs(queue_dir):
+                try:
+                    with open(claimed_path, "r") as f:
+                        outcome = self.challenge_module.evaluate(json.load(f))
+                except ValueError:
+                    outcome = {"status": "failed", "error": traceback.format_exc()}
+                outcome, text = encode_outcome(outcome)
+                result_path = os.path.join(results_dir, name)
+                with open(result_path + ".tmp", "w") as f:
+                    f.write(text)
+                os.replace(result_path + ".tmp", result_path)
+                os.remove(claimed_path)
+                print("{}: {}".format(name, outcome["status"]))
+                processed = True
+                if self.stopping:
+                    break
+            if not processed:
+                time.sleep(self.interval)
+
+    def serve(self, socket_path):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen()
+        # Wake up regularly to notice a stop request
+        server.settimeout(self.interval)
+        try:
+            while not self.stopping:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    continue
+                connection.settimeout(None)
+                try:
+                    self.handle_connection(connection)
+                except (BrokenPipeError, ConnectionResetError) as e:
+                    print("Client disconnected before its reply was sent: {}".format(e))
+        finally:
+            server.close()
+            os.remove(socket_path)
+
+    def handle_connection(self, connection):
+        """
+        Evaluates the jobs read from a socket connection until the client closes it
+        """
+        with connection, connection.makefile("rw") as stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                try:
+                    outcome = self.challenge_module.evaluate(json.loads(line))
+                except ValueError:
+                    outcome = {"status": "failed", "error": traceback.format_exc()}
+                stream.write(encode_outcome(outcome)[1] + "\n")
+                stream.flush()
+                if self.stopping:
+                    break
+
+
+def send_job(socket_path, job):
+    """
+    Sends a job to a server listening on `socket_path` and returns its outcome
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        with client.makefile("rw") as stream:
+            stream.write(json.dumps(job) + "\n")
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--watch", help="Directory to which job files are written")
+    source.add_argument("--socket", help="Path of the Unix socket to listen on")
+    parser.add_argument(
+        "--module",
+        default=CHALLENGE_IMPORT_STRING,
+        help="Import path of the challenge module",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="Seconds between two scans of an empty watched directory",
+    )
+    args = parser.parse_args()
+
+    current_working_directory = get_curr_working_dir()
+    sys.path.append("{}".format(current_working_directory))
+    sys.path.append("{}/challenge_data/challenge_1".format(current_working_directory))
+
+    challenge_module = WarmChallengeModule(args.module)
+    challenge_module.get()
+    server = Server(challenge_module, interval=args.interval)
+    server.install_signal_handlers()
+    if args.watch:
+        print("Watching {} for submissions".format(args.watch))
+        server.watch(args.watch)
+    else:
+        print("Listening for submissions on {}".format(args.socket))
+        server.serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()